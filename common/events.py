@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: MIT
+
+# Library and tool for machine readable progress events.
+#
+# Every event is a single line of JSON that is appended to the file given in
+# the `EVENTS_FILE` environment variable (`-` means stderr). If it isn't set,
+# no events are emitted at all. An event looks like this:
+#
+#     {"ts": 1661327000.5, "tool": "upload-video", "job": "talk.mp4", "event": "chunk", "bytes": 20971520, "total_bytes": 104857600, "duration": 12.3, "rate": 1705000.0}
+#
+# The `event` is one of `start`, `chunk`, `request`, `retry`, `end` or `fail`.
+# The `bytes`, `duration` and `rate` (bytes per second) are always since the
+# start of the job. The shell scripts emit the same events via `events.sh`.
+#
+# If the `EVENTS_TEXTFILE` environment variable is set as well, the events are
+# aggregated into metrics that are written into that file in the Prometheus
+# text format whenever a job ends. Put it into the directory of the textfile
+# collector of the node_exporter to graph e.g. the upload throughput. Only the
+# events since the last update are read, the aggregated metrics and the
+# position in the events file are kept in `<textfile>.state` (see
+# `update_textfile()`). The shell scripts update it with:
+#
+#     ./events.py update events.ndjson metrics.prom
+#
+# To aggregate all events again, e.g. after the events file was edited, run:
+#
+#     ./events.py textfile events.ndjson metrics.prom
+#
+# To get an overview of all jobs, including the ones that are still running or
+# that seem to be stuck, run:
+#
+#     ./events.py summary events.ndjson
+
+import argparse, json, os, sys, time
+from collections import defaultdict
+
+# The prefix of all metric names.
+METRICS_PREFIX = "conftools"
+
+
+def append_event(path, event):
+    """Appends the event to the events file. A single write in append mode
+    keeps lines of concurrent writers from being interleaved."""
+    line = json.dumps(event) + "\n"
+    if path == "-":
+        sys.stderr.write(line)
+        sys.stderr.flush()
+        return
+    with open(path, "a") as events_file:
+        events_file.write(line)
+
+
+class Events:
+    """Emits events for a tool. Without a path, it doesn't do anything."""
+
+    def __init__(self, tool, path=None, textfile=None):
+        self.tool = tool
+        self.path = path
+        self.textfile = textfile
+
+    def emit(self, event, job, **fields):
+        if self.path is None:
+            return
+        append_event(
+            self.path,
+            {"ts": time.time(), "tool": self.tool, "job": job, "event": event, **fields},
+        )
+        if self.textfile is not None and self.path != "-" and event in ("end", "fail"):
+            update_textfile(self.path, self.textfile)
+
+    def job(self, job, total_bytes=None):
+        return Job(self, job, total_bytes)
+
+
+class Job:
+    """A single unit of work, e.g. the upload of a file.
+
+    It can be used as context manager, then `start` is emitted when it is
+    entered and `end` (or `fail` in case of an exception) when it is left.
+    """
+
+    def __init__(self, events, job, total_bytes=None):
+        self.events = events
+        self.job = job
+        self.total_bytes = total_bytes
+        self.started = None
+        self.finished = False
+
+    def progress(self, bytes_done):
+        duration = time.monotonic() - self.started
+        fields = {"duration": round(duration, 3)}
+        if self.total_bytes is not None:
+            fields["total_bytes"] = self.total_bytes
+        if bytes_done is not None:
+            fields["bytes"] = bytes_done
+            if duration > 0:
+                fields["rate"] = round(bytes_done / duration, 1)
+        return fields
+
+    def start(self):
+        self.started = time.monotonic()
+        fields = {}
+        if self.total_bytes is not None:
+            fields["total_bytes"] = self.total_bytes
+        self.events.emit("start", self.job, **fields)
+
+    def chunk(self, bytes_done):
+        self.events.emit("chunk", self.job, **self.progress(bytes_done))
+
+    def retry(self, attempt, delay, error):
+        self.events.emit(
+            "retry", self.job, attempt=attempt, delay=round(delay, 3), error=str(error)
+        )
+
+    def end(self, bytes_done=None, **fields):
+        self.finished = True
+        self.events.emit("end", self.job, **self.progress(bytes_done), **fields)
+
+    def fail(self, error):
+        self.finished = True
+        self.events.emit("fail", self.job, **self.progress(None), error=str(error))
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.finished:
+            return
+        if exc_type is None:
+            self.end(self.total_bytes)
+        else:
+            self.fail(exc_value if exc_value is not None else exc_type.__name__)
+
+
+def events_from_environment(tool):
+    """Returns the events emitter configured by the `EVENTS_FILE` and
+    `EVENTS_TEXTFILE` environment variables."""
+    return Events(
+        tool,
+        os.environ.get("EVENTS_FILE") or None,
+        os.environ.get("EVENTS_TEXTFILE") or None,
+    )
+
+
+def parse_events(lines):
+    for line in lines:
+        # A line may be incomplete if a writer is just appending to it.
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            continue
+
+
+def read_events(path):
+    with open(path) as events_file:
+        yield from parse_events(events_file)
+
+
+def metric(name, **labels):
+    """Returns the metric name including its labels, e.g.
+    `conftools_jobs_total{status="success",tool="upload-video"}`."""
+    formatted = ",".join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+    return f"{METRICS_PREFIX}_{name}{{{formatted}}}"
+
+
+def aggregate(events, metrics=None):
+    """Returns a dict with the metric names (including labels) as key and the
+    value as value. If `metrics` are given, the events are added to them."""
+    metrics = defaultdict(float, metrics or {})
+    for event in events:
+        tool = event["tool"]
+        kind = event["event"]
+        metrics[metric("events_total", tool=tool, event=kind)] += 1
+        metrics[metric("last_event_timestamp_seconds", tool=tool)] = event["ts"]
+        if kind in ("end", "fail"):
+            status = "success" if kind == "end" else "failure"
+            metrics[metric("jobs_total", tool=tool, status=status)] += 1
+            duration = event.get("duration") or 0
+            metrics[metric("job_duration_seconds_sum", tool=tool)] += duration
+            metrics[metric("job_duration_seconds_count", tool=tool)] += 1
+        if kind == "end" and event.get("bytes"):
+            metrics[metric("bytes_total", tool=tool)] += event["bytes"]
+        if kind in ("chunk", "end") and event.get("rate"):
+            metrics[metric("rate_bytes_per_second", tool=tool)] = event["rate"]
+        if kind == "request":
+            code = event.get("http_code", "")
+            metrics[metric("requests_total", tool=tool, code=code)] += 1
+    return metrics
+
+
+METRICS_HELP = {
+    "events_total": ("counter", "Number of emitted events by type."),
+    "last_event_timestamp_seconds": ("gauge", "Time of the last event."),
+    "jobs_total": ("counter", "Number of finished jobs by status."),
+    "job_duration_seconds": ("summary", "Duration of the finished jobs."),
+    "bytes_total": ("counter", "Number of transferred bytes of successful jobs."),
+    "rate_bytes_per_second": ("gauge", "Most recent transfer rate."),
+    "requests_total": ("counter", "Number of HTTP requests by status code."),
+}
+
+
+def format_value(value):
+    # Values taken over from the events (like the rate) may be integers.
+    value = float(value)
+    if value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def format_textfile(metrics):
+    lines = []
+    for name, (kind, help_text) in METRICS_HELP.items():
+        full_name = f"{METRICS_PREFIX}_{name}"
+        samples = sorted(
+            (key, value)
+            for key, value in metrics.items()
+            if key.split("{")[0] in (full_name, f"{full_name}_sum", f"{full_name}_count")
+        )
+        if not samples:
+            continue
+        lines.append(f"# HELP {full_name} {help_text}")
+        lines.append(f"# TYPE {full_name} {kind}")
+        lines.extend(f"{key} {format_value(value)}" for key, value in samples)
+    return "\n".join(lines) + "\n"
+
+
+def replace_textfile(textfile_path, metrics):
+    """Writes the metrics into a Prometheus textfile. It's replaced
+    atomically, so that the node_exporter never reads a partial file."""
+    tmp_path = f"{textfile_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as textfile:
+        textfile.write(format_textfile(metrics))
+    os.replace(tmp_path, textfile_path)
+
+
+def update_textfile(events_path, textfile_path, rebuild=False):
+    """Adds the events that were appended since the last update to the
+    metrics of the Prometheus textfile.
+
+    The metrics and the position in the events file up to which they are
+    aggregated are kept in `<textfile>.state`, so that every update only reads
+    the new events. With `rebuild`, or if the state is missing or doesn't fit
+    the events file, all events are aggregated again.
+    """
+    import fcntl
+
+    with open(f"{textfile_path}.state", "a+") as state_file:
+        # Several tools may finish a job at the same time.
+        fcntl.flock(state_file, fcntl.LOCK_EX)
+        state_file.seek(0)
+        try:
+            state = json.loads(state_file.read())
+        except json.JSONDecodeError:
+            state = None
+        with open(events_path, "rb") as events_file:
+            # The events file was truncated or replaced in the meantime.
+            size = os.fstat(events_file.fileno()).st_size
+            if rebuild or state is None or state["offset"] > size:
+                state = {"offset": 0, "metrics": {}}
+            events_file.seek(state["offset"])
+            data = events_file.read()
+        # An incomplete last line is read again on the next update.
+        data = data[: data.rfind(b"\n") + 1]
+        metrics = aggregate(
+            parse_events(data.decode(errors="replace").splitlines()), state["metrics"]
+        )
+        replace_textfile(textfile_path, metrics)
+        state_file.seek(0)
+        state_file.truncate()
+        json.dump({"offset": state["offset"] + len(data), "metrics": metrics}, state_file)
+
+
+def summary(events_path, stale_after):
+    """Prints one line per job with its state, the running jobs that had no
+    event for `stale_after` seconds are marked as stuck."""
+    jobs = {}
+    for event in read_events(events_path):
+        jobs[(event["tool"], event["job"])] = event
+    now = time.time()
+    for (tool, job), event in jobs.items():
+        state = {"end": "done", "fail": "failed"}.get(event["event"], "running")
+        if state == "running" and now - event["ts"] > stale_after:
+            state = "stuck"
+        print(
+            json.dumps(
+                {
+                    "tool": tool,
+                    "job": job,
+                    "state": state,
+                    "bytes": event.get("bytes"),
+                    "duration": event.get("duration"),
+                    "rate": event.get("rate"),
+                }
+            )
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process progress events.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    textfile_parser = subparsers.add_parser(
+        "textfile",
+        help="write the metrics of all events in the Prometheus text format",
+    )
+    textfile_parser.add_argument("events", help="newline delimited JSON events")
+    textfile_parser.add_argument("textfile", help="output file")
+    update_parser = subparsers.add_parser(
+        "update", help="add the events since the last update to the metrics"
+    )
+    update_parser.add_argument("events", help="newline delimited JSON events")
+    update_parser.add_argument("textfile", help="output file")
+    summary_parser = subparsers.add_parser(
+        "summary", help="print the state of every job"
+    )
+    summary_parser.add_argument("events", help="newline delimited JSON events")
+    summary_parser.add_argument(
+        "--stale-after",
+        type=float,
+        default=300,
+        help="seconds without an event after which a job is considered stuck (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "textfile":
+        update_textfile(args.events, args.textfile, rebuild=True)
+    elif args.command == "update":
+        update_textfile(args.events, args.textfile)
+    else:
+        summary(args.events, args.stale_after)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
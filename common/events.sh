@@ -0,0 +1,117 @@
+# SPDX-License-Identifier: MIT
+
+# Shell functions that emit the same progress events as `events.py`. Source
+# this file and set `common_dir` to the directory it is in, e.g.:
+#
+#     common_dir=$(cd "$(dirname "$0")/../../common" && pwd)
+#     . "${common_dir}/events.sh"
+#
+# The events are only emitted if the `EVENTS_FILE` environment variable is
+# set, else all functions are no-ops (except for `events_curl`, which then
+# simply runs `curl`). The name of the tool is the name of the script, it can
+# be changed via the `EVENTS_TOOL` environment variable. As scripts often
+# change the directory, use absolute paths for `EVENTS_FILE` and
+# `EVENTS_TEXTFILE`; relative paths are resolved when this file is sourced.
+#
+# You need to have the following utilities installed:
+# curl, jq, python3 (only for `EVENTS_TEXTFILE`)
+
+events_tool=${EVENTS_TOOL:-$(basename "$0" .sh)}
+events_job=''
+events_started=''
+
+case "${EVENTS_FILE}" in
+    ''|-|/*) ;;
+    *) EVENTS_FILE="$(pwd)/${EVENTS_FILE}" ;;
+esac
+case "${EVENTS_TEXTFILE}" in
+    ''|/*) ;;
+    *) EVENTS_TEXTFILE="$(pwd)/${EVENTS_TEXTFILE}" ;;
+esac
+
+# Emits an event. The optional third argument is a JSON object with additional
+# fields, e.g. `events_emit end talk.mkv '{"bytes": 1024}'`.
+events_emit () {
+    [ -z "${EVENTS_FILE}" ] && return 0
+    events_fields='{}'
+    [ -n "${3}" ] && events_fields=${3}
+    events_line=$(jq --null-input --compact-output --arg tool "${events_tool}" --arg event "${1}" --arg job "${2}" --argjson fields "${events_fields}" '{ts: now, tool: $tool, job: $job, event: $event} + $fields')
+    if [ "${EVENTS_FILE}" = "-" ]
+    then
+        echo "${events_line}" >&2
+    else
+        echo "${events_line}" >> "${EVENTS_FILE}"
+    fi
+}
+
+# Returns the fields with the duration and the rate since the job was started.
+# The first argument is the number of bytes, it may be empty.
+events_progress () {
+    jq --null-input --compact-output --argjson started "${events_started:-null}" --arg bytes "${1}" '
+        (now - ($started // now)) as $duration
+        | {duration: (($duration * 1000 | round) / 1000)}
+        + (if $bytes == "" then {} else {bytes: ($bytes | tonumber)} end)
+        + (if $bytes != "" and $duration > 0 then {rate: ((($bytes | tonumber) / $duration * 10 | round) / 10)} else {} end)'
+}
+
+# Updates the Prometheus textfile if `EVENTS_TEXTFILE` is set.
+events_update_textfile () {
+    if [ -n "${EVENTS_TEXTFILE}" ] && [ "${EVENTS_FILE}" != "-" ]
+    then
+        python3 "${common_dir}/events.py" update "${EVENTS_FILE}" "${EVENTS_TEXTFILE}"
+    fi
+}
+
+# Starts a job. The first argument is the name of the job, the optional second
+# one the total number of bytes.
+events_start () {
+    events_job=${1}
+    [ -z "${EVENTS_FILE}" ] && return 0
+    events_started=$(jq --null-input 'now')
+    if [ -n "${2}" ]
+    then
+        events_emit start "${events_job}" "{\"total_bytes\": ${2}}"
+    else
+        events_emit start "${events_job}"
+    fi
+}
+
+# Ends the current job successfully. The optional argument is the number of
+# transferred bytes.
+events_end () {
+    [ -z "${EVENTS_FILE}" ] && return 0
+    events_emit end "${events_job}" "$(events_progress "${1}")"
+    events_update_textfile
+}
+
+# Ends the current job with a failure. The argument is the error message.
+events_fail () {
+    [ -z "${EVENTS_FILE}" ] && return 0
+    events_emit fail "${events_job}" "$(events_progress '' | jq --compact-output --arg error "${1}" '. + {error: $error}')"
+    events_update_textfile
+}
+
+# Emits a `request` event for the current job. The arguments are the HTTP
+# status code and the exit code of `curl`.
+events_request () {
+    [ -z "${EVENTS_FILE}" ] && return 0
+    events_emit request "${events_job}" "{\"http_code\": \"${1}\", \"exit_code\": ${2}}"
+}
+
+# Runs `curl` with the given arguments and emits a `request` event with the
+# HTTP status code for the current job. The output and the exit code are the
+# ones of `curl`.
+events_curl () {
+    if [ -z "${EVENTS_FILE}" ]
+    then
+        curl "$@"
+        return
+    fi
+    events_headers=$(mktemp)
+    curl --dump-header "${events_headers}" "$@"
+    events_curl_ret=$?
+    # With redirects there are several responses, the last one counts.
+    events_request "$(awk '/^HTTP/ { code = $2 } END { print code }' "${events_headers}")" "${events_curl_ret}"
+    rm -f "${events_headers}"
+    return ${events_curl_ret}
+}
@@ -0,0 +1,200 @@
+# SPDX-License-Identifier: MIT
+
+# Library for the tools that process the recordings with `ffmpeg`.
+#
+# It contains the parts that all of them need: getting information about a
+# file with `ffprobe`, running `ffmpeg`, writing the output only once it's
+# complete and deciding how many files are processed in parallel. It also
+# decodes the audio into [NumPy] arrays and measures its energy. `ffmpeg` and
+# `ffprobe` need to be installed, NumPy only for the audio functions.
+#
+# [NumPy]: https://numpy.org/
+
+import contextlib, json, os, subprocess
+
+# NumPy is only imported by the functions that need it, so that the tools
+# start fast.
+
+# Levels below this are treated as silence, in dBFS.
+SILENCE_DB = -50
+# The number of directories above a video that are kept for its output, e.g.
+# the room and the day of the schedule directory.
+OUTPUT_PARENTS = 2
+
+
+class MediaError(Exception):
+    """Raised when `ffmpeg` or `ffprobe` fails."""
+
+
+def cpu_count():
+    """Returns the number of CPUs this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def threads_per_job(jobs):
+    """Returns the number of threads every `ffmpeg` process should use, so
+    that parallel jobs don't use more threads than there are CPUs."""
+    return max(1, cpu_count() // max(1, jobs))
+
+
+def run(command, capture=False):
+    """Runs `ffmpeg` or `ffprobe` and returns its standard output (as bytes)
+    and its standard error (as text). Raises a `MediaError` if it fails."""
+    result = subprocess.run(
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE if capture else subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    stderr = result.stderr.decode(errors="replace")
+    if result.returncode != 0:
+        last_line = stderr.strip().splitlines()[-1:] or ["no output"]
+        raise MediaError(
+            f"`{command[0]}` failed with exit code {result.returncode}: {last_line[0]}"
+        )
+    return result.stdout, stderr
+
+
+def ffmpeg(*args, capture=False, verbosity="error"):
+    """Runs `ffmpeg` with the given arguments, see `run()`."""
+    return run(
+        ["ffmpeg", "-hide_banner", "-nostats", "-v", verbosity, *args],
+        capture=capture,
+    )
+
+
+def probe(path):
+    """Returns the format and the streams of a file as reported by
+    `ffprobe`."""
+    stdout, _stderr = run(
+        [
+            "ffprobe",
+            "-v",
+            "error",
+            "-print_format",
+            "json",
+            "-show_format",
+            "-show_streams",
+            path,
+        ],
+        capture=True,
+    )
+    return json.loads(stdout)
+
+
+def first_stream(info, codec_type):
+    """Returns the first stream of the given type (`video` or `audio`) of the
+    `probe()` output, or `None`."""
+    for stream in info.get("streams", []):
+        if stream.get("codec_type") == codec_type:
+            return stream
+    return None
+
+
+def output_path(output_dir, video_file, extension):
+    """Returns the path of the output of a video with the given extension.
+
+    The file names of the videos are only unique within their directories,
+    e.g. the same file name can be used on several days. Hence the last
+    `OUTPUT_PARENTS` directories of the video are kept below the output
+    directory, `schedule/room_1/day2/talk.mkv` becomes
+    `<output_dir>/room_1/day2/talk<extension>`."""
+    directory = os.path.normpath(os.path.dirname(video_file))
+    parents = [
+        part for part in directory.split(os.sep) if part not in ("", ".", "..")
+    ]
+    name = os.path.splitext(os.path.basename(video_file))[0]
+    return os.path.join(
+        output_dir, *parents[-OUTPUT_PARENTS:], f"{name}{extension}"
+    )
+
+
+def duplicate_outputs(outputs):
+    """Returns the outputs that several different videos would be written to,
+    e.g. `talk.mkv` and `talk.mp4` of the same directory, mapped to the sorted
+    videos. `outputs` are pairs of a video and its output."""
+    videos = {}
+    for video_file, output in outputs:
+        videos.setdefault(output, set()).add(video_file)
+    return {
+        output: sorted(video_files)
+        for output, video_files in videos.items()
+        if len(video_files) > 1
+    }
+
+
+def is_up_to_date(output, *inputs):
+    """Returns whether the output exists and is newer than all inputs."""
+    try:
+        output_mtime = os.stat(output).st_mtime
+    except FileNotFoundError:
+        return False
+    return all(os.stat(path).st_mtime <= output_mtime for path in inputs)
+
+
+@contextlib.contextmanager
+def atomic_output(path):
+    """Yields a temporary path next to the given one, which is renamed to it
+    once the block succeeds. Interrupted runs therefore never leave an
+    incomplete file that looks up to date."""
+    directory, name = os.path.split(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    stem, extension = os.path.splitext(name)
+    # Keep the extension, `ffmpeg` picks the container format by it.
+    partial = os.path.join(directory, f".{stem}.partial{extension}")
+    try:
+        yield partial
+        os.replace(partial, path)
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(partial)
+
+
+def decode_audio(path, rate, threads=1):
+    """Returns the first audio stream as mono samples between -1 and 1 with
+    the given sample rate."""
+    import numpy as np
+
+    stdout, _stderr = ffmpeg(
+        "-i",
+        path,
+        "-map",
+        "0:a:0",
+        "-ac",
+        "1",
+        "-ar",
+        str(rate),
+        "-threads",
+        str(threads),
+        "-f",
+        "s16le",
+        "-",
+        capture=True,
+    )
+    return np.frombuffer(stdout, dtype="<i2").astype(np.float32) / 32768
+
+
+def rms_db(samples, window):
+    """Returns the RMS level in dBFS of consecutive windows of the given
+    number of samples. An incomplete last window is dropped."""
+    import numpy as np
+
+    count = len(samples) // window
+    windows = samples[: count * window].reshape(count, window)
+    rms = np.sqrt(np.mean(np.square(windows, dtype=np.float64), axis=1))
+    # Digital silence would be minus infinity.
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def runs(mask):
+    """Returns the start and end indexes (exclusive) of the runs of `True`
+    values, as two arrays."""
+    import numpy as np
+
+    padded = np.concatenate(([0], np.asarray(mask, dtype=np.int8), [0]))
+    changes = np.flatnonzero(np.diff(padded))
+    return changes[0::2], changes[1::2]
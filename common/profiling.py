@@ -0,0 +1,154 @@
+# SPDX-License-Identifier: MIT
+
+# Library for opt-in profiling of the Python tools.
+#
+# Profiling is enabled with the `PROFILE` environment variable, which is a
+# comma separated list of:
+#
+#  - `cpu`: the run is profiled with `cProfile`. The stats are written into
+#    the file given in `PROFILE_FILE` (default `<tool>-<pid>.pstats` in the
+#    current directory), which can be inspected with `python3 -m pstats` or
+#    tools like SnakeViz. The functions with the highest cumulative time are
+#    printed to stderr.
+#  - `memory`: the allocations are traced with `tracemalloc`. The peak memory
+#    usage and the lines that allocated the most memory that is still in use
+#    are printed to stderr.
+#  - `sections`: only the wall time of the named sections of a tool (like
+#    `fetch`, `parse`, `render` and `write`) is printed to stderr. It's also
+#    printed with the other modes.
+#
+# `PROFILE_TOP` sets the number of functions or lines that are printed
+# (default 20). The report is printed when the tool exits. Work that is done
+# in worker processes isn't profiled, run those tools with `--jobs 1`.
+#
+# Usage:
+#
+#     import profiling
+#
+#     profiling.start("mdtoyt")
+#     with profiling.section("render"):
+#         ...
+#
+# Without `PROFILE`, `start()` doesn't do anything and the sections cost
+# hardly anything, so that the hooks can stay in the tools.
+
+import atexit, os, sys, time
+
+MODES = {"cpu", "memory", "sections"}
+DEFAULT_TOP = 20
+
+# The state of the profiling run of this process, `None` if it isn't profiled.
+state = None
+
+
+class Profile:
+    def __init__(self, tool, modes, top):
+        self.tool = tool
+        self.modes = modes
+        self.top = top
+        self.profiler = None
+        # The number of calls and the total seconds per section.
+        self.sections = {}
+        self.started = time.perf_counter()
+
+
+class Section:
+    """Adds the wall time of a block to the section with that name."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = time.perf_counter() - self.started
+        calls, total = state.sections.get(self.name, (0, 0.0))
+        state.sections[self.name] = (calls + 1, total + duration)
+
+
+class NoSection:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+NO_SECTION = NoSection()
+
+
+def section(name):
+    """Returns a context manager that measures the wall time of a named
+    section if profiling is enabled."""
+    return NO_SECTION if state is None else Section(name)
+
+
+def start(tool):
+    """Starts profiling the rest of the run of a tool, if it is enabled by the
+    `PROFILE` environment variable. The report is printed on exit."""
+    global state
+    modes = {mode.strip() for mode in os.environ.get("PROFILE", "").split(",")}
+    modes.discard("")
+    if not modes or state is not None:
+        return
+    unknown = modes - MODES
+    if unknown:
+        print(
+            f"Unknown profiling modes {', '.join(sorted(unknown))}, use {', '.join(sorted(MODES))}.",
+            file=sys.stderr,
+        )
+    state = Profile(tool, modes, int(os.environ.get("PROFILE_TOP") or DEFAULT_TOP))
+    if "memory" in modes:
+        import tracemalloc
+
+        tracemalloc.start()
+    if "cpu" in modes:
+        import cProfile
+
+        state.profiler = cProfile.Profile()
+        state.profiler.enable()
+    atexit.register(report)
+
+
+def report():
+    """Stops profiling and prints the report to stderr."""
+    duration = time.perf_counter() - state.started
+    if state.profiler is not None:
+        state.profiler.disable()
+    print(f"Profile of {state.tool} ({duration:.3f}s):", file=sys.stderr)
+
+    for name, (calls, total) in state.sections.items():
+        print(
+            f"  {name}: {total:.3f}s in {calls} calls ({total / duration:.1%})",
+            file=sys.stderr,
+        )
+
+    # The memory is reported first, writing the CPU profile allocates memory.
+    if "memory" in state.modes:
+        import tracemalloc
+
+        _current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            ]
+        )
+        tracemalloc.stop()
+        print(
+            f"Peak memory: {round(peak / 1024 / 1024, 1)} MiB, the lines with the most memory in use:",
+            file=sys.stderr,
+        )
+        for statistic in snapshot.statistics("lineno")[: state.top]:
+            print(f"  {statistic}", file=sys.stderr)
+
+    if state.profiler is not None:
+        import pstats
+
+        path = os.environ.get("PROFILE_FILE") or f"{state.tool}-{os.getpid()}.pstats"
+        state.profiler.dump_stats(path)
+        print(f"CPU profile written to {path}, the top functions:", file=sys.stderr)
+        stats = pstats.Stats(state.profiler, stream=sys.stderr)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(state.top)
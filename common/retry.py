@@ -0,0 +1,172 @@
+# SPDX-License-Identifier: MIT
+
+# Library to retry network calls that failed because of transient errors.
+#
+# The delay between the attempts grows exponentially and is randomized ("full
+# jitter"), so that several clients that failed at the same time don't retry
+# at the same time. If the server sends a `Retry-After` header, it is
+# honoured. Every host has a circuit breaker: after several consecutive
+# failures, no requests are made to that host for a while, so that a server
+# that is down isn't hammered with requests. `retry.sh` implements the same
+# policy for the shell scripts.
+#
+# Usage:
+#
+#     from retry import retry_call
+#     status, response = retry_call(upload.next_chunk, "www.googleapis.com")
+
+import random, sys, time
+
+# HTTP status codes that are worth retrying.
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+# Names of exceptions that signal a transient network problem. They are
+# matched by name, so that neither `requests` nor `urllib` need to be
+# imported.
+RETRYABLE_EXCEPTIONS = {
+    "ConnectionError",
+    "ConnectionResetError",
+    "ConnectTimeout",
+    "ReadTimeout",
+    "RemoteDisconnected",
+    "Timeout",
+    "TimeoutError",
+    "URLError",
+    # The YouTube library tries to parse the body of a failed request as JSON,
+    # which fails if a proxy in between returns an HTML error page.
+    "JSONDecodeError",
+}
+
+
+class RetryPolicy:
+    """How often and how long to wait between attempts."""
+
+    def __init__(self, attempts=6, base_delay=1.0, max_delay=60.0):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        """Returns the delay in seconds before the given (1-based) retry."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+DEFAULT_POLICY = RetryPolicy()
+
+
+class CircuitBreaker:
+    """Stops requests to a host after `threshold` consecutive failures.
+
+    The circuit stays open for `cooldown` seconds, afterwards a single trial
+    request is allowed. If it fails, the circuit opens again with twice the
+    cooldown (up to `max_cooldown`).
+    """
+
+    def __init__(self, threshold=5, cooldown=30.0, max_cooldown=600.0):
+        self.threshold = threshold
+        self.initial_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.failures = 0
+        self.open_until = 0.0
+
+    def remaining(self):
+        """Returns the seconds until requests are allowed again."""
+        return max(0.0, self.open_until - time.monotonic())
+
+    def record_success(self):
+        self.failures = 0
+        self.cooldown = self.initial_cooldown
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.open_until = time.monotonic() + self.cooldown
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+
+
+# The circuit breakers of all hosts of this process.
+breakers = {}
+
+
+def breaker_for(host):
+    if host not in breakers:
+        breakers[host] = CircuitBreaker()
+    return breakers[host]
+
+
+def parse_retry_after(value):
+    """Returns the seconds of a `Retry-After` header, which is either a number
+    of seconds or an HTTP date. Returns `None` if it cannot be parsed."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    # Importing it is slow and it's rarely needed.
+    import email.utils
+
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+def classify(error):
+    """Returns a tuple whether the error is retryable and the delay the server
+    asked for (or `None`)."""
+    # `requests` puts the response on the exception, `urllib` uses the
+    # exception itself as response, the YouTube library does both.
+    response = getattr(error, "response", None)
+    status_code = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if status_code is None and response is not None:
+        status_code = getattr(response, "status_code", None)
+    headers = getattr(response, "headers", None) or getattr(error, "headers", None)
+    retry_after = parse_retry_after(headers.get("Retry-After")) if headers else None
+
+    if isinstance(status_code, int):
+        return status_code in RETRYABLE_STATUS_CODES, retry_after
+    retryable = any(cls.__name__ in RETRYABLE_EXCEPTIONS for cls in type(error).__mro__)
+    return retryable, retry_after
+
+
+def retry_call(func, host, job=None, policy=DEFAULT_POLICY):
+    """Calls `func` until it succeeds, a non-retryable error occurs or all
+    attempts are used up. The last error is re-raised.
+
+    `host` is the host the call goes to, it selects the circuit breaker. If a
+    `job` (see `events.py`) is given, a `retry` event is emitted before every
+    retry.
+    """
+    breaker = breaker_for(host)
+    attempt = 0
+    while True:
+        wait = breaker.remaining()
+        if wait > 0:
+            print(
+                f"Too many failures for {host}, waiting {round(wait)}s.",
+                file=sys.stderr,
+            )
+            time.sleep(wait)
+        try:
+            result = func()
+        except Exception as error:
+            retryable, retry_after = classify(error)
+            if not retryable:
+                raise
+            breaker.record_failure()
+            attempt += 1
+            if attempt >= policy.attempts:
+                raise
+            delay = retry_after if retry_after is not None else policy.delay(attempt)
+            print(
+                f"Attempt {attempt} for {host} failed ({error}), retrying in {round(delay, 1)}s.",
+                file=sys.stderr,
+            )
+            if job is not None:
+                job.retry(attempt, delay, error)
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
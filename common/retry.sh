@@ -0,0 +1,165 @@
+# SPDX-License-Identifier: MIT
+
+# Shell functions to retry `curl` requests that failed because of transient
+# errors, with the same policy as `retry.py`: exponential backoff with full
+# jitter, honouring of `Retry-After` and a circuit breaker per host. Source
+# `events.sh` first, retries are reported as `retry` events:
+#
+#     common_dir=$(cd "$(dirname "$0")/../../common" && pwd)
+#     . "${common_dir}/events.sh"
+#     . "${common_dir}/retry.sh"
+#
+# Then use `retry_curl` instead of `curl`. It takes the same arguments and has
+# the same output and exit code as the last attempt.
+#
+# Requests that may change data on the server (POST requests) are only
+# retried if they certainly didn't reach the server (the connection couldn't
+# be established or the server answered with 429 or 503). This way e.g. a file
+# is never copied twice.
+#
+# The circuit breaker state is stored in files, so that it's shared between
+# all scripts of the current user.
+#
+# You need to have the following utilities installed:
+# awk, curl, date
+
+RETRY_ATTEMPTS=${RETRY_ATTEMPTS:-6}
+RETRY_BASE_DELAY=${RETRY_BASE_DELAY:-1}
+RETRY_MAX_DELAY=${RETRY_MAX_DELAY:-60}
+# Number of consecutive failures after which the circuit opens.
+RETRY_BREAKER_THRESHOLD=${RETRY_BREAKER_THRESHOLD:-5}
+# Seconds the circuit stays open.
+RETRY_BREAKER_COOLDOWN=${RETRY_BREAKER_COOLDOWN:-30}
+
+retry_state_dir="${TMPDIR:-/tmp}/conftools-circuit-$(id -u)"
+
+# Returns a random delay for the given attempt.
+retry_delay () {
+    awk -v attempt="${1}" -v base="${RETRY_BASE_DELAY}" -v max="${RETRY_MAX_DELAY}" -v seed="$(date +%s)$$${1}" 'BEGIN {
+        srand(seed)
+        cap = base * 2 ^ attempt
+        if (cap > max) cap = max
+        printf "%.3f\n", rand() * cap
+    }'
+}
+
+# Returns the seconds of the `Retry-After` header of the given header file, or
+# nothing if there is none.
+retry_after () {
+    retry_after_value=$(awk 'tolower($1) == "retry-after:" { $1 = ""; value = $0 } END { print value }' "${1}" | tr -d '\r' | sed 's/^ *//')
+    case "${retry_after_value}" in
+        '') ;;
+        *[!0-9]*)
+            # It's an HTTP date
+            retry_after_date=$(date --date "${retry_after_value}" +%s 2> /dev/null) || return 0
+            retry_after_seconds=$((retry_after_date - $(date +%s)))
+            [ "${retry_after_seconds}" -lt 0 ] && retry_after_seconds=0
+            echo "${retry_after_seconds}"
+            ;;
+        *) echo "${retry_after_value}" ;;
+    esac
+}
+
+# Waits until the circuit of the host is closed.
+retry_wait_for_breaker () {
+    [ -f "${retry_state_dir}/${1}" ] || return 0
+    # The scripts often split at newlines only, hence the fields of the state
+    # are split at the space explicitly.
+    IFS=' ' read -r retry_failures retry_open_until < "${retry_state_dir}/${1}"
+    retry_wait=$((retry_open_until - $(date +%s)))
+    if [ "${retry_wait}" -gt 0 ]
+    then
+        echo "Too many failures for ${1}, waiting ${retry_wait}s…" >&2
+        sleep "${retry_wait}"
+    fi
+}
+
+retry_record_success () {
+    rm -f "${retry_state_dir}/${1}"
+}
+
+retry_record_failure () {
+    mkdir -p "${retry_state_dir}"
+    retry_failures=0
+    retry_open_until=0
+    if [ -f "${retry_state_dir}/${1}" ]
+    then
+        IFS=' ' read -r retry_failures retry_open_until < "${retry_state_dir}/${1}"
+    fi
+    retry_failures=$((retry_failures + 1))
+    if [ "${retry_failures}" -ge "${RETRY_BREAKER_THRESHOLD}" ]
+    then
+        # Every further failure doubles the time the circuit stays open.
+        retry_exponent=$((retry_failures - RETRY_BREAKER_THRESHOLD))
+        [ "${retry_exponent}" -gt 4 ] && retry_exponent=4
+        retry_open_until=$(($(date +%s) + RETRY_BREAKER_COOLDOWN * (1 << retry_exponent)))
+    fi
+    echo "${retry_failures} ${retry_open_until}" > "${retry_state_dir}/${1}"
+}
+
+# Returns successfully if the request should be retried. The arguments are
+# the exit code of `curl`, the HTTP status code and whether the request is
+# idempotent (`yes` or `no`).
+retry_is_transient () {
+    case "${1}" in
+        # Couldn't resolve host, couldn't connect
+        6|7) return 0 ;;
+        # Timeout, SSL connect error, empty reply, send error, receive error
+        28|35|52|55|56) [ "${3}" = "yes" ]; return ;;
+    esac
+    case "${2}" in
+        429|503) return 0 ;;
+        408|500|502|504) [ "${3}" = "yes" ]; return ;;
+    esac
+    return 1
+}
+
+retry_curl () {
+    retry_host=unknown
+    retry_idempotent=yes
+    for retry_arg in "$@"
+    do
+        case "${retry_arg}" in
+            http://*|https://*)
+                [ "${retry_host}" = "unknown" ] && retry_host=$(echo "${retry_arg}" | cut -d '/' -f 3)
+                ;;
+            POST|-d|--data|--data-*|-F|--form)
+                retry_idempotent=no
+                ;;
+        esac
+    done
+
+    retry_output=$(mktemp)
+    retry_headers=$(mktemp)
+    retry_attempt=0
+    while true
+    do
+        retry_wait_for_breaker "${retry_host}"
+        curl --dump-header "${retry_headers}" "$@" > "${retry_output}"
+        retry_ret=$?
+        # With redirects there are several responses, the last one counts.
+        retry_code=$(awk '/^HTTP/ { code = $2 } END { print code }' "${retry_headers}")
+        events_request "${retry_code}" "${retry_ret}"
+
+        if ! retry_is_transient "${retry_ret}" "${retry_code}" "${retry_idempotent}"
+        then
+            retry_record_success "${retry_host}"
+            break
+        fi
+        retry_record_failure "${retry_host}"
+        retry_attempt=$((retry_attempt + 1))
+        if [ "${retry_attempt}" -ge "${RETRY_ATTEMPTS}" ]
+        then
+            break
+        fi
+        retry_sleep=$(retry_after "${retry_headers}")
+        [ -z "${retry_sleep}" ] && retry_sleep=$(retry_delay "${retry_attempt}")
+        echo "Attempt ${retry_attempt} for ${retry_host} failed (exit code ${retry_ret}, HTTP status ${retry_code:-none}), retrying in ${retry_sleep}s…" >&2
+        events_emit retry "${events_job}" "{\"attempt\": ${retry_attempt}, \"delay\": ${retry_sleep}, \"error\": \"exit code ${retry_ret}, HTTP status ${retry_code}\"}"
+        sleep "${retry_sleep}"
+    done
+
+    cat "${retry_output}"
+    rm -f "${retry_output}" "${retry_headers}"
+    return ${retry_ret}
+}
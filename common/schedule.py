@@ -0,0 +1,203 @@
+# SPDX-License-Identifier: MIT
+
+# Library to read pretalx `schedule.json` exports without loading all of it.
+#
+# The export contains every talk of every day including the full abstracts,
+# for larger conferences that's tens of megabytes. `read_schedule()` reads the
+# file incrementally and only builds the parts that are asked for: days and
+# rooms that aren't needed are skipped without parsing them and the talks
+# only keep the given fields. The result has the same structure as the output
+# of `json.load()`:
+#
+#     from schedule import read_schedule
+#     schedule = read_schedule("schedule.json", days=[2, 3], fields=["url", "title"])
+#     for room, talks in schedule["schedule"]["conference"]["days"][2]["rooms"].items():
+#         ...
+#
+# Days that weren't asked for are `None`, so that the days can still be
+# accessed by their index. Rooms that weren't asked for are left out.
+
+import json, re
+
+# The number of characters that are read at once.
+CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+# Everything up to the next bracket or incomplete string, complete strings
+# (which may contain brackets) are consumed as a whole.
+SKIPPABLE = re.compile(r'[^"{}\[\]]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"{}\[\]]*)*', re.DOTALL)
+
+
+class JSONStream:
+    """Reads JSON values one by one from a file.
+
+    Objects and arrays can be iterated with `members()` and `items()`. They
+    are generators that are positioned at the value of the current member or
+    item, the caller then needs to consume it with `value()`, `skip()` or by
+    iterating over it.
+    """
+
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self, size=None):
+        """Reads more data into the buffer, everything before the current
+        position is dropped. Returns `False` if the end of the file was
+        reached."""
+        chunk = self.file.read(size or self.chunk_size)
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        if not chunk:
+            self.eof = True
+        return bool(chunk)
+
+    def error(self, message):
+        return json.JSONDecodeError(message, self.buffer, self.pos)
+
+    def peek(self):
+        """Returns the next character that isn't whitespace, without consuming
+        it. It's an empty string at the end of the file."""
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise self.error(f"Expecting '{char}'")
+        self.pos += 1
+
+    def value(self):
+        """Returns the next value."""
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # The value might not be completely in the buffer yet.
+                if self.eof:
+                    raise
+                self.fill(size)
+                size *= 2
+                continue
+            # A number might continue after the end of the buffer.
+            if end == len(self.buffer) and not self.eof:
+                self.fill(size)
+                continue
+            self.pos = end
+            return value
+
+    def skip(self):
+        """Skips the next value without decoding it."""
+        if self.peek() not in ('"', "{", "["):
+            self.value()
+            return
+        depth = 0
+        while True:
+            self.pos = SKIPPABLE.match(self.buffer, self.pos).end()
+            if self.pos == len(self.buffer) or self.buffer[self.pos] == '"':
+                # The end of the buffer, or a string that continues after it.
+                if not self.fill():
+                    raise self.error("Unterminated value")
+                continue
+            depth += 1 if self.buffer[self.pos] in "{[" else -1
+            self.pos += 1
+            if depth == 0:
+                return
+
+    def members(self):
+        """Iterates over the keys of the next object."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self.pos += 1
+            else:
+                self.expect("}")
+                return
+
+    def items(self):
+        """Iterates over the indexes of the next array."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            if self.peek() == ",":
+                self.pos += 1
+            else:
+                self.expect("]")
+                return
+
+
+def read_object(stream, readers):
+    """Reads an object, the values of the keys that have a reader are read by
+    calling it, all others are decoded completely."""
+    result = {}
+    for key in stream.members():
+        result[key] = readers[key]() if key in readers else stream.value()
+    return result
+
+
+def read_schedule(path, days=None, rooms=None, fields=None):
+    """Reads a pretalx schedule export.
+
+    `days` are the indexes of the days, `rooms` the names of the rooms and
+    `fields` the keys of the talks to read. If any of them is `None`, all of
+    them are read.
+    """
+    days = None if days is None else set(days)
+    rooms = None if rooms is None else set(rooms)
+
+    def read_talk():
+        talk = stream.value()
+        if fields is None:
+            return talk
+        return {key: talk[key] for key in fields if key in talk}
+
+    def read_rooms():
+        result = {}
+        for room in stream.members():
+            if rooms is None or room in rooms:
+                result[room] = [read_talk() for _ in stream.items()]
+            else:
+                stream.skip()
+        return result
+
+    def read_days():
+        result = []
+        for index in stream.items():
+            if days is None or index in days:
+                result.append(read_object(stream, {"rooms": read_rooms}))
+            else:
+                stream.skip()
+                result.append(None)
+        return result
+
+    with open(path) as schedule_file:
+        stream = JSONStream(schedule_file)
+        return read_object(
+            stream,
+            {
+                "schedule": lambda: read_object(
+                    stream,
+                    {"conference": lambda: read_object(stream, {"days": read_days})},
+                )
+            },
+        )
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: MIT
+
+# Measures how long `conference-tools` takes to start, so that `--help` and
+# light tools stay fast when tools or dependencies are added.
+#
+# Every command is run several times, the median wall time minus the time of
+# starting an empty Python interpreter is the overhead of the command. The
+# slowest imports (as reported by `python -X importtime`) are listed as well,
+# so that it's easy to see what to import lazily. The results are printed as
+# JSON, one object per command:
+#
+#     ./startup-benchmark.py
+#
+# A single command can be measured as well, separate it with `--`:
+#
+#     ./startup-benchmark.py -- upload-video --help
+#
+# The exit code is 1 if the overhead of any command is above the budget.
+
+import argparse, json, os, statistics, subprocess, sys, time
+
+TOOLS = os.path.join(sys.path[0], "..", "conference-tools")
+# The commands that are measured by default: the list of tools and the help
+# of all Python tools that have one.
+DEFAULT_COMMANDS = [
+    ["--help"],
+    ["schedule-uploads", "--help"],
+    ["assign-playlists", "--help"],
+    ["extract-thumbnails", "--help"],
+    ["normalize-videos", "--help"],
+    ["check-audio", "--help"],
+    ["foss4g-2022-metadata", "--help"],
+    ["suggest-cuts", "--help"],
+    ["pretalx-get-all", "--help"],
+    ["email-to-smtp", "--help"],
+    ["events", "--help"],
+]
+
+
+def wall_time(command, runs):
+    """Returns the median wall time in milliseconds."""
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        durations.append((time.perf_counter() - started) * 1000)
+    return statistics.median(durations)
+
+
+def top_level_imports(command):
+    """Returns the top-level imports of the command and their cumulative time
+    in milliseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *command],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    imports = {}
+    for line in result.stderr.splitlines():
+        # The lines look like `import time:       441 |     303500 | pyyoutube`,
+        # nested imports are indented.
+        if not line.startswith("import time:"):
+            continue
+        _self, cumulative, name = line[len("import time:") :].split("|")
+        if not cumulative.strip().isdigit() or name.startswith("  "):
+            continue
+        imports[name.strip()] = int(cumulative) / 1000
+    return imports
+
+
+def slowest_imports(command, count, ignore):
+    """Returns the slowest top-level imports, except for the ignored ones."""
+    imports = sorted(
+        (
+            (ms, name)
+            for name, ms in top_level_imports(command).items()
+            if name not in ignore
+        ),
+        reverse=True,
+    )
+    return [{"module": name, "ms": round(ms, 1)} for ms, name in imports[:count]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure the startup time of conference-tools."
+    )
+    parser.add_argument(
+        "command",
+        nargs="*",
+        help="arguments for conference-tools to measure (default: the help of all tools)",
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=10,
+        help="number of runs per command (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=50,
+        help="maximum overhead in milliseconds (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+    commands = [args.command] if args.command else DEFAULT_COMMANDS
+
+    baseline = wall_time([sys.executable, "-c", "pass"], args.runs)
+    # The modules every interpreter imports on startup are not interesting.
+    baseline_imports = top_level_imports(["-c", "pass"])
+    print(json.dumps({"command": "python -c pass", "ms": round(baseline, 1)}))
+
+    over_budget = False
+    for command in commands:
+        full_command = [sys.executable, TOOLS, *command]
+        ms = wall_time(full_command, args.runs)
+        overhead = ms - baseline
+        print(
+            json.dumps(
+                {
+                    "command": " ".join(["conference-tools", *command]),
+                    "ms": round(ms, 1),
+                    "overhead_ms": round(overhead, 1),
+                    "slowest_imports": slowest_imports(
+                        full_command[1:], 3, baseline_imports
+                    ),
+                }
+            )
+        )
+        if overhead > args.budget:
+            print(
+                f"Error: `conference-tools {' '.join(command)}` takes {round(overhead)} ms longer than an empty interpreter, the budget is {round(args.budget)} ms.",
+                file=sys.stderr,
+            )
+            over_budget = True
+    if over_budget:
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+#!/bin/sh
+
+# SPDX-License-Identifier: MIT
+
+# Checks that `retry_curl` retries a request and opens the circuit breaker,
+# also in scripts that split at newlines only (like most of the Seafile
+# scripts do). No server is needed, the requests go to a closed port.
+#
+#     ./test_retry.sh
+#
+# You need to have the following utilities installed:
+# awk, curl, date
+
+common_dir=$(cd "$(dirname "$0")" && pwd)
+TMPDIR=$(mktemp -d)
+trap 'rm -rf "${TMPDIR}"' EXIT
+export TMPDIR
+EVENTS_FILE=''
+RETRY_ATTEMPTS=3
+RETRY_BASE_DELAY=0
+RETRY_BREAKER_THRESHOLD=2
+RETRY_BREAKER_COOLDOWN=1
+. "${common_dir}/events.sh"
+. "${common_dir}/retry.sh"
+
+IFS="$(printf '%b_' '\n')"; IFS="${IFS%_}"
+
+failed=0
+
+output=$(retry_curl --silent http://127.0.0.1:9/ 2> /dev/null)
+ret=$?
+if [ "${ret}" != "7" ]
+then
+    echo "FAIL: retry_curl exited with ${ret} instead of 7 (couldn't connect)."
+    failed=1
+fi
+
+IFS=' ' read -r failures open_until < "${retry_state_dir}/127.0.0.1:9"
+if [ "${failures}" != "${RETRY_ATTEMPTS}" ]
+then
+    echo "FAIL: ${failures:-no} failures were recorded instead of ${RETRY_ATTEMPTS}."
+    failed=1
+fi
+if [ -z "${open_until}" ] || [ "${open_until}" -le 0 ]
+then
+    echo "FAIL: the circuit breaker wasn't opened."
+    failed=1
+fi
+
+if [ "${failed}" = "0" ]
+then
+    echo "OK"
+fi
+exit "${failed}"
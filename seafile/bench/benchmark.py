@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: MIT
+
+# Runs the Seafile scripts against the fake server of `fake_seafile.py` and
+# reports the number of requests and the wall time of every pipeline. Use it
+# to measure changes to the scripts, e.g.:
+#
+#     ./benchmark.py --talks 50 > before.json
+#
+# The scripts and the `common` directory are copied into a temporary
+# directory together with a `config` that points to the fake server, so that
+# your own `config` isn't used. The pipelines are:
+#
+#  - `createdirs`: `email_upload_links/createdirs.sh` for every talk
+#  - `sync_files`: `copy_uploads/sync_files.sh` from the upload into the
+#    processing directory
+#  - `sync_files_noop`: the same again, when there is nothing left to copy
+#  - `cut_to_schedule`: `cut_to_schedule/get_files_to_copy.sh` and
+#    `cut_to_schedule/copy_files.sh` for the completed talks
+#  - `cut_to_schedule_bump`: the same for a new schedule version where two
+#    talks moved and another one was cut again
+#  - `cut_to_schedule_delta`: that new schedule version created from the
+#    previous one with `cut_to_schedule/apply_schedule_delta.sh`. It must
+#    result in the same files as `cut_to_schedule_bump`, its `matches` is
+#    `false` otherwise and the exit code is 1.
+#
+# You need to have the utilities installed that the scripts need.
+
+import argparse, json, os, shutil, subprocess, sys, tempfile, time
+
+import fake_seafile
+
+TOKEN = "fe91e764226cc534811f0ba32c62a6ac41ad0d7b"
+FIRST_DAY = "2021-06-07"
+
+CONFIG = """export SEAFILE_URL={url}
+export SEAFILE_API_TOKEN={token}
+export SEAFILE_REPO_ID={repo_id}
+export SEAFILE_UPLOAD_DIR=upload
+export SEAFILE_PROCESS_DIR=processing
+export SEAFILE_PROCESS_COMPLETE_DIR=completed
+export SEAFILE_SCHEDULE_DIR=schedule
+export FIRST_DAY={first_day}
+"""
+
+
+def schedule_for(codes):
+    """Returns a schedule like the one `cut_to_schedule.sh` creates."""
+    return {
+        code: {
+            "title": f"Talk number {index}",
+            "room": f"Room {index % 4}",
+            "start": f"2021-06-0{7 + index % 3}T{9 + index % 8:02d}:00:00+02:00",
+        }
+        for index, code in enumerate(codes)
+    }
+
+
+def copy_scripts(workdir):
+    """Copies the scripts into the working directory, next to a copy of the
+    `common` directory, so that the relative paths work."""
+    seafile_dir = os.path.join(sys.path[0], "..")
+    common_dir = os.path.join(seafile_dir, "..", "common")
+    shutil.copytree(
+        seafile_dir,
+        os.path.join(workdir, "seafile"),
+        ignore=shutil.ignore_patterns("bench", "config", "__pycache__", "out"),
+    )
+    shutil.copytree(
+        common_dir,
+        os.path.join(workdir, "common"),
+        ignore=shutil.ignore_patterns("__pycache__"),
+    )
+    return os.path.join(workdir, "seafile")
+
+
+class Pipeline:
+    """A fake server and the environment to run the scripts against it."""
+
+    def __init__(self, seafile_dir):
+        self.seafile_dir = seafile_dir
+        self.server = fake_seafile.serve()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        with open(os.path.join(seafile_dir, "config"), "w") as config_file:
+            config_file.write(
+                CONFIG.format(
+                    url=self.url,
+                    token=TOKEN,
+                    repo_id=fake_seafile.REPO_ID,
+                    first_day=FIRST_DAY,
+                )
+            )
+
+    def args(self, *args):
+        return [self.url, TOKEN, fake_seafile.REPO_ID, *args]
+
+    def run(self, script, *args, cwd=None):
+        """Runs a script of the `seafile` directory and returns its output."""
+        result = subprocess.run(
+            [os.path.join(self.seafile_dir, script), *args],
+            cwd=cwd or self.seafile_dir,
+            env={**os.environ, "FIRST_DAY": FIRST_DAY},
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"{script} failed with exit code {result.returncode}:\n"
+                f"{result.stdout}{result.stderr}"
+            )
+        return result.stdout
+
+    def measure(self, name, func):
+        """Runs the function and returns the requests it caused and the wall
+        time."""
+        self.server.stats.clear()
+        started = time.monotonic()
+        func()
+        duration = time.monotonic() - started
+        stats = dict(sorted(self.server.stats.items()))
+        return {
+            "pipeline": name,
+            "duration": round(duration, 3),
+            "requests": sum(stats.values()),
+            "endpoints": stats,
+        }
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def bench_createdirs(seafile_dir, codes):
+    pipeline = Pipeline(seafile_dir)
+
+    def run():
+        for code in codes:
+            pipeline.run("email_upload_links/createdirs.sh", *pipeline.args(code))
+
+    try:
+        return [pipeline.measure("createdirs", run)]
+    finally:
+        pipeline.close()
+
+
+def bench_sync_files(seafile_dir, talks, files_per_talk, duplicates_per_talk):
+    pipeline = Pipeline(seafile_dir)
+    fake_seafile.seed_uploads(
+        pipeline.server.tree, "upload", talks, files_per_talk, duplicates_per_talk
+    )
+
+    def run():
+        pipeline.run(
+            "copy_uploads/sync_files.sh", *pipeline.args("upload", "processing")
+        )
+
+    try:
+        return [
+            pipeline.measure("sync_files", run),
+            pipeline.measure("sync_files_noop", run),
+        ]
+    finally:
+        pipeline.close()
+
+
+def files_below(tree, path):
+    """Returns the files below a directory with their object IDs, relative to
+    the directory."""
+    prefix = path.rstrip("/") + "/"
+    return sorted(
+        (node_path[len(prefix) :], node["id"])
+        for node_path, node in tree.nodes.items()
+        if node_path.startswith(prefix) and node["type"] == "file"
+    )
+
+
+def bench_cut_to_schedule(seafile_dir, talks, files_per_talk):
+    pipeline = Pipeline(seafile_dir)
+    codes = fake_seafile.seed_uploads(
+        pipeline.server.tree, "processing/completed", talks, files_per_talk
+    )
+    out_dir = os.path.join(seafile_dir, "cut_to_schedule", "out")
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "schedule.json"), "w") as schedule_file:
+        json.dump(schedule_for(codes), schedule_file)
+
+    def run(target_dir, *talks_file):
+        files_to_copy = pipeline.run(
+            "cut_to_schedule/get_files_to_copy.sh",
+            *pipeline.args("processing/completed", target_dir, *talks_file),
+            cwd=out_dir,
+        )
+        with open(os.path.join(out_dir, "files_to_copy.txt"), "w") as files_file:
+            files_file.write(files_to_copy)
+        pipeline.run(
+            "cut_to_schedule/copy_files.sh",
+            *pipeline.args("files_to_copy.txt"),
+            cwd=out_dir,
+        )
+
+    def run_delta():
+        talks = pipeline.run(
+            "cut_to_schedule/apply_schedule_delta.sh",
+            *pipeline.args(
+                "processing/completed",
+                "schedule/1",
+                "schedule/3",
+                "schedule-1.json",
+                "schedule.json",
+            ),
+            cwd=out_dir,
+        )
+        with open(os.path.join(out_dir, "talks_to_copy.txt"), "w") as talks_file:
+            talks_file.write(talks)
+        run("schedule/3", "talks_to_copy.txt")
+
+    try:
+        results = [pipeline.measure("cut_to_schedule", lambda: run("schedule/1"))]
+        # The next schedule version, where two talks moved.
+        schedule = schedule_for(codes)
+        with open(os.path.join(out_dir, "schedule-1.json"), "w") as schedule_file:
+            json.dump(schedule, schedule_file)
+        for code in codes[:2]:
+            schedule[code]["start"] = schedule[code]["start"].replace(":00:00", ":30:00")
+        with open(os.path.join(out_dir, "schedule.json"), "w") as schedule_file:
+            json.dump(schedule, schedule_file)
+        # A talk that didn't move was cut again.
+        pipeline.server.tree.add_file(
+            f"/processing/completed/{codes[2]}/recording-cut.mkv", 1024 * 1024
+        )
+        results.append(
+            pipeline.measure("cut_to_schedule_bump", lambda: run("schedule/2"))
+        )
+        delta = pipeline.measure("cut_to_schedule_delta", run_delta)
+        tree = pipeline.server.tree
+        delta["matches"] = files_below(tree, "/schedule/3") == files_below(
+            tree, "/schedule/2"
+        )
+        results.append(delta)
+        return results
+    finally:
+        pipeline.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure the requests and the wall time of the Seafile scripts."
+    )
+    parser.add_argument(
+        "--talks", type=int, default=20, help="number of talks (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--files-per-talk",
+        type=int,
+        default=1,
+        help="number of uploaded files per talk (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--duplicates-per-talk",
+        type=int,
+        default=0,
+        help="number of additional identical uploads per talk (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--only",
+        action="append",
+        choices=["createdirs", "sync_files", "cut_to_schedule"],
+        help="only run this pipeline, can be given several times",
+    )
+    args = parser.parse_args(argv)
+    only = args.only or ["createdirs", "sync_files", "cut_to_schedule"]
+
+    # The scripts use the retry functions, don't share their state with the
+    # ones that talk to a real server.
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["TMPDIR"] = workdir
+        seafile_dir = copy_scripts(workdir)
+        results = []
+        if "createdirs" in only:
+            codes = [f"T{number:05d}" for number in range(args.talks)]
+            results += bench_createdirs(seafile_dir, codes)
+        if "sync_files" in only:
+            results += bench_sync_files(
+                seafile_dir, args.talks, args.files_per_talk, args.duplicates_per_talk
+            )
+        if "cut_to_schedule" in only:
+            results += bench_cut_to_schedule(
+                seafile_dir, args.talks, args.files_per_talk
+            )
+
+    for result in results:
+        print(json.dumps({"talks": args.talks, **result}))
+    if not all(result.get("matches", True) for result in results):
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: MIT
+
+# A local stand-in for a Seafile server, so that the scripts can be run and
+# measured without touching the production server.
+#
+# It implements the parts of the `api2` and `api/v2.1` endpoints that the
+# scripts of this repository use on top of a directory tree that is kept in
+# memory:
+#
+#  - GET  /api2/repos/<repo-id>/dir/?p=<path>[&t=d|f][&recursive=1]: list a
+#    directory
+#  - POST /api2/repos/<repo-id>/dir/?p=<path> (operation=mkdir)
+#  - GET  /api/v2.1/repos/<repo-id>/dir/detail/?path=<path>
+#  - GET  /api2/repos/<repo-id>/file/?p=<path>: the download link of a file,
+#    the download itself isn't implemented
+#  - GET  /api2/repos/<repo-id>/file/detail/?p=<path>
+#  - POST /api2/repos/<repo-id>/file/?p=<path> (operation=copy|rename)
+#  - POST /api2/repos/<repo-id>/fileops/copy/?p=<parent-dir> (file_names,
+#    dst_repo, dst_dir): copy files or directories
+#  - POST /api2/repos/<repo-id>/fileops/delete/?p=<parent-dir> (file_names)
+#  - GET  /api2/repos/<repo-id>/upload-link/?p=<path>
+#  - POST /api/v2.1/upload-links/ (path, repo_id)
+#  - POST /upload-api/<token> (multipart with file, parent_dir, relative_path)
+#
+# Every request is counted, `GET /_stats` returns the counts per endpoint as
+# JSON, `POST /_reset_stats` resets them. Any token is accepted, but it must be
+# given.
+#
+# It can be used as library (see `benchmark.py`) or be started standalone,
+# optionally with some talks in the upload directory:
+#
+#     ./fake_seafile.py --port 8000 --seed-talks 10
+#
+# Then point `SEAFILE_URL` in `../config` to `http://127.0.0.1:8000`.
+
+import argparse, email.parser, email.policy, hashlib, json, posixpath, re, sys, threading
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+REPO_ID = "280b593a-f868-0594-d97a-23d88822a35f"
+UPLOAD_TOKEN = "2e2424a0-6802-48cd-b134-4d6fd6e48a52"
+
+
+def normalize(path):
+    """Returns the path with a leading and without a trailing slash."""
+    return posixpath.normpath("/" + path.strip("/")) if path.strip("/") else "/"
+
+
+class Tree:
+    """A directory tree with files that only have a size."""
+
+    def __init__(self):
+        self.nodes = {"/": {"type": "dir", "mtime": 0}}
+        # The names of the children of every directory.
+        self.entries = defaultdict(set)
+        self.clock = 0
+        self.lock = threading.Lock()
+
+    def tick(self):
+        self.clock += 1
+        return self.clock
+
+    def touch(self, path):
+        """Updates the modification time of the directory and all its parents,
+        so that their object IDs change."""
+        clock = self.tick()
+        while True:
+            self.nodes[path]["mtime"] = clock
+            if path == "/":
+                break
+            path = posixpath.dirname(path)
+
+    def insert(self, path, node):
+        parent, name = posixpath.split(path)
+        self.nodes[path] = node
+        self.entries[parent].add(name)
+        self.touch(parent)
+
+    def remove(self, path):
+        parent, name = posixpath.split(path)
+        self.entries[parent].discard(name)
+        self.touch(parent)
+        return self.nodes.pop(path)
+
+    def object_id(self, path):
+        """Returns an ID that changes whenever anything in the directory
+        changes (like the object IDs of Seafile)."""
+        children = sorted(
+            (name, self.nodes[posixpath.join(path, name)]["mtime"])
+            for name in self.entries[path]
+        )
+        return hashlib.sha1(json.dumps([path, children]).encode()).hexdigest()
+
+    def is_dir(self, path):
+        return self.nodes.get(path, {}).get("type") == "dir"
+
+    def is_file(self, path):
+        return self.nodes.get(path, {}).get("type") == "file"
+
+    def mkdir(self, path, parents=False):
+        parent = posixpath.dirname(path)
+        if not self.is_dir(parent):
+            if not parents:
+                return False
+            self.mkdir(parent, parents=True)
+        if path not in self.nodes:
+            self.insert(path, {"type": "dir", "mtime": self.clock})
+        return self.is_dir(path)
+
+    def add_file(self, path, size=0, object_id=None):
+        """Adds a file, like Seafile a suffix is added if there already is one
+        with the same name. Returns the name of the new file.
+
+        Like in Seafile the object ID of a file depends on its content. As the
+        content isn't stored, files with the same object ID are considered
+        identical. If it isn't given, the file gets a unique one."""
+        parent, name = posixpath.split(path)
+        self.mkdir(parent, parents=True)
+        stem, ext = posixpath.splitext(name)
+        counter = 1
+        while posixpath.join(parent, name) in self.nodes:
+            name = f"{stem} ({counter}){ext}"
+            counter += 1
+        if object_id is None:
+            unique = f"{parent}/{name}{self.clock}"
+            object_id = hashlib.sha1(unique.encode()).hexdigest()
+        self.insert(
+            posixpath.join(parent, name),
+            {"type": "file", "mtime": self.clock, "size": size, "id": object_id},
+        )
+        return name
+
+    def copy(self, path, dst_dir):
+        """Copies a file or a directory with all its contents into another
+        directory."""
+        node = self.nodes[path]
+        target = posixpath.join(dst_dir, posixpath.basename(path))
+        if node["type"] == "file":
+            self.add_file(target, node["size"], node["id"])
+            return
+        self.mkdir(target)
+        for name in sorted(self.entries[path]):
+            self.copy(posixpath.join(path, name), target)
+
+    def delete(self, path):
+        """Removes a file or a directory with all its contents."""
+        for name in list(self.entries.get(path, ())):
+            self.delete(posixpath.join(path, name))
+        self.entries.pop(path, None)
+        self.remove(path)
+
+    def listing(self, path, kind=None, recursive=False):
+        """Returns the entries of a directory. With `recursive` the entries of
+        all sub-directories are returned as well, together with their
+        `parent_dir`."""
+        entries = []
+        for name in sorted(self.entries[path]):
+            child = posixpath.join(path, name)
+            node = self.nodes[child]
+            if recursive and node["type"] == "dir":
+                entries.extend(self.listing(child, kind, recursive))
+            if kind == "d" and node["type"] != "dir":
+                continue
+            if kind == "f" and node["type"] != "file":
+                continue
+            if node["type"] == "dir":
+                object_id = self.object_id(child)
+            else:
+                object_id = node["id"]
+            entry = {
+                "id": object_id,
+                "type": node["type"],
+                "name": name,
+                "mtime": node["mtime"],
+            }
+            if node["type"] == "file":
+                entry["size"] = node["size"]
+            if recursive:
+                entry["parent_dir"] = path
+            entries.append(entry)
+        return entries
+
+
+class Handler(BaseHTTPRequestHandler):
+    # Set by `serve()`.
+    tree = None
+    stats = None
+    base_url = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, data, headers=None):
+        body = json.dumps(data, separators=(",", ":")).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_form(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.startswith("multipart/form-data"):
+            message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode() + body
+            )
+            form = {}
+            for part in message.iter_parts():
+                name = part.get_param("name", header="content-disposition")
+                payload = part.get_payload(decode=True)
+                filename = part.get_filename()
+                form[name] = (filename, payload) if filename else payload.decode()
+            return form
+        return {key: values[0] for key, values in parse_qs(body.decode()).items()}
+
+    def route(self, method):
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        path = re.sub(r"/repos/[^/]+/", "/repos/{repo}/", url.path)
+        path = re.sub(r"^/upload-api/.*", "/upload-api/{token}", path)
+        self.stats[f"{method} {path}"] += 1
+        return path, query
+
+    def authorized(self):
+        if self.headers.get("Authorization", "").startswith("Token "):
+            return True
+        self.send_json(401, {"detail": "Authentication credentials were not provided."})
+        return False
+
+    def do_GET(self):
+        path, query = self.route("GET")
+        if path == "/_stats":
+            return self.send_json(200, dict(self.stats))
+        if not self.authorized():
+            return
+        tree = self.tree
+        with tree.lock:
+            if path == "/api2/repos/{repo}/dir/":
+                dir_path = normalize(query.get("p", "/"))
+                if not tree.is_dir(dir_path):
+                    return self.send_json(404, {"error_msg": "Folder not found."})
+                return self.send_json(
+                    200,
+                    tree.listing(
+                        dir_path, query.get("t"), query.get("recursive") == "1"
+                    ),
+                    {"oid": tree.object_id(dir_path)},
+                )
+            if path == "/api/v2.1/repos/{repo}/dir/detail/":
+                dir_path = normalize(query.get("path", "/"))
+                if not tree.is_dir(dir_path):
+                    return self.send_json(404, {"error_msg": "Folder not found."})
+                return self.send_json(
+                    200,
+                    {
+                        "repo_id": REPO_ID,
+                        "path": dir_path,
+                        "name": posixpath.basename(dir_path),
+                        "mtime": tree.nodes[dir_path]["mtime"],
+                    },
+                )
+            if path == "/api2/repos/{repo}/file/detail/":
+                file_path = normalize(query.get("p", "/"))
+                if not tree.is_file(file_path):
+                    return self.send_json(404, {"error_msg": "File not found."})
+                node = tree.nodes[file_path]
+                return self.send_json(
+                    200,
+                    {
+                        "type": "file",
+                        "name": posixpath.basename(file_path),
+                        "size": node["size"],
+                        "mtime": node["mtime"],
+                    },
+                )
+            if path == "/api2/repos/{repo}/file/":
+                file_path = normalize(query.get("p", "/"))
+                if not tree.is_file(file_path):
+                    return self.send_json(404, {"error_msg": "File not found."})
+                file_id = tree.nodes[file_path]["id"]
+                return self.send_json(200, f"{self.base_url}/seafhttp/files/{file_id}")
+            if path == "/api2/repos/{repo}/upload-link/":
+                return self.send_json(200, f"{self.base_url}/upload-api/{UPLOAD_TOKEN}")
+        self.send_json(404, {"error_msg": "Not found."})
+
+    def do_POST(self):
+        path, query = self.route("POST")
+        if path == "/_reset_stats":
+            self.stats.clear()
+            return self.send_json(200, "success")
+        if path != "/upload-api/{token}" and not self.authorized():
+            return
+        form = self.read_form()
+        tree = self.tree
+        with tree.lock:
+            if path == "/api2/repos/{repo}/dir/" and form.get("operation") == "mkdir":
+                if tree.mkdir(normalize(query.get("p", "/"))):
+                    return self.send_json(200, "success")
+                return self.send_json(400, {"error_msg": "Parent folder not found."})
+            if path == "/api2/repos/{repo}/file/":
+                file_path = normalize(query.get("p", "/"))
+                if not tree.is_file(file_path):
+                    return self.send_json(404, {"error_msg": "File not found."})
+                if form.get("operation") == "copy":
+                    dst_dir = normalize(form["dst_dir"])
+                    if not tree.is_dir(dst_dir):
+                        return self.send_json(404, {"error_msg": "Folder not found."})
+                    name = tree.add_file(
+                        posixpath.join(dst_dir, posixpath.basename(file_path)),
+                        tree.nodes[file_path]["size"],
+                        tree.nodes[file_path]["id"],
+                    )
+                    return self.send_json(
+                        200,
+                        {
+                            "repo_id": form["dst_repo"],
+                            "parent_dir": dst_dir.rstrip("/") + "/",
+                            "obj_name": name,
+                        },
+                    )
+                if form.get("operation") == "rename":
+                    parent = posixpath.dirname(file_path)
+                    new_path = posixpath.join(parent, form["newname"])
+                    tree.insert(new_path, tree.remove(file_path))
+                    return self.send_json(200, "success")
+            if path in (
+                "/api2/repos/{repo}/fileops/copy/",
+                "/api2/repos/{repo}/fileops/delete/",
+            ):
+                parent = normalize(query.get("p", "/"))
+                paths = [
+                    posixpath.join(parent, name)
+                    for name in form.get("file_names", "").split(":")
+                ]
+                if not all(path_ in tree.nodes for path_ in paths):
+                    return self.send_json(404, {"error_msg": "File not found."})
+                if path.endswith("/delete/"):
+                    for path_ in paths:
+                        tree.delete(path_)
+                    return self.send_json(200, "success")
+                dst_dir = normalize(form["dst_dir"])
+                if not tree.is_dir(dst_dir):
+                    return self.send_json(404, {"error_msg": "Folder not found."})
+                for path_ in paths:
+                    tree.copy(path_, dst_dir)
+                return self.send_json(200, "success")
+            if path == "/api/v2.1/upload-links/":
+                dir_path = normalize(form["path"])
+                if not tree.is_dir(dir_path):
+                    return self.send_json(404, {"error_msg": "Folder not found."})
+                token = hashlib.sha1(dir_path.encode()).hexdigest()[:20]
+                return self.send_json(
+                    200,
+                    {
+                        "repo_id": form["repo_id"],
+                        "path": dir_path + "/",
+                        "obj_name": posixpath.basename(dir_path),
+                        "link": f"{self.base_url}/u/d/{token}/",
+                        "token": token,
+                    },
+                )
+            if path == "/upload-api/{token}":
+                filename, payload = form["file"]
+                relative_path = form.get("relative_path", "")
+                parent = normalize(f"{form['parent_dir']}/{relative_path}")
+                name = tree.add_file(
+                    posixpath.join(parent, filename),
+                    len(payload),
+                    hashlib.sha1(payload).hexdigest(),
+                )
+                return self.send_json(200, [{"name": name, "size": len(payload)}])
+        self.send_json(400, {"error_msg": "Unsupported operation."})
+
+
+def serve(port=0, tree=None):
+    """Starts the server in a background thread and returns it. The actual
+    port is `server.server_address[1]`, the request counts are in
+    `server.stats` and the tree in `server.tree`."""
+    tree = tree if tree is not None else Tree()
+    stats = Counter()
+    handler = type("BoundHandler", (Handler,), {"tree": tree, "stats": stats})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    handler.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    server.tree = tree
+    server.stats = stats
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def seed_uploads(tree, upload_dir, talks, files_per_talk=1, duplicates_per_talk=0):
+    """Adds talks with uploaded videos, the directories are named like pretalx
+    IDs. `duplicates_per_talk` is the number of additional identical copies of
+    the first video under a different name, like a speaker who uploaded the
+    same file again."""
+    codes = [f"T{number:05d}" for number in range(talks)]
+    for code in codes:
+        for index in range(files_per_talk):
+            tree.add_file(f"/{upload_dir}/{code}/recording-{index}.mkv", 1024 * 1024)
+        first_id = tree.nodes[f"/{upload_dir}/{code}/recording-0.mkv"]["id"]
+        for index in range(duplicates_per_talk):
+            tree.add_file(
+                f"/{upload_dir}/{code}/reupload-{index}.mkv", 1024 * 1024, first_id
+            )
+    return codes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a fake Seafile server.")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--seed-talks",
+        type=int,
+        default=0,
+        help="number of talks with an upload in the `upload` directory",
+    )
+    args = parser.parse_args(argv)
+
+    server = serve(args.port)
+    seed_uploads(server.tree, "upload", args.seed_talks)
+    print(
+        f"Fake Seafile running at http://127.0.0.1:{args.port}, repo ID {REPO_ID}",
+        file=sys.stderr,
+    )
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: MIT
+
+# A local stand-in for an SMTP relay, so that `../utils/email_to_smtp.py` can be
+# tried without sending real emails.
+#
+# It speaks enough SMTP for Python's `smtplib`: `EHLO`/`HELO`, `AUTH PLAIN` and
+# `AUTH LOGIN` (any login is accepted), `MAIL`, `RCPT`, `DATA`, `RSET`, `NOOP`
+# and `QUIT`. It doesn't support TLS, set `SMTP_SECURITY=none`. The emails
+# aren't delivered, every one is logged with its recipient and optionally
+# stored in a directory. When it's stopped, it prints the number of
+# connections, logins and emails as JSON.
+#
+# Like many relays it can close a connection after a number of emails, to see
+# whether the sender reconnects:
+#
+#     ./fake_smtp.py --port 8025 --max-per-connection 20 --output-dir /tmp/mails
+#
+# Then set `SMTP_HOST=127.0.0.1`, `SMTP_PORT=8025` and `SMTP_SECURITY=none` in
+# `../config`.
+
+import argparse, json, os, socketserver, sys, threading
+from collections import Counter
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def readline(self):
+        return self.rfile.readline().decode("utf-8", "replace").rstrip("\r\n")
+
+    def handle(self):
+        server = self.server
+        server.count("connections")
+        self.reply("220 fake_smtp ready")
+        sent = 0
+        recipients = []
+        while line := self.readline():
+            command, _space, argument = line.partition(" ")
+            command = command.upper()
+            if command == "EHLO":
+                self.reply("250-fake_smtp")
+                self.reply("250-AUTH PLAIN LOGIN")
+                self.reply("250-8BITMIME")
+                self.reply("250 SMTPUTF8")
+            elif command == "HELO":
+                self.reply("250 fake_smtp")
+            elif command == "AUTH":
+                mechanism, _space, initial = argument.partition(" ")
+                # `LOGIN` asks for the user and the password, `PLAIN` for both
+                # at once, unless the client sent them with the command.
+                prompts = 2 if mechanism.upper() == "LOGIN" else 1
+                for _prompt in range(prompts - (1 if initial else 0)):
+                    self.reply("334 ")
+                    self.readline()
+                server.count("logins")
+                self.reply("235 2.7.0 Authentication successful")
+            elif command == "MAIL":
+                recipients = []
+                self.reply("250 2.1.0 OK")
+            elif command == "RCPT":
+                recipients.append(argument.partition(":")[2].strip().strip("<>"))
+                self.reply("250 2.1.5 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while (data_line := self.readline()) != ".":
+                    # Lines starting with a dot are escaped with another one.
+                    lines.append(data_line[1:] if data_line[:2] == ".." else data_line)
+                server.store(recipients, "\n".join(lines) + "\n")
+                sent += 1
+                self.reply("250 2.0.0 OK queued")
+                if server.max_per_connection and sent >= server.max_per_connection:
+                    self.reply("421 4.7.0 Too many messages, closing connection")
+                    return
+            elif command in ("RSET", "NOOP"):
+                recipients = []
+                self.reply("250 2.0.0 OK")
+            elif command == "QUIT":
+                self.reply("221 2.0.0 Bye")
+                return
+            else:
+                self.reply("502 5.5.2 Command not implemented")
+
+
+class FakeSmtp(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, max_per_connection=0, output_dir=None):
+        super().__init__(address, Handler)
+        self.max_per_connection = max_per_connection
+        self.output_dir = output_dir
+        self.stats = Counter()
+        self.lock = threading.Lock()
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def store(self, recipients, message):
+        with self.lock:
+            self.stats["emails"] += 1
+            number = self.stats["emails"]
+        print(f"Email {number} to {', '.join(recipients)}", file=sys.stderr)
+        if self.output_dir is not None:
+            path = os.path.join(self.output_dir, f"{number:05d}.eml")
+            with open(path, "w") as message_file:
+                message_file.write(message)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="A local stand-in for an SMTP relay."
+    )
+    parser.add_argument(
+        "--port", type=int, default=8025, help="default: %(default)s"
+    )
+    parser.add_argument(
+        "--max-per-connection",
+        type=int,
+        default=0,
+        help="close a connection after that many emails (default: never)",
+    )
+    parser.add_argument("--output-dir", help="directory to store the emails in")
+    args = parser.parse_args(argv)
+
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir, exist_ok=True)
+    server = FakeSmtp(
+        ("127.0.0.1", args.port), args.max_per_connection, args.output_dir
+    )
+    print(f"Listening on 127.0.0.1:{args.port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(dict(server.stats)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
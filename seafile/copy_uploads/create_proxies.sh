@@ -0,0 +1,111 @@
+#!/bin/sh
+#set -o xtrace
+
+# SPDX-License-Identifier: MIT
+
+# This script creates small review copies (proxies) of the uploaded videos in
+# the processing directory and uploads them next to the info file, so that
+# reviewers don't need to download the full resolution upload. A proxy is
+# named after the pretalx ID and the video, e.g. `ABC123.talk.proxy.mp4` for
+# `ABC123/talk.mkv`.
+#
+# Only the talks with the given pretalx IDs are processed, all talks if none
+# are given. Videos that already have a proxy are skipped. The proxies are
+# created in parallel, as many as there are CPUs by default (set the
+# `PROXY_JOBS` environment variable to change that). If another run is still
+# going on, the script waits for it.
+#
+# You need to have the following utilities installed:
+# curl, ffmpeg, flock, jq, xargs
+
+cd $(dirname $0)
+. ../config
+common_dir=$(cd ../../common && pwd)
+. "${common_dir}/events.sh"
+. "${common_dir}/retry.sh"
+
+seafile_api_v20="${SEAFILE_URL}/api2"
+
+# In this script we always only want to split at newlines in for loops
+# https://github.com/koalaman/shellcheck/wiki/SC2039#c-style-escapes
+IFS="$(printf '%b_' '\n')"; IFS="${IFS%_}"
+
+mkdir -p out/proxies
+cd out || exit 2
+
+exec 8> .proxies.lock
+flock 8
+
+jobs=${PROXY_JOBS:-$(nproc)}
+# The CPUs are shared between the parallel `ffmpeg` processes.
+threads=$(( $(nproc) / jobs ))
+[ "${threads}" -lt 1 ] && threads=1
+export PROXY_THREADS="${threads}"
+
+if [ "${#}" -eq 0 ]
+then
+    # shellcheck disable=SC2046 # The pretalx IDs don't contain whitespace
+    set -- $(retry_curl --silent -X GET --header "Authorization: Token ${SEAFILE_API_TOKEN}" "${seafile_api_v20}/repos/${SEAFILE_REPO_ID}/dir/?p=/${SEAFILE_PROCESS_DIR}&t=d"|jq --raw-output --arg completed "${SEAFILE_PROCESS_COMPLETE_DIR}" '.[].name | select(. != $completed)')
+fi
+
+# The videos that need a proxy, as NUL separated pairs of the video on Seafile
+# and the local proxy file, for `xargs`.
+jobs_file=$(mktemp)
+proxies_file=$(mktemp)
+trap 'rm -f "${jobs_file}" "${proxies_file}"' EXIT
+for code in "$@"
+do
+    files=$(retry_curl --silent -X GET --header "Authorization: Token ${SEAFILE_API_TOKEN}" "${seafile_api_v20}/repos/${SEAFILE_REPO_ID}/dir/?p=/${SEAFILE_PROCESS_DIR}/${code}&t=f"|jq --raw-output '.[].name')
+    for file in ${files}
+    do
+        case "${file}" in
+            *.proxy.mp4) continue ;;
+            *.mkv|*.mp4|*.MKV|*.MP4) ;;
+            *) continue ;;
+        esac
+        # The name must not contain characters that `curl --form` treats
+        # specially.
+        proxy="proxies/${code}.$(printf '%s' "${file%.*}" | tr -c 'A-Za-z0-9_-' '_').proxy.mp4"
+        if echo "${files}" | grep --quiet --line-regexp --fixed-strings "$(basename "${proxy}")"
+        then
+            rm -f "${proxy}"
+            continue
+        fi
+        echo "${proxy}" >> "${proxies_file}"
+        # The proxy might be left over from a run where the upload failed.
+        if [ ! -f "${proxy}" ]
+        then
+            printf '%s\0%s\0' "/${SEAFILE_PROCESS_DIR}/${code}/${file}" "${proxy}" >> "${jobs_file}"
+        fi
+    done
+done
+
+if [ ! -s "${proxies_file}" ]
+then
+    echo "No proxies need to be created."
+    exit 0
+fi
+
+echo "Creating $(wc -l < "${proxies_file}" | tr -d " ") proxies, ${jobs} in parallel…"
+if [ -s "${jobs_file}" ]
+then
+    xargs -0 -n 2 -P "${jobs}" ../create_proxy.sh < "${jobs_file}"
+fi
+
+# Upload all proxies that were created with a single call.
+created_proxies=$(while read -r proxy; do [ -f "${proxy}" ] && echo "${proxy}"; done < "${proxies_file}")
+if [ "${created_proxies}" = "" ]
+then
+    echo "Error: no proxy could be created."
+    exit 3
+fi
+upload_api_link=$(retry_curl --silent -X GET --header "Authorization: Token ${SEAFILE_API_TOKEN}" "${seafile_api_v20}/repos/${SEAFILE_REPO_ID}/upload-link/?p=/${SEAFILE_PROCESS_DIR}/"|jq --raw-output '.')
+# shellcheck disable=SC2086 # Split at newlines only
+if ! ../upload_files.sh "${upload_api_link}" "${SEAFILE_PROCESS_DIR}" ${created_proxies}
+then
+    echo "Error: not all proxies could be uploaded."
+    exit 4
+fi
+# shellcheck disable=SC2086 # Split at newlines only
+rm -f ${created_proxies}
+echo "Proxies were successfully uploaded."
@@ -0,0 +1,86 @@
+#!/bin/sh
+#set -o xtrace
+
+# SPDX-License-Identifier: MIT
+
+# This script creates a small review copy (a proxy) of a video on Seafile. The
+# video is streamed from Seafile, it isn't downloaded completely. The proxy
+# has a height of 360 pixels and a low bitrate, so that reviewers can quickly
+# check whether it's the right talk and whether it's cut correctly.
+#
+# The number of threads `ffmpeg` uses can be set with the `PROXY_THREADS`
+# environment variable.
+#
+# If the `EVENTS_FILE` environment variable is set, progress events are written
+# to it, see `../../common/events.sh` for details.
+#
+# You need to have the following utilities installed:
+# curl, ffmpeg, jq
+
+if [ "${#}" -lt 2 ]; then
+    echo "Usage: $(basename "${0}") <seafile-file> <output-file>"
+    echo ""
+    echo "Example: $(basename "${0}") /processing/ABC123/talk.mkv ABC123.talk.proxy.mp4"
+    exit 1
+fi
+
+seafile_file=${1}
+# The output file is relative to the current directory, not to this script.
+output_file="$(cd "$(dirname "${2}")" && pwd)/$(basename "${2}")"
+
+cd $(dirname $0)
+. ../config
+common_dir=$(cd ../../common && pwd)
+. "${common_dir}/events.sh"
+. "${common_dir}/retry.sh"
+
+# https://unix.stackexchange.com/questions/60653/urlencode-function/60698#60698
+urlencode () {
+  string=$1; format=; set --
+  while
+    literal=${string%%[!-._~0-9A-Za-z]*}
+    case "$literal" in
+      ?*)
+        format=$format%s
+        set -- "$@" "$literal"
+        string=${string#$literal};;
+    esac
+    case "$string" in
+      "") false;;
+    esac
+  do
+    tail=${string#?}
+    head=${string%$tail}
+    format=$format%%%02x
+    set -- "$@" "'$head"
+    string=$tail
+  done
+  # shellcheck disable=SC2059 # The ${format} is the formatting pattern
+  printf "$format\\n" "$@"
+}
+
+echo "Creating proxy of '${seafile_file}'…"
+events_start "${seafile_file}"
+
+# `ffmpeg` might request the file several times (e.g. if the index is at the
+# end), hence the link needs to be reusable.
+download_url=$(retry_curl --silent -X GET --header "Authorization: Token ${SEAFILE_API_TOKEN}" "${SEAFILE_URL}/api2/repos/${SEAFILE_REPO_ID}/file/?p=$(urlencode "${seafile_file}")&reuse=1"|jq --raw-output '.')
+if [ -z "${download_url}" ] || [ "${download_url}" = "null" ]
+then
+    echo "Error: cannot get download link of '${seafile_file}'."
+    events_fail "no download link"
+    exit 2
+fi
+
+# Write into a temporary file first, so that an interrupted run doesn't leave
+# an incomplete proxy behind.
+partial_file="$(dirname "${output_file}")/.$(basename "${output_file}").partial.mp4"
+if ! ffmpeg -hide_banner -nostats -v error -nostdin -y -i "${download_url}" -map 0:v:0 -map '0:a:0?' -vf scale=-2:360 -c:v libx264 -preset veryfast -crf 30 -maxrate 600k -bufsize 1200k -c:a aac -b:a 64k -ac 1 -movflags +faststart -threads "${PROXY_THREADS:-1}" "${partial_file}"
+then
+    rm -f "${partial_file}"
+    echo "Error: cannot create proxy of '${seafile_file}'."
+    events_fail "ffmpeg failed"
+    exit 3
+fi
+mv "${partial_file}" "${output_file}"
+events_end "$(wc -c < "${output_file}" | tr -d " ")"
@@ -10,6 +10,11 @@
 import argparse
 import json
 import os
+import sys
+
+# Make sure the `profiling` module can be found in the `common` directory.
+sys.path.insert(1, os.path.join(sys.path[0], "..", "..", "common"))
+import profiling
 
 parser = argparse.ArgumentParser(
     description="Generate emails out of a some data and a template."
@@ -18,6 +23,7 @@ parser.add_argument("template", help="The template file to use.")
 parser.add_argument("data", help="The JSON file to use as input data.")
 
 args = parser.parse_args()
+profiling.start("data-to-md")
 
 template_path = args.template
 data_path = args.data
@@ -25,7 +31,7 @@ data_path = args.data
 
 with open(template_path) as template_file:
     template = template_file.read()
-with open(data_path) as data_file:
+with open(data_path) as data_file, profiling.section("parse"):
     data = json.load(data_file)
 
 os.makedirs("md", exist_ok=True)
@@ -33,6 +39,7 @@ process_completed = "/"+os.environ['SEAFILE_PROCESS_DIR']+"/"+os.environ['SEAFIL
 
 for entry in data:
     entry['process_completed'] = process_completed
-    text = template.format(**entry)
-    with open(f"md/{entry['code']}.md", "w") as md_file:
+    with profiling.section("render"):
+        text = template.format(**entry)
+    with profiling.section("write"), open(f"md/{entry['code']}.md", "w") as md_file:
         md_file.write(text)
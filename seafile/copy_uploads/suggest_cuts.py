@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: MIT
+
+# This script suggests where the uploaded videos should be cut, so that the
+# reviewers only need to confirm the cut points instead of searching for them.
+#
+# It works on a local copy of the processing directory (e.g. synchronized with
+# the Seafile client), where every talk has its own directory with the
+# uploaded videos and the info file `<pretalx-id>.md`:
+#
+#     ./suggest_cuts.py ~/Seafile/conference/processing
+#
+# For every video, downscaled grayscale frames and the audio level are
+# sampled once per second. The talk starts at the first and ends at the last
+# part with sustained sound and a picture that isn't black. If the picture
+# changes a lot shortly before the start or after the end (e.g. from a slate
+# to the camera), the cut is moved to that change. The suggestions are written
+# into the info files (a previous suggestion is replaced) and printed as
+# newline delimited JSON.
+#
+# The videos are analysed in parallel. You need to have `ffmpeg`, `ffprobe`
+# and [NumPy] installed.
+#
+# [NumPy]: https://numpy.org/
+
+import argparse, json, multiprocessing, os, re, sys
+
+sys.path.insert(1, os.path.join(sys.path[0], "..", "..", "common"))
+import media
+
+VIDEO_EXTENSIONS = (".mkv", ".mp4")
+# Frames and audio levels per second.
+FPS = 1
+AUDIO_RATE = 8000
+FRAME_WIDTH = 64
+FRAME_HEIGHT = 36
+# Frames with a lower mean brightness (between 0 and 1) are black.
+BLACK = 0.05
+# The content must have sound and a picture in this share of a window of
+# that many seconds.
+CONTENT_WINDOW = 5
+CONTENT_RATIO = 0.6
+# A mean difference between two frames above this is a change of the scene.
+SCENE_CHANGE = 0.15
+# How many seconds before the start or after the end a change of the scene
+# may be, for the cut to be moved to it.
+SNAP = 5
+# Seconds that are kept before the start and after the end if the cut isn't
+# at a change of the scene.
+MARGIN = 1
+
+BLOCK_START = "<!-- suggested-cut -->"
+BLOCK_END = "<!-- /suggested-cut -->"
+BLOCK = re.compile(
+    re.escape(BLOCK_START) + r".*?" + re.escape(BLOCK_END) + r"\n*", re.DOTALL
+)
+
+
+def gray_frames(video_file, threads):
+    """Returns the sampled frames as array of shape `(frames, height, width)`
+    with values between 0 and 1."""
+    import numpy as np
+
+    stdout, _stderr = media.ffmpeg(
+        "-i",
+        video_file,
+        "-map",
+        "0:v:0",
+        "-vf",
+        f"fps={FPS},scale={FRAME_WIDTH}:{FRAME_HEIGHT},format=gray",
+        "-threads",
+        str(threads),
+        "-f",
+        "rawvideo",
+        "-",
+        capture=True,
+    )
+    frames = np.frombuffer(stdout, dtype=np.uint8)
+    count = frames.size // (FRAME_WIDTH * FRAME_HEIGHT)
+    frames = frames[: count * FRAME_WIDTH * FRAME_HEIGHT]
+    return frames.reshape(count, FRAME_HEIGHT, FRAME_WIDTH) / 255
+
+
+def find_cut(frames, levels):
+    """Returns the start and the end of the content in seconds, or `None` if
+    there's no content."""
+    import numpy as np
+
+    length = min(len(frames), len(levels))
+    if length < CONTENT_WINDOW:
+        return None
+    frames, levels = frames[:length], levels[:length]
+
+    content = (levels > media.SILENCE_DB) & (frames.mean(axis=(1, 2)) > BLACK)
+    window = CONTENT_WINDOW * FPS
+    sustained = np.flatnonzero(
+        np.convolve(content, np.ones(window), "valid") >= window * CONTENT_RATIO
+    )
+    if sustained.size == 0:
+        return None
+    # Index `i` means that the content is within `[i, i + window)`.
+    start = sustained[0] + np.argmax(content[sustained[0] :])
+    end = sustained[-1] + window - np.argmax(content[: sustained[-1] + window][::-1])
+
+    # `changes[i]` is the change from frame `i` to frame `i + 1`.
+    changes = np.flatnonzero(
+        np.abs(np.diff(frames, axis=0)).mean(axis=(1, 2)) > SCENE_CHANGE
+    )
+    before = changes[(changes + 1 <= start) & (changes + 1 >= start - SNAP * FPS)]
+    after = changes[(changes + 1 >= end) & (changes + 1 <= end + SNAP * FPS)]
+    start = before[-1] + 1 if before.size else max(0, start - MARGIN * FPS)
+    end = after[0] + 1 if after.size else min(length, end + MARGIN * FPS)
+    return int(start) / FPS, int(end) / FPS
+
+
+def analyse_video(job):
+    """Returns the suggested cut of a single video."""
+    code, video_file, threads = job
+    result = {"code": code, "video_file": video_file}
+    try:
+        frames = gray_frames(video_file, threads)
+        info = media.probe(video_file)
+        if media.first_stream(info, "audio") is None:
+            return {**result, "error": "no audio stream"}
+        samples = media.decode_audio(video_file, AUDIO_RATE, threads)
+    except (media.MediaError, ValueError) as error:
+        return {**result, "error": str(error)}
+    cut = find_cut(frames, media.rms_db(samples, AUDIO_RATE // FPS))
+    if cut is None:
+        return {**result, "error": "no content found"}
+    return {**result, "start": cut[0], "end": cut[1]}
+
+
+def timestamp(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def suggestion_block(results):
+    lines = [BLOCK_START, "Suggested cut (detected automatically, please check):", ""]
+    for result in results:
+        name = os.path.basename(result["video_file"])
+        if "error" in result:
+            lines.append(f" - {name}: no suggestion ({result['error']})")
+        else:
+            length = timestamp(result["end"] - result["start"])
+            lines.append(
+                f" - {name}: from {timestamp(result['start'])} to {timestamp(result['end'])} (length {length})"
+            )
+    lines.append(BLOCK_END)
+    return "\n".join(lines) + "\n\n"
+
+
+def add_suggestion(info, block):
+    """Returns the info file with the suggestion before the checklist, or
+    instead of the previous suggestion."""
+    if BLOCK.search(info):
+        return BLOCK.sub(lambda _match: block, info, count=1)
+    # Insert it before the paragraph that contains the checklist.
+    match = re.search(r"(?:^.+\n)*^ - \[ \]", info, re.MULTILINE)
+    if match is None:
+        return f"{info.rstrip()}\n\n{block}"
+    return info[: match.start()] + block + info[match.start() :]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Suggest where to cut the uploaded videos."
+    )
+    parser.add_argument(
+        "processing_dir", help="local copy of the processing directory"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=media.cpu_count(),
+        help="number of videos to analyse in parallel (default: number of CPUs)",
+    )
+    args = parser.parse_args(argv)
+
+    jobs = []
+    threads = media.threads_per_job(args.jobs)
+    for code in sorted(os.listdir(args.processing_dir)):
+        talk_dir = os.path.join(args.processing_dir, code)
+        if not os.path.isdir(talk_dir):
+            continue
+        for name in sorted(os.listdir(talk_dir)):
+            # The review proxies are copies of the uploads.
+            if name.endswith(".proxy.mp4"):
+                continue
+            if name.lower().endswith(VIDEO_EXTENSIONS):
+                jobs.append((code, os.path.join(talk_dir, name), threads))
+
+    results = {}
+    with multiprocessing.Pool(args.jobs) as pool:
+        for result in pool.imap(analyse_video, jobs):
+            print(json.dumps(result), flush=True)
+            results.setdefault(result["code"], []).append(result)
+
+    for code, talk_results in results.items():
+        info_path = os.path.join(args.processing_dir, code, f"{code}.md")
+        if not os.path.exists(info_path):
+            print(f"Warning: info file '{info_path}' not found.", file=sys.stderr)
+            continue
+        with open(info_path) as info_file:
+            info = info_file.read()
+        with open(info_path, "w") as info_file:
+            info_file.write(add_suggestion(info, suggestion_block(talk_results)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,15 +11,29 @@
 # The script outputs newly created directories. That information can be used
 # by other scripts, to e.g. place additional files in the newly created
 # directories.
+# Files with the same content as a file that is already somewhere in the
+# target directory (including the directory of completed files) are not
+# copied, they are reported on stderr instead. This way files that were
+# uploaded several times, possibly under a different name, end up only once
+# in the target directory. The content is compared by the object ID Seafile
+# assigns to every file.
 #
 # You need to have the following utilities installed:
-# curl, jo, jq
+# curl, jq
+#
+# If the `EVENTS_FILE` environment variable is set, an event for every request
+# is written to it, see `../../common/events.sh` for details.
+# Requests that fail because of transient errors are retried, see
+# `../../common/retry.sh`.
 
 # You can get your auth token via
 # curl -X POST --data "username=<your-username>&password=<your-password>" '<you-server>/api2/auth-token/'
 
 cd $(dirname $0)
 . ../config
+common_dir=$(cd ../../common && pwd)
+. "${common_dir}/events.sh"
+. "${common_dir}/retry.sh"
 
 if [ "${#}" -lt 5 ]; then
     echo "Usage: $(basename "${0}") <base-url> <auth-token> <repo-id> <source-directory> <target-directory>"
@@ -68,38 +82,65 @@ urlencode_grouped_case () {
 
 
 # Check if target directory exists, if not, create it
-details_code=$(curl --silent -X GET --header "Authorization: Token ${token}" "${api_v21}/repos/${repo_id}/dir/detail/?path=/${target_dir}" --output /dev/null --write-out '%{http_code}')
+details_code=$(retry_curl --silent -X GET --header "Authorization: Token ${token}" "${api_v21}/repos/${repo_id}/dir/detail/?path=/${target_dir}" --output /dev/null --write-out '%{http_code}')
 if [ "${details_code}" = "404" ]
 then
-    mkdir_ret=$(curl --silent -X POST --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/dir/?p=/${target_dir}" --data 'operation=mkdir')
+    mkdir_ret=$(retry_curl --silent -X POST --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/dir/?p=/${target_dir}" --data 'operation=mkdir')
     if [ "${mkdir_ret}" != '"success"' ]
     then
-        echo "Error: cannot create directory '${target_dir}'."
+        echo "Error: cannot create directory '${target_dir}'." >&2
         exit 2
     fi
 fi
 
+# Index of the object IDs of all files in the target directory, one file per
+# line with the object ID and the path separated by a tab. Files that are
+# copied are added, so that identical uploads are only copied once.
+tab=$(printf '\t')
+index_file=$(mktemp)
+trap 'rm -f "${index_file}"' EXIT
+retry_curl --silent -X GET --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/dir/?p=/${target_dir}&t=f&recursive=1"|jq --raw-output '.[] | .id + "\t" + .parent_dir + "/" + .name' > "${index_file}"
+
 # Get all directories with more than 1 file in it
-list_dirs_ret=$(curl --silent -X GET --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/dir/?p=/${source_dir}&t=d"|jq --raw-output '.[].name')
+list_dirs_ret=$(retry_curl --silent -X GET --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/dir/?p=/${source_dir}&t=d"|jq --raw-output '.[].name')
 for dir_name in ${list_dirs_ret}
 do
     # Print progress indicator to stderr, so that you can still pipe the
     # expected output into a file.
     echo "Processing ${dir_name}…" >&2
-    files=$(curl --silent -X GET --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/dir/?p=/${source_dir}/${dir_name}&t=f"|jq --raw-output '.[].name')
+    events_start "${dir_name}"
+    files=$(retry_curl --silent -X GET --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/dir/?p=/${source_dir}/${dir_name}&t=f"|jq --raw-output '.[] | .id + "\t" + .name')
 
     # Copy file only if it wasn't copied yet
-    for file in ${files}
+    for entry in ${files}
     do
+        file_id=${entry%%"${tab}"*}
+        file=${entry#*"${tab}"}
+
+        # Skip files whose content is already in the target directory. Empty
+        # files all have the same object ID, they are never skipped.
+        if [ "${file_id}" != "0000000000000000000000000000000000000000" ]
+        then
+            existing=$(grep -m 1 "^${file_id}${tab}" "${index_file}" | cut -f 2-)
+            if [ -n "${existing}" ]
+            then
+                if [ "${existing}" != "/${target_dir}/${dir_name}/${file}" ]
+                then
+                    echo "Skipping ${dir_name}/${file}, it's identical to '${existing}'." >&2
+                fi
+                continue
+            fi
+        fi
+
         file_urlencoded=$(urlencode_grouped_case "${file}")
-        file_code=$(curl --silent -X GET --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/file/detail/?p=/${target_dir}/${dir_name}/${file_urlencoded}" --output /dev/null --write-out '%{http_code}')
+        file_code=$(retry_curl --silent -X GET --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/file/detail/?p=/${target_dir}/${dir_name}/${file_urlencoded}" --output /dev/null --write-out '%{http_code}')
 
         # The following code is FOSSGIS 2021 specific. When a file was cut
         # it is moved to a directory called `fertig` or in a root directory
         # called `vortraege_konferenz`. We don't want to copy any files that
         # were already cut successfully.
-        fertig_dir_code=$(curl --silent -X GET --header "Authorization: Token ${token}" "${api_v21}/repos/${repo_id}/dir/detail/?path=/${target_dir}/${SEAFILE_PROCESS_COMPLETE_DIR}/${dir_name}" --output /dev/null --write-out '%{http_code}')
-        konferenz_dir_code=$(curl --silent -X GET --header "Authorization: Token ${token}" "${api_v21}/repos/${repo_id}/dir/detail/?path=/vortraege_konferenz/${dir_name}" --output /dev/null --write-out '%{http_code}')
+        fertig_dir_code=$(retry_curl --silent -X GET --header "Authorization: Token ${token}" "${api_v21}/repos/${repo_id}/dir/detail/?path=/${target_dir}/${SEAFILE_PROCESS_COMPLETE_DIR}/${dir_name}" --output /dev/null --write-out '%{http_code}')
+        konferenz_dir_code=$(retry_curl --silent -X GET --header "Authorization: Token ${token}" "${api_v21}/repos/${repo_id}/dir/detail/?path=/vortraege_konferenz/${dir_name}" --output /dev/null --write-out '%{http_code}')
 
         if [ "${file_code}" = "404" ] && [ "${fertig_dir_code}" = "404" ] && [ "${konferenz_dir_code}" = "404" ]
         then
@@ -108,26 +149,30 @@ do
             echo "${dir_name}/${file} will be copied…" >&2
 
             # All parent directories must exist before copying files
-            dir_name_code=$(curl --silent -X GET --header "Authorization: Token ${token}" "${api_v21}/repos/${repo_id}/dir/detail/?path=/${target_dir}/${dir_name}" --output /dev/null --write-out '%{http_code}')
+            dir_name_code=$(retry_curl --silent -X GET --header "Authorization: Token ${token}" "${api_v21}/repos/${repo_id}/dir/detail/?path=/${target_dir}/${dir_name}" --output /dev/null --write-out '%{http_code}')
             if [ "${dir_name_code}" = "404" ]
             then
-                dir_name_mkdir_ret=$(curl --silent -X POST --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/dir/?p=/${target_dir}/${dir_name}" --data 'operation=mkdir')
+                dir_name_mkdir_ret=$(retry_curl --silent -X POST --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/dir/?p=/${target_dir}/${dir_name}" --data 'operation=mkdir')
                 if [ "${dir_name_mkdir_ret}" != '"success"' ]
                 then
-                    echo "Error: cannot create directory '${target_dir}/${dir_name}'."
+                    echo "Error: cannot create directory '${target_dir}/${dir_name}'." >&2
+                    events_fail "cannot create directory '${target_dir}/${dir_name}'"
                     exit 3
                 fi
                 echo "${dir_name}"
             fi
 
-            copy_ret=$(curl --silent -X POST --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/file/?p=/${source_dir}/${dir_name}/${file_urlencoded}" --data "operation=copy&dst_repo=${repo_id}&dst_dir=/${target_dir}/${dir_name}")
-            if [ "${copy_ret}" != "$(jo repo_id="${repo_id}" parent_dir="/${target_dir}/${dir_name}/" obj_name="${file}")" ]
+            copy_ret=$(retry_curl --silent -X POST --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/file/?p=/${source_dir}/${dir_name}/${file_urlencoded}" --data "operation=copy&dst_repo=${repo_id}&dst_dir=/${target_dir}/${dir_name}")
+            if [ "${copy_ret}" != "$(jq --null-input --compact-output --arg repo_id "${repo_id}" --arg parent_dir "/${target_dir}/${dir_name}/" --arg obj_name "${file}" '{$repo_id, $parent_dir, $obj_name}')" ]
             then
-                echo "Error: copying '${source_dir}/${dir_name}/${file}' to '${target_dir}/${dir_name}/${file}' didn't work as expected."
+                echo "Error: copying '${source_dir}/${dir_name}/${file}' to '${target_dir}/${dir_name}/${file}' didn't work as expected." >&2
+                events_fail "copying '${source_dir}/${dir_name}/${file}' failed"
                 exit 4
             fi
+            printf '%s\t%s\n' "${file_id}" "/${target_dir}/${dir_name}/${file}" >> "${index_file}"
         fi
     done
+    events_end
 done
 
 echo "Successfully synchronized from '${source_dir}' to '${target_dir}'." >&2
@@ -9,33 +9,90 @@
 # are copied. Empty directories are not copied. Some addtional file that is
 # used to cut/review the upload is added to the directory if it was newly
 # created.
+#
+# If `REVIEW_PROXIES` is set to `yes` in the config, small review copies of
+# the uploads in the newly created directories are created and uploaded in
+# the background, see `create_proxies.sh`.
+#
+# Only one synchronization runs at a time, if another one is still running,
+# the script exits with exit code 3. This way overlapping runs (e.g. from
+# `crontab`) don't copy files or create emails twice.
+#
+# If not all files could be copied, the directories that were created until
+# then are still processed, but the script exits with exit code 4. If not all
+# info files could be uploaded, it exits with exit code 5.
+#
+# You need to have the following utilities installed:
+# curl, flock, jq (and ffmpeg, xargs for the review proxies)
 
 cd $(dirname $0)
 . ../config
+common_dir=$(cd ../../common && pwd)
+. "${common_dir}/events.sh"
+. "${common_dir}/retry.sh"
 
 seafile_api_v20="${SEAFILE_URL}/api2"
 
 cd out || (echo "'./out' directory must exist, create it with the 'create_info_files.sh' script." && exit 2)
 mkdir -p emails
 
+exec 9> .sync.lock
+if ! flock --nonblock 9
+then
+    echo "Another synchronization is still running, skipping this one." >&2
+    exit 3
+fi
+
 echo "Pushing files to Seafile…"
 
 # Copy only the sub-directories that contain new files into the new directory
 created_dirs=$(../sync_files.sh "${SEAFILE_URL}" "${SEAFILE_API_TOKEN}" "${SEAFILE_REPO_ID}" "${SEAFILE_UPLOAD_DIR}" "${SEAFILE_PROCESS_DIR}")
+sync_status=$?
+if [ "${sync_status}" -ne 0 ]
+then
+    echo "Error: not all files could be synchronized (exit code ${sync_status})." >&2
+fi
+upload_status=0
 
 # Get the upload-api-link
-upload_api_link=$(curl --silent -X GET --header "Authorization: Token ${SEAFILE_API_TOKEN}" "${seafile_api_v20}/repos/${SEAFILE_REPO_ID}/upload-link/?p=/${SEAFILE_PROCESS_DIR}/"|jq --raw-output '.')
+upload_api_link=$(retry_curl --silent -X GET --header "Authorization: Token ${SEAFILE_API_TOKEN}" "${seafile_api_v20}/repos/${SEAFILE_REPO_ID}/upload-link/?p=/${SEAFILE_PROCESS_DIR}/"|jq --raw-output '.')
 
 # Upload the file with additional information for the reviewers. Upload only
-# to the newly created ones.
+# to the newly created ones, all with a single call.
+if [ "${created_dirs}" != "" ]
+then
+    info_files=$(echo "${created_dirs}" | sed 's|^\(.*\)$|./md/\1.md|')
+    # The file names are pretalx IDs, they don't contain whitespace.
+    # shellcheck disable=SC2086
+    if ! ../upload_files.sh "${upload_api_link}" "${SEAFILE_PROCESS_DIR}" ${info_files}
+    then
+        echo "Error: not all info files could be uploaded." >&2
+        upload_status=1
+    fi
+fi
+
+# Creating the proxies takes a while, don't wait for it. The lock of this
+# synchronization isn't passed on.
+if [ "${REVIEW_PROXIES}" = "yes" ] && [ "${created_dirs}" != "" ]
+then
+    # shellcheck disable=SC2086 # The pretalx IDs don't contain whitespace
+    nohup ../create_proxies.sh ${created_dirs} >> proxies.log 2>&1 9>&- &
+fi
+
 for created_dir in ${created_dirs}
 do
-    echo "Uploading ./md/${created_dir}.md…"
-    ../upload_file.sh "${upload_api_link}" "${SEAFILE_PROCESS_DIR}" "./md/${created_dir}.md"
     echo "Create mail for submission ${created_dir}"
     cp ${MAIL_TEMPLATE_UPLOAD_RECIEVED} emails/${created_dir}
 done
 
+if [ "${sync_status}" -ne 0 ]
+then
+    exit 4
+fi
+if [ "${upload_status}" -ne 0 ]
+then
+    exit 5
+fi
 if [ "${created_dirs}" != "" ]
 then
     echo "Info files were successfully uploaded."
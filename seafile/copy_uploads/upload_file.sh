@@ -6,6 +6,11 @@
 
 # This script uploads the given file into a sub-directory named after the
 # basename of the input file (without extension).
+#
+# If the `EVENTS_FILE` environment variable is set, progress events are written
+# to it, see `../../common/events.sh` for details.
+# Requests that fail because of transient errors are retried, see
+# `../../common/retry.sh`.
 
 if [ "${#}" -lt 3 ]; then
     echo "Usage: $(basename "${0}") <upload-api-link> <seafile-directory> <local-file>"
@@ -14,15 +19,23 @@ if [ "${#}" -lt 3 ]; then
     exit 1
 fi
 
+common_dir=$(cd "$(dirname "$0")/../../common" && pwd)
+. "${common_dir}/events.sh"
+. "${common_dir}/retry.sh"
+
 upload_api_link=${1}
 seafile_dir=${2}
 local_file=${3}
 
 pretalx_id=$(basename "${local_file}" | cut -f 1 -d '.')
 echo "Uploading '${local_file}' to Seafile at '/${seafile_dir}/${pretalx_id}/'…"
-upload_file_code=$(curl --silent --form file=@"${local_file}" --form parent_dir="/${seafile_dir}/" --form relative_path="${pretalx_id}/" "${upload_api_link}" --output /dev/null --write-out '%{http_code}')
+local_file_size=$(wc -c < "${local_file}" | tr -d " ")
+events_start "${local_file}" "${local_file_size}"
+upload_file_code=$(retry_curl --silent --form file=@"${local_file}" --form parent_dir="/${seafile_dir}/" --form relative_path="${pretalx_id}/" "${upload_api_link}" --output /dev/null --write-out '%{http_code}')
 if [ "${upload_file_code}" != "200" ]
 then
     echo "Error: cannot upload information file '${local_file}'."
+    events_fail "HTTP status code ${upload_file_code}"
     exit 2
 fi
+events_end "${local_file_size}"
@@ -0,0 +1,106 @@
+#!/bin/sh
+#set -o xtrace
+
+# SPDX-License-Identifier: MIT
+
+# This script uploads several files, each one into a sub-directory named after
+# the basename of the file (without extension), like `upload_file.sh` does for
+# a single file.
+#
+# All files are uploaded with a single `curl` call, which reuses the
+# connection and runs several uploads in parallel (8 by default, set the
+# `UPLOAD_PARALLEL_MAX` environment variable to change that). A single upload
+# request cannot be used, as Seafile only supports one `relative_path` per
+# request. The result of every file is checked, uploads that failed because
+# of transient errors are retried one by one.
+#
+# If the `EVENTS_FILE` environment variable is set, progress events are written
+# to it, see `../../common/events.sh` for details.
+#
+# You need to have the following utilities installed:
+# curl (at least version 7.75)
+
+if [ "${#}" -lt 3 ]; then
+    echo "Usage: $(basename "${0}") <upload-api-link> <seafile-directory> <local-file>..."
+    echo ""
+    echo "Example: $(basename "${0}") https://example.org/upload-api/2e2424a0-6802-48cd-b134-4d6fd6e48a52 dir_on_seafile local_file1 local_file2"
+    exit 1
+fi
+
+common_dir=$(cd "$(dirname "$0")/../../common" && pwd)
+. "${common_dir}/events.sh"
+. "${common_dir}/retry.sh"
+
+upload_api_link=${1}
+seafile_dir=${2}
+shift 2
+
+results_dir=$(mktemp -d)
+trap 'rm -rf "${results_dir}"' EXIT
+
+# Build the arguments for `curl`, every file is a separate transfer. The
+# response of each one is written into a file named after its index, so that
+# the results can be matched with the files (there might be several files for
+# the same pretalx ID).
+total_size=0
+file_count=0
+failed=0
+first=yes
+for local_file in "$@"
+do
+    if [ ! -f "${local_file}" ]
+    then
+        echo "Error: file '${local_file}' doesn't exist."
+        failed=$((failed + 1))
+        continue
+    fi
+    if [ "${first}" = "yes" ]
+    then
+        set --
+        first=''
+    else
+        set -- "$@" --next
+    fi
+    pretalx_id=$(basename "${local_file}" | cut -f 1 -d '.')
+    file_count=$((file_count + 1))
+    echo "${local_file}" > "${results_dir}/${file_count}.file"
+    total_size=$((total_size + $(wc -c < "${local_file}")))
+    set -- "$@" --form file=@"${local_file}" --form parent_dir="/${seafile_dir}/" --form relative_path="${pretalx_id}/" --output "${results_dir}/${file_count}" --write-out '%{http_code} %{exitcode} %{filename_effective}\n' "${upload_api_link}"
+done
+
+echo "Uploading ${file_count} files to Seafile at '/${seafile_dir}/'…"
+events_start "${seafile_dir}" "${total_size}"
+touch "${results_dir}/codes"
+if [ "${first}" != "yes" ]
+then
+    # In parallel mode `--silent` alone doesn't hide the progress meter.
+    curl --silent --no-progress-meter --parallel --parallel-max "${UPLOAD_PARALLEL_MAX:-8}" "$@" > "${results_dir}/codes"
+fi
+
+while read -r code exit_code output_file
+do
+    events_request "${code}" "${exit_code}"
+    local_file=$(cat "${results_dir}/$(basename "${output_file}").file")
+    pretalx_id=$(basename "${local_file}" | cut -f 1 -d '.')
+    if [ "${code}" = "200" ]
+    then
+        echo "Uploaded '${local_file}' to '/${seafile_dir}/${pretalx_id}/'."
+        continue
+    fi
+
+    # Only retry uploads that certainly didn't reach Seafile, so that no file
+    # is uploaded twice.
+    if retry_is_transient "${exit_code}" "${code}" no && "$(dirname "$0")/upload_file.sh" "${upload_api_link}" "${seafile_dir}" "${local_file}"
+    then
+        continue
+    fi
+    echo "Error: cannot upload file '${local_file}' (HTTP status code ${code})."
+    failed=$((failed + 1))
+done < "${results_dir}/codes"
+
+if [ "${failed}" -gt 0 ]
+then
+    events_fail "${failed} files failed"
+    exit 2
+fi
+events_end "${total_size}"
@@ -0,0 +1,74 @@
+#!/bin/sh
+#set -o xtrace
+
+# SPDX-License-Identifier: MIT
+
+# Watches the upload directory and runs `sync_files_and_upload_info.sh` only
+# if something changed since the last successful synchronization. Instead of
+# listing and probing all uploaded files, every check is a single request: it
+# gets the object ID of the upload directory, which changes whenever a file
+# anywhere below it is added, changed or removed.
+#
+# By default it checks every 60 seconds, the interval can be given as argument.
+# With `--once` it checks only once, which is useful if it's run via `crontab`.
+#
+# The object ID of the last synchronized state is stored in
+# `./out/.upload-dir-oid`, remove that file to force a synchronization.
+#
+# You need to have the following utilities installed:
+# curl, flock, jq
+
+cd $(dirname $0)
+. ../config
+common_dir=$(cd ../../common && pwd)
+. "${common_dir}/events.sh"
+. "${common_dir}/retry.sh"
+
+if [ "${1}" = "--once" ]
+then
+    once=yes
+    shift
+fi
+interval=${1:-60}
+
+if [ ! -d out ]
+then
+    echo "'./out' directory must exist, create it with the 'create_info_files.sh' script." >&2
+    exit 2
+fi
+state_file=out/.upload-dir-oid
+
+# Returns the object ID of the upload directory. It's returned by Seafile as
+# header of a directory listing, only the sub-directories are listed, to keep
+# the response small.
+upload_dir_oid () {
+    retry_curl --silent -X GET --header "Authorization: Token ${SEAFILE_API_TOKEN}" "${SEAFILE_URL}/api2/repos/${SEAFILE_REPO_ID}/dir/?p=/${SEAFILE_UPLOAD_DIR}&t=d" --output /dev/null --write-out '%header{oid}'
+}
+
+while true
+do
+    oid=$(upload_dir_oid)
+    if [ -z "${oid}" ]
+    then
+        echo "Error: cannot get the state of '${SEAFILE_UPLOAD_DIR}'." >&2
+    elif [ "${oid}" != "$(cat "${state_file}" 2> /dev/null)" ]
+    then
+        echo "Changes in '${SEAFILE_UPLOAD_DIR}' detected, synchronizing…" >&2
+        # Only store the state if the synchronization was successful, so that
+        # it's retried on the next check otherwise. Uploads that happen during
+        # the synchronization are picked up on the next check, as the object
+        # ID was taken before.
+        if ./sync_files_and_upload_info.sh
+        then
+            echo "${oid}" > "${state_file}"
+        else
+            echo "Error: the synchronization failed, it's retried on the next check." >&2
+        fi
+    fi
+
+    if [ -n "${once}" ]
+    then
+        break
+    fi
+    sleep "${interval}"
+done
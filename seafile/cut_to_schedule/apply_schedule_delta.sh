@@ -0,0 +1,160 @@
+#!/bin/sh
+#set -o xtrace
+
+# SPDX-License-Identifier: MIT
+
+# This script creates the directory of a new schedule version from the one of
+# the previous version, so that only the talks that changed need to be copied
+# again.
+#
+# The previous and the new schedule (as created by `cut_to_schedule.sh`) are
+# compared by pretalx ID. The whole directory of the previous version is
+# copied on the server, which is cheap as Seafile doesn't copy the contents.
+# Then the files of the talks that were moved to another room or time,
+# renamed or removed are deleted from the copy. The files of the talks that
+# were cut again since the previous version are deleted as well: a file of the
+# copy is outdated if it isn't the newest video of the talk in the source
+# directory (compared by the Seafile object ID, which only changes with the
+# content). The script outputs the pretalx IDs of the talks that still need to
+# be copied, one per line: the changed, re-cut and new ones and the ones that
+# didn't have a file in the previous version.
+#
+# If the target directory already exists, nothing is done and the script
+# exits with exit code 2. If applying the changes fails after the target
+# directory was created, the incomplete directory is removed again, so that
+# no talks are copied on top of it. If it can't be removed, the script exits
+# with exit code 6, remove it by hand then.
+#
+# You need to have the following utilities installed:
+# curl, jq
+#
+# Requests that fail because of transient errors are retried, see
+# `../../common/retry.sh`.
+
+if [ "${#}" -lt 8 ]; then
+    echo "Usage: $(basename "${0}") <base-url> <auth-token> <repo-id> <source-directory> <previous-target-directory> <target-directory> <previous-schedule> <schedule>"
+    echo ""
+    echo "Example: $(basename "${0}") https://example.org fe91e764226cc534811f0ba32c62a6ac41ad0d7b 280b593a-f868-0594-d97a-23d88822a35f processing/completed schedule/09 schedule/10 schedule-09.json schedule.json"
+    exit 1
+fi
+
+base_url=${1}
+token=${2}
+repo_id=${3}
+source_dir=${4}
+previous_dir=${5}
+target_dir=${6}
+previous_schedule=${7}
+schedule=${8}
+
+common_dir=$(cd "$(dirname "$0")/../../common" && pwd)
+. "${common_dir}/events.sh"
+. "${common_dir}/retry.sh"
+
+api_v20="${base_url}/api2"
+api_v21="${base_url}/api/v2.1"
+
+# In this script we always only want to split at newlines in for loops
+# https://github.com/koalaman/shellcheck/wiki/SC2039#c-style-escapes
+IFS="$(printf '%b_' '\n')"; IFS="${IFS%_}"
+
+target_code=$(retry_curl --silent -X GET --header "Authorization: Token ${token}" "${api_v21}/repos/${repo_id}/dir/detail/?path=/${target_dir}" --output /dev/null --write-out '%{http_code}')
+if [ "${target_code}" != "404" ]
+then
+    echo "Directory '/${target_dir}' already exists, not applying the changes of the schedule." >&2
+    exit 2
+fi
+
+# The talks that have the same title, room and start in both versions
+unchanged=$(jq --raw-output --slurpfile previous "${previous_schedule}" 'to_entries[] | select($previous[0][.key] == .value) | .key' "${schedule}")
+echo "$(echo "${unchanged}" | grep --count .) talks didn't change since the previous schedule version." >&2
+
+# Copy the previous version with a single request
+mkdir_ret=$(retry_curl --silent -X POST --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/dir/?p=/${target_dir}" --data 'operation=mkdir')
+if [ "${mkdir_ret}" != '"success"' ]
+then
+    echo "Error: cannot create directory '/${target_dir}'." >&2
+    exit 3
+fi
+
+# Removes the incomplete target directory and exits with the given exit code.
+abort () {
+    echo "Removing the incomplete directory '/${target_dir}'…" >&2
+    remove_code=$(retry_curl --silent -X POST --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/fileops/delete/?p=$(dirname "/${target_dir}")" --data-urlencode "file_names=$(basename "${target_dir}")" --output /dev/null --write-out '%{http_code}')
+    if [ "${remove_code}" != "200" ]
+    then
+        echo "Error: cannot remove the incomplete directory '/${target_dir}' (HTTP status code ${remove_code}), remove it by hand." >&2
+        exit 6
+    fi
+    exit "${1}"
+}
+
+rooms=$(retry_curl --silent -X GET --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/dir/?p=/${previous_dir}&t=d"|jq --raw-output '[.[].name] | join(":")')
+if [ "${rooms}" != "" ]
+then
+    echo "Copying '/${previous_dir}' to '/${target_dir}'…" >&2
+    copy_code=$(retry_curl --silent -X POST --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/fileops/copy/?p=/${previous_dir}" --data-urlencode "file_names=${rooms}" --data "dst_repo=${repo_id}" --data-urlencode "dst_dir=/${target_dir}" --output /dev/null --write-out '%{http_code}')
+    if [ "${copy_code}" != "200" ]
+    then
+        echo "Error: copying '/${previous_dir}' to '/${target_dir}' failed (HTTP status code ${copy_code})." >&2
+        abort 4
+    fi
+fi
+
+# All files of the copy with their pretalx ID. The file names are
+# `<day>_<day-of-the-week>_<date>_<time>_<pretalx-id>_<title>`, see
+# `get_filepath.py`.
+listing=$(retry_curl --silent -X GET --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/dir/?p=/${target_dir}&t=f&recursive=1")
+if ! echo "${listing}" | jq --exit-status 'type == "array"' > /dev/null 2>&1
+then
+    echo "Error: cannot list the files of '/${target_dir}'." >&2
+    abort 4
+fi
+files=$(echo "${listing}" | jq --raw-output '.[] | (.name | split("_")[4]) + "\t" + .parent_dir + "\t" + .name + "\t" + .id')
+
+# The object ID of the newest video of every talk in the source directory,
+# picked like `get_files_to_copy.sh` does.
+source_listing=$(retry_curl --silent -X GET --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/dir/?p=/${source_dir}&t=f&recursive=1")
+if ! echo "${source_listing}" | jq --exit-status 'type == "array"' > /dev/null 2>&1
+then
+    echo "Error: cannot list the files of '/${source_dir}'." >&2
+    abort 4
+fi
+newest_file=$(mktemp)
+unchanged_file=$(mktemp)
+trap 'rm -f "${newest_file}" "${unchanged_file}"' EXIT
+echo "${source_listing}" | jq --raw-output --arg source "/${source_dir}/" '[.[] | select((.parent_dir | startswith($source)) and (.name | match(".mkv$|.mp4$")) and (.name | endswith(".proxy.mp4") | not)) | .code = (.parent_dir | ltrimstr($source) | rtrimstr("/")) | select(.code | contains("/") | not)] | group_by(.code)[] | sort_by(-.mtime) | first | .code + "\t" + .id' > "${newest_file}"
+
+# Talks whose copied file isn't the newest video any more were cut again,
+# they are treated like changed talks.
+echo "${unchanged}" | grep . > "${unchanged_file}"
+recut=$(echo "${files}" | awk -F '\t' 'FILENAME == ARGV[1] { newest[$1] = $2; next } FILENAME == ARGV[2] { unchanged[$1]; next } ($1 in unchanged) && newest[$1] != $4 && !($1 in seen) { seen[$1]; print $1 }' "${newest_file}" "${unchanged_file}" -)
+if [ "${recut}" != "" ]
+then
+    echo "$(echo "${recut}" | grep --count .) talks were cut again since the previous schedule version." >&2
+    unchanged=$(echo "${unchanged}" | grep --invert-match --line-regexp --fixed-strings "${recut}")
+    echo "${unchanged}" | grep . > "${unchanged_file}"
+fi
+
+# Delete the files of the talks that changed, grouped by their directory
+outdated=$(echo "${files}" | awk -F '\t' 'FILENAME == ARGV[1] { unchanged[$0]; next } $1 != "" && !($1 in unchanged) { if ($2 in names) names[$2] = names[$2] ":" $3; else names[$2] = $3 } END { for (dir in names) print dir "\t" names[dir] }' "${unchanged_file}" -)
+for entry in ${outdated}
+do
+    dir=${entry%%"$(printf '\t')"*}
+    names=${entry#*"$(printf '\t')"}
+    echo "Removing outdated files from '${dir}': ${names}" >&2
+    delete_code=$(retry_curl --silent -X POST --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/fileops/delete/?p=${dir}" --data-urlencode "file_names=${names}" --output /dev/null --write-out '%{http_code}')
+    if [ "${delete_code}" != "200" ]
+    then
+        echo "Error: cannot remove outdated files from '${dir}' (HTTP status code ${delete_code})." >&2
+        abort 5
+    fi
+done
+
+# All talks that aren't unchanged and in the copy need to be copied
+kept=$(echo "${files}" | cut -f 1 | grep --line-regexp --fixed-strings --file "${unchanged_file}")
+# An empty line would match every talk
+echo "${kept}" | grep . > "${unchanged_file}"
+jq --raw-output 'keys[]' "${schedule}" | grep --invert-match --line-regexp --fixed-strings --file "${unchanged_file}"
+# `grep` exits with 1 if all talks are unchanged
+exit 0
@@ -8,7 +8,12 @@
 # consists source and target file separated by a null byte.
 #
 # You need to have the following utilities installed:
-# curl, jo, jq
+# curl, jq
+#
+# If the `EVENTS_FILE` environment variable is set, an event for every request
+# is written to it, see `../../common/events.sh` for details.
+# Requests that fail because of transient errors are retried, see
+# `../../common/retry.sh`.
 
 # You can get your auth token via
 # curl -X POST --data "username=<your-username>&password=<your-password>" '<you-server>/api2/auth-token/'
@@ -25,6 +30,10 @@ token=${2}
 repo_id=${3}
 files_to_copy_file=${4}
 
+common_dir=$(cd "$(dirname "$0")/../../common" && pwd)
+. "${common_dir}/events.sh"
+. "${common_dir}/retry.sh"
+
 api_v20="${base_url}/api2"
 api_v21="${base_url}/api/v2.1"
 
@@ -61,14 +70,15 @@ urlencode_grouped_case () {
 create_dir() {
     dir=${1}
 
-    details_code=$(curl --silent -X GET --header "Authorization: Token ${token}" "${api_v21}/repos/${repo_id}/dir/detail/?path=${dir}" --output /dev/null --write-out '%{http_code}')
+    details_code=$(retry_curl --silent -X GET --header "Authorization: Token ${token}" "${api_v21}/repos/${repo_id}/dir/detail/?path=${dir}" --output /dev/null --write-out '%{http_code}')
     if [ "${details_code}" = "404" ]
     then
         echo "Creating directory ${dir}…" >&2
-        mkdir_ret=$(curl --silent -X POST --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/dir/?p=${dir}" --data 'operation=mkdir')
+        mkdir_ret=$(retry_curl --silent -X POST --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/dir/?p=${dir}" --data 'operation=mkdir')
         if [ "${mkdir_ret}" != '"success"' ]
         then
             echo "Error: cannot create directory '${dir}'."
+            events_fail "cannot create directory '${dir}'"
             exit 1
         fi
     fi
@@ -100,25 +110,29 @@ do
         source_file_urlencoded=$(urlencode_grouped_case "${source_file}")
         target_dir=$(dirname "${target}")
         target_file=$(basename "${target}")
+        events_start "${target}"
 
         # Create parent directories if they don't exist yet
         create_parent_dirs "${target_dir}"
 
         # Copy the file
-        copy_ret=$(curl --silent -X POST --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/file/?p=${source_urlencoded}" --data "operation=copy&dst_repo=${repo_id}&dst_dir=${target_dir}")
-        if [ "${copy_ret}" != "$(jo repo_id="${repo_id}" parent_dir="${target_dir}/" obj_name="${source_file}")" ]
+        copy_ret=$(retry_curl --silent -X POST --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/file/?p=${source_urlencoded}" --data "operation=copy&dst_repo=${repo_id}&dst_dir=${target_dir}")
+        if [ "${copy_ret}" != "$(jq --null-input --compact-output --arg repo_id "${repo_id}" --arg parent_dir "${target_dir}/" --arg obj_name "${source_file}" '{$repo_id, $parent_dir, $obj_name}')" ]
         then
             echo "Error: copying '${source}' to '${target_dir}/' didn't work as expected."
+            events_fail "copying '${source}' failed"
             exit 2
         fi
 
         # Give the copied file the correct name
-        rename_ret=$(curl --silent -X POST --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/file/?p=${target_dir}/${source_file_urlencoded}" --data "operation=rename&newname=${target_file}")
+        rename_ret=$(retry_curl --silent -X POST --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/file/?p=${target_dir}/${source_file_urlencoded}" --data "operation=rename&newname=${target_file}")
         if [ "${rename_ret}" != '"success"' ]
         then
             echo "Error: cannot rename file '${target_dir}/${source_file}' to '${target_dir}/${target_file}'."
+            events_fail "cannot rename file '${target_dir}/${source_file}'"
             exit 3
         fi
+        events_end
     done <<EOF
 ${to_copy}
 EOF
@@ -9,12 +9,22 @@
 # after a certain scheme suitable for people that need to play those files at
 # the conference.
 #
+# Every pretalx schedule version gets its own directory. With `--delta` a new
+# version is created from the directory of the previous one (see
+# `apply_schedule_delta.sh`), so that only the talks that changed are copied
+# again. The schedule of the last run is kept in `out/` for that.
+#
 # You need to have the following utilities installed:
 # curl, jq
 
 # You can get your auth token via
 # curl -X POST --data "username=<your-username>&password=<your-password>" '<you-server>/api2/auth-token/'
 
+delta=no
+if [ "${1}" = "--delta" ]; then
+    delta=yes
+fi
+
 cd $(dirname $0)
 . ../config
 
@@ -36,10 +46,41 @@ jq ".results[] | ${TALKS_EXCLUDE_FILTER} | not) | {(.code): {title, room: first(
 
 # The Seafile part
 
+## Start from the previous schedule version, only the talks that changed
+## need to be copied then.
+previous_version=$(cat schedule_version.txt 2> /dev/null)
+talks_file=''
+if [ "${delta}" = "yes" ] && [ "${previous_version}" != "" ] && [ "${previous_version}" != "${schedule_version}" ]
+then
+    if [ ! -f "schedule-${previous_version}.json" ]
+    then
+        echo "The schedule of the previous version is missing, copying all talks." >&2
+    else
+        ../apply_schedule_delta.sh "${SEAFILE_URL}" "${SEAFILE_API_TOKEN}" "${SEAFILE_REPO_ID}" "${SEAFILE_PROCESS_DIR}/${SEAFILE_PROCESS_COMPLETE_DIR}" "${SEAFILE_SCHEDULE_DIR}/${previous_version}" "${SEAFILE_SCHEDULE_DIR}/${schedule_version}" "schedule-${previous_version}.json" schedule.json > talks_to_copy.txt
+        delta_status=$?
+        if [ "${delta_status}" -eq 0 ]
+        then
+            talks_file=talks_to_copy.txt
+        elif [ "${delta_status}" -eq 6 ]
+        then
+            # Copying all talks on top of a half applied delta would keep
+            # moved talks twice.
+            echo "Error: the incomplete directory '${SEAFILE_SCHEDULE_DIR}/${schedule_version}' needs to be removed first." >&2
+            exit 4
+        else
+            echo "The previous schedule version can't be used, copying all talks." >&2
+        fi
+    fi
+fi
+
 # Only copy files we haven't copied yet, create a list of those files.
-../get_files_to_copy.sh "${SEAFILE_URL}" "${SEAFILE_API_TOKEN}" "${SEAFILE_REPO_ID}" "${SEAFILE_PROCESS_DIR}/${SEAFILE_PROCESS_COMPLETE_DIR}" "${SEAFILE_SCHEDULE_DIR}/${schedule_version}" > files_to_copy.txt
+../get_files_to_copy.sh "${SEAFILE_URL}" "${SEAFILE_API_TOKEN}" "${SEAFILE_REPO_ID}" "${SEAFILE_PROCESS_DIR}/${SEAFILE_PROCESS_COMPLETE_DIR}" "${SEAFILE_SCHEDULE_DIR}/${schedule_version}" ${talks_file} > files_to_copy.txt
 
 ## Copy the files from that list
-../copy_files.sh "${SEAFILE_URL}" "${SEAFILE_API_TOKEN}" "${SEAFILE_REPO_ID}" files_to_copy.txt
+../copy_files.sh "${SEAFILE_URL}" "${SEAFILE_API_TOKEN}" "${SEAFILE_REPO_ID}" files_to_copy.txt || exit 3
+
+## Remember this version for the next run
+cp schedule.json "schedule-${schedule_version}.json"
+echo "${schedule_version}" > schedule_version.txt
 
 echo "Files were sucessfully synchronized."
@@ -8,15 +8,20 @@
 # directory into a target directory. It outputs to stdout the list of files
 # that should be coppied. Each line consists of the source directory and the
 # target directory separated by a tab character.
+# If a file with pretalx IDs (one per line) is given, only the talks with
+# those IDs are considered.
 #
 # You need to have the following utilities installed:
 # curl, jq
+#
+# Requests that fail because of transient errors are retried, see
+# `../../common/retry.sh`.
 
 # You can get your auth token via
 # curl -X POST --data "username=<your-username>&password=<your-password>" '<you-server>/api2/auth-token/'
 
 if [ "${#}" -lt 5 ]; then
-    echo "Usage: $(basename "${0}") <base-url> <auth-token> <repo-id> <source-directory> <target-directory>"
+    echo "Usage: $(basename "${0}") <base-url> <auth-token> <repo-id> <source-directory> <target-directory> [<pretalx-ids-file>]"
     echo ""
     echo "Example: $(basename "${0}") https://example.org fe91e764226cc534811f0ba32c62a6ac41ad0d7b 280b593a-f868-0594-d97a-23d88822a35f source_dir target_dir"
     exit 1
@@ -27,6 +32,11 @@ token=${2}
 repo_id=${3}
 source_dir=${4}
 target_dir=${5}
+ids_file=${6}
+
+common_dir=$(cd "$(dirname "$0")/../../common" && pwd)
+. "${common_dir}/events.sh"
+. "${common_dir}/retry.sh"
 
 api_v20="${base_url}/api2"
 
@@ -36,20 +46,26 @@ IFS="$(printf '%b_' '\n')"; IFS="${IFS%_}"
 
 
 # Find out which files to copy
-list_dirs_ret=$(curl --silent -X GET --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/dir/?p=/${source_dir}&t=d"|jq --raw-output '.[].name')
+list_dirs_ret=$(retry_curl --silent -X GET --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/dir/?p=/${source_dir}&t=d"|jq --raw-output '.[].name')
+if [ "${ids_file}" != "" ]
+then
+    list_dirs_ret=$(echo "${list_dirs_ret}" | grep --line-regexp --fixed-strings --file "${ids_file}")
+fi
 for dir_name in ${list_dirs_ret}
 do
     # Print progress indicator to stderr, so that you can still pipe the
     # expected output into a file.
     echo "Processing ${dir_name}…" >&2
-    latest_modified_mkv_file=$(curl --silent -X GET --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/dir/?p=/${source_dir}/${dir_name}&t=f"|jq --raw-output '[.[] | select(.name | match(".mkv$|.mp4$"))] | sort_by(-.mtime) | first | .name | strings')
+    # The review proxies (`*.proxy.mp4`, see `../copy_uploads/create_proxies.sh`)
+    # are next to the uploads, they must never be copied as the final video.
+    latest_modified_mkv_file=$(retry_curl --silent -X GET --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/dir/?p=/${source_dir}/${dir_name}&t=f"|jq --raw-output '[.[] | select((.name | match(".mkv$|.mp4$")) and (.name | endswith(".proxy.mp4") | not))] | sort_by(-.mtime) | first | .name | strings')
     if [ "${latest_modified_mkv_file}" != "" ]
     then
         # Get the target file path
         target_file=$(python3 ../get_filepath.py "${dir_name}" schedule.json)"."${latest_modified_mkv_file##*.}
 
         # Copy file only if it wasn't copied yet
-        file_code=$(curl --silent -X GET --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/file/detail/?p=/${target_dir}/${target_file}" --output /dev/null --write-out '%{http_code}')
+        file_code=$(retry_curl --silent -X GET --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/file/detail/?p=/${target_dir}/${target_file}" --output /dev/null --write-out '%{http_code}')
         if [ "${file_code}" = "404" ]
         then
             # Print progress indicator to stderr, so that you can still pipe the
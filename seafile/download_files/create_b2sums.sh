@@ -23,10 +23,17 @@ then
     exit 2
 fi
 
-# Find all directories with video files
-for dir in $(find "$1" -type f -name "*.mkv" -o -name "*.mp4" -exec dirname "{}" \; |sort -u)
+# Find all directories with video files. The review proxies
+# (`*.proxy.mp4`) aren't part of the talk, they are skipped.
+for dir in $(find "$1" -type f \( -name "*.mkv" -o -name "*.mp4" \) ! -name "*.proxy.mp4" -exec dirname "{}" \; |sort -u)
 do
     echo "Processing b2sum ${dir} … "
     cd ${dir}
-    b2sum *.* > "B2SUMS"
+    for file in *.*
+    do
+        case "${file}" in
+            *.proxy.mp4) continue ;;
+        esac
+        b2sum "${file}"
+    done > "B2SUMS"
 done
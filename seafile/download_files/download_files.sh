@@ -8,16 +8,38 @@
 # from the command line. It only downloads the files of the given directory,
 # it's *not* recursing down directories.
 #
+# With `--zip` the smaller files are downloaded with a single request: Seafile
+# packs them into a zip archive, which is then extracted while the files are
+# verified against `B2SUMS`. The files are added to the archive from the
+# smallest to the largest, as long as the archive stays below
+# `DOWNLOAD_ZIP_MAX_SIZE` bytes (default 100 MB, Seafile's default limit for
+# archives). All other files, usually the videos, are downloaded one by one.
+# The `B2SUMS` file is always downloaded first, so that the files can be
+# verified while they are extracted. If Seafile didn't finish the archive
+# after `DOWNLOAD_ZIP_MAX_POLLS` checks (one per second, default 300), the
+# files are downloaded one by one as well.
+#
 # You need to have the following utilities installed:
-# b2sum, curl, cut, jq
+# b2sum, curl, cut, jq (and python3 for `--zip`)
+#
+# If the `EVENTS_FILE` environment variable is set, progress events for every
+# downloaded file are written to it, see `../../common/events.sh` for details.
+# Requests that fail because of transient errors are retried, see
+# `../../common/retry.sh`.
 #
 # The CSRF Token part is taken from (2021-06-05):
 # https://stackoverflow.com/questions/21306515/how-to-curl-an-authenticated-django-app/24376188#24376188
 
+zip_mode=no
+if [ "${1}" = "--zip" ]; then
+    zip_mode=yes
+    shift
+fi
+
 if [ "${#}" -lt 4 ]; then
-    echo "Usage: $(basename "${0}") <download-url> <absolute-path> <password> <output-dir>"
+    echo "Usage: $(basename "${0}") [--zip] <download-url> <absolute-path> <password> <output-dir>"
     echo ""
-    echo "Example: $(basename "${0}") https://example.org/d/d590ba6f7cda44840835 '/some/sub-dir' your-password ./local-dir"
+    echo "Example: $(basename "${0}") --zip https://example.org/d/d590ba6f7cda44840835 '/some/sub-dir' your-password ./local-dir"
     exit 1
 fi
 
@@ -44,6 +66,11 @@ then
     echo "'jq' not found." && exit 5
 fi
 
+script_dir=$(cd "$(dirname "$0")" && pwd)
+common_dir=$(cd "${script_dir}/../../common" && pwd)
+. "${common_dir}/events.sh"
+. "${common_dir}/retry.sh"
+
 # https://unix.stackexchange.com/questions/60653/urlencode-function/60698#60698
 urlencode () {
   string=$1; format=; set --
@@ -80,7 +107,7 @@ token=$(echo "${url}"|cut -d '/' -f 5)
 # The file to store the cookies at
 COOKIES=cookies.txt
 # Curl with default parameters
-curl="curl --cookie-jar ${COOKIES} --cookie ${COOKIES} --referer ${url}"
+curl="retry_curl --cookie-jar ${COOKIES} --cookie ${COOKIES} --referer ${url}"
 
 
 echo "Get CSRF Token…"
@@ -90,26 +117,124 @@ csrf_token=$(grep csrftoken $COOKIES | sed 's/^.*csrftoken\s*//')
 
 echo "Login…"
 ${curl} "${url}/" --silent --data-raw "csrfmiddlewaretoken=${csrf_token}&token=${token}&password=${password}" --output /dev/null
+# The token changes with the login.
+csrf_token=$(grep csrftoken $COOKIES | sed 's/^.*csrftoken\s*//')
+
+# Downloads the given files (one name per line) as a single zip archive and
+# extracts them. The names of the extracted files that match their checksum
+# are appended to the given file.
+download_zip () {
+  names=$1; verified_file=$2; set --
+  for name in ${names}
+  do
+    if [ ! -f "${out_dir}/${name}" ]
+    then
+      set -- "$@" --data-urlencode "dirents=${name}"
+    fi
+  done
+  if [ "${#}" -eq 0 ]
+  then
+    return 0
+  fi
+
+  echo "Requesting zip archive of $((${#} / 2)) files…"
+  zip_token=$(${curl} --silent --header "X-CSRFToken: ${csrf_token}" --data-urlencode "token=${token}" --data-urlencode "parent_dir=${path}" "$@" "${base_url}/api/v2.1/share-link-zip-task/"|jq --raw-output '.zip_token // empty')
+  if [ -z "${zip_token}" ]
+  then
+    echo "Creating the zip archive failed."
+    return 1
+  fi
+  polls=0
+  while true
+  do
+    polls=$((polls + 1))
+    if [ "${polls}" -gt "${DOWNLOAD_ZIP_MAX_POLLS:-300}" ]
+    then
+      echo "Creating the zip archive didn't finish in time."
+      return 1
+    fi
+    progress=$(${curl} --silent "${base_url}/api/v2.1/query-zip-progress/?token=${zip_token}")
+    if [ "$(echo "${progress}"|jq --raw-output '.failed')" = "1" ]
+    then
+      echo "Creating the zip archive failed: $(echo "${progress}"|jq --raw-output '.failed_reason')"
+      return 1
+    fi
+    if [ "$(echo "${progress}"|jq --raw-output '.zipped == .total')" = "true" ]
+    then
+      break
+    fi
+    sleep 1
+  done
+
+  echo "Downloading zip archive…"
+  zip_file="${out_dir}/.download.zip"
+  events_start "${path}"
+  if ! ${curl} --silent "${base_url}/seafhttp/zip/${zip_token}" --output "${zip_file}"
+  then
+    events_fail "Downloading the zip archive of ${path} failed."
+    rm -f "${zip_file}"
+    return 1
+  fi
+  events_end "$(wc -c < "${zip_file}" | tr -d " ")"
+  python3 "${script_dir}/extract_zip.py" "${zip_file}" "${out_dir}" >> "${verified_file}"
+  zip_status=$?
+  rm -f "${zip_file}"
+  return "${zip_status}"
+}
 
 
 echo "Get directory listing…"
 
-file_paths=$(${curl} --silent "${base_url}/api/v2.1/share-links/${token}/dirents/?path=${path}"|jq --raw-output '.dirent_list[].file_path')
+dirents=$(${curl} --silent "${base_url}/api/v2.1/share-links/${token}/dirents/?path=${path}")
+# The review proxies (`*.proxy.mp4`) aren't part of the talk.
+file_paths=$(echo "${dirents}"|jq --raw-output '.dirent_list[] | select((.file_name // "") | endswith(".proxy.mp4") | not) | .file_path')
+
+# The files that were already verified while extracting the zip archive
+verified_file=$(mktemp)
+trap 'rm -f "${verified_file}"' EXIT
+if [ "${zip_mode}" = "yes" ]
+then
+    ${curl} "${url}/files/?p=$(urlencode "${path%/}/B2SUMS")&dl=1" --silent --location --output "${out_dir}/B2SUMS"
+    echo "B2SUMS" >> "${verified_file}"
+    # Add the smallest files to the archive, as long as it's small enough.
+    zip_names=$(echo "${dirents}"|jq --raw-output --argjson max "${DOWNLOAD_ZIP_MAX_SIZE:-100000000}" '[.dirent_list[] | select((.is_dir | not) and .file_name != "B2SUMS" and (.file_name | endswith(".proxy.mp4") | not))] | sort_by(.size) | reduce .[] as $file ({size: 0, names: []}; if .size + $file.size <= $max then {size: (.size + $file.size), names: (.names + [$file.file_name])} else . end) | .names[]')
+    # The files that couldn't be extracted are downloaded one by one below.
+    download_zip "${zip_names}" "${verified_file}" || echo "Not all files could be downloaded as zip archive, downloading them one by one."
+fi
+
 for file_path in ${file_paths}
 do
+    if grep --quiet --line-regexp --fixed-strings "$(basename "${file_path}")" "${verified_file}"
+    then
+        continue
+    fi
     file_path_urlencoded=$(urlencode "${file_path}")
     echo "Downloading ${file_path}…"
     if [ -f "${out_dir}/$(basename "${file_path}")" ]; then
         echo "File $(basename "${file_path}") already exists, if checksum is invalid please remove!"
     else
-        ${curl} "${url}/files/?p=${file_path_urlencoded}&dl=1" --location --output "${out_dir}/$(basename "${file_path}")"
+        events_start "${file_path}"
+        if ${curl} "${url}/files/?p=${file_path_urlencoded}&dl=1" --location --output "${out_dir}/$(basename "${file_path}")"
+        then
+            events_end "$(wc -c < "${out_dir}/$(basename "${file_path}")" | tr -d " ")"
+        else
+            events_fail "Downloading ${file_path} failed."
+        fi
     fi
 done
 
 echo "Checksum check…"
 cd "${out_dir}" || exit 6
-b2sum --check B2SUMS
-b2sum_status=$?
+# Only check the files that weren't verified while extracting the archive.
+awk 'FILENAME == ARGV[1] { verified[$0]; next } { name = substr($0, index($0, " ") + 2) } !(name in verified)' "${verified_file}" B2SUMS > .B2SUMS.unverified
+if [ -s .B2SUMS.unverified ]
+then
+    b2sum --check .B2SUMS.unverified
+    b2sum_status=$?
+else
+    b2sum_status=0
+fi
+rm -f .B2SUMS.unverified
 if [ "${b2sum_status}" = 0 ]
 then
      echo "Checksums match."
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: MIT
+
+# This script extracts a zip archive that was downloaded from Seafile into a
+# directory and verifies the files against the `B2SUMS` file of that directory
+# while they are extracted, so that they don't need to be read again for the
+# check.
+#
+# The archive is flattened, the files are extracted directly into the
+# directory. Files whose checksum doesn't match are removed. The names of the
+# files that were extracted and verified are printed, one per line.
+#
+#     ./extract_zip.py download.zip ./local-dir
+
+import argparse, hashlib, os, sys, zipfile
+
+B2SUMS = "B2SUMS"
+# The number of bytes that are extracted at once.
+CHUNK_SIZE = 1024 * 1024
+
+
+def parse_b2sums(lines):
+    """Returns the checksums of a `B2SUMS` file by file name."""
+    checksums = {}
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line:
+            continue
+        checksum, _separator, name = line.partition(" ")
+        # Files that were hashed in binary mode are marked with a `*`.
+        checksums[name[1:] if name[:1] in (" ", "*") else name] = checksum
+    return checksums
+
+
+def extract(archive, info, path):
+    """Extracts a single file and returns its BLAKE2b checksum (like
+    `b2sum`)."""
+    checksum = hashlib.blake2b()
+    partial = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.partial")
+    with archive.open(info) as source, open(partial, "wb") as target:
+        while chunk := source.read(CHUNK_SIZE):
+            checksum.update(chunk)
+            target.write(chunk)
+    os.replace(partial, path)
+    return checksum.hexdigest()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Extract a zip archive and verify the files against B2SUMS."
+    )
+    parser.add_argument("archive", help="the zip archive")
+    parser.add_argument("output_dir", help="the directory to extract into")
+    args = parser.parse_args(argv)
+
+    failed = False
+    try:
+        archive = zipfile.ZipFile(args.archive)
+    except zipfile.BadZipFile:
+        # E.g. Seafile returned an error page instead of the archive.
+        print(f"{args.archive} is not a valid zip archive.", file=sys.stderr)
+        return 1
+    with archive:
+        members = {
+            os.path.basename(info.filename): info
+            for info in archive.infolist()
+            if not info.is_dir()
+        }
+        with open(os.path.join(args.output_dir, B2SUMS)) as b2sums_file:
+            checksums = parse_b2sums(b2sums_file)
+
+        for name, info in members.items():
+            path = os.path.join(args.output_dir, name)
+            checksum = extract(archive, info, path)
+            if name not in checksums:
+                print(f"{name}: no checksum found", file=sys.stderr)
+            elif checksum != checksums[name]:
+                print(f"{name}: FAILED", file=sys.stderr)
+                os.remove(path)
+                failed = True
+            else:
+                print(f"{name}: OK", file=sys.stderr)
+                print(name)
+    if failed:
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
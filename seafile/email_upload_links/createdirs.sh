@@ -8,6 +8,9 @@
 # in the root of the repo returns its name together with the upload link as
 # JSON, where the directory name is the key and the upload link is the value.
 
+# Requests that fail because of transient errors are retried, see
+# `../../common/retry.sh`.
+
 # You can get your auth token via
 # curl -X POST --data "username=<your-username>&password=<your-password>" '<you-server>/api2/auth-token/'
 
@@ -24,18 +27,22 @@ repo_id=${3}
 dir_name=${4}
 option=${5}""
 
+common_dir=$(cd "$(dirname "$0")/../../common" && pwd)
+. "${common_dir}/events.sh"
+. "${common_dir}/retry.sh"
+
 api_v20="${base_url}/api2"
 api_v21="${base_url}/api/v2.1"
 
 echo -n "Creating ${dir_name} on Seafile… " >&2
 
 # check directory existing
-dir_check=$(curl --silent -X GET --header "Authorization: Token ${token}" "${api_v21}/repos/${repo_id}/dir/detail/?path=/${dir_name}" | jq -r '.error_msg')
+dir_check=$(retry_curl --silent -X GET --header "Authorization: Token ${token}" "${api_v21}/repos/${repo_id}/dir/detail/?path=/${dir_name}" | jq -r '.error_msg')
 
 if [ "${dir_check}" != null ]
 then
   # create new directory
-  mkdir_ret=$(curl --silent -X POST --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/dir/?p=/${dir_name}" --data 'operation=mkdir')
+  mkdir_ret=$(retry_curl --silent -X POST --header "Authorization: Token ${token}" "${api_v20}/repos/${repo_id}/dir/?p=/${dir_name}" --data 'operation=mkdir')
   if [ "${mkdir_ret}" != '"success"' ]; then
       echo "failed" >&2
       exit 2
@@ -48,7 +55,7 @@ fi
 # output into a file as progress indicator
 if [ "${option}" != "nolink" ]
 then
-  upload_link_ret=$(curl --silent -X POST --header "Authorization: Token ${token}" "${api_v21}/upload-links/" --data "path=/${dir_name}/&repo_id=${repo_id}"|jq --compact-output '{(.obj_name): .link}')
+  upload_link_ret=$(retry_curl --silent -X POST --header "Authorization: Token ${token}" "${api_v21}/upload-links/" --data "path=/${dir_name}/&repo_id=${repo_id}"|jq --compact-output '{(.obj_name): .link}')
   echo "${upload_link_ret}"
 fi
 
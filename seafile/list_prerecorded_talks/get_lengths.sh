@@ -16,7 +16,8 @@ then
     echo "'cut' not found." && exit 2
 fi
 
-for file in $(find $1  -name '*.mp4' -o -name '*.mkv')
+# The review proxies (`*.proxy.mp4`) are skipped.
+for file in $(find $1 \( -name '*.mp4' -o -name '*.mkv' \) ! -name '*.proxy.mp4')
 do
     length=$(ffprobe -v error -show_entries format=duration -of default=noprint_wrappers=1:nokey=1 "${file}"|cut -d '.' -f 1)
     file=$(basename $file)
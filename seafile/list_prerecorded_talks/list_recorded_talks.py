@@ -10,8 +10,15 @@
 
 import argparse
 import time
-import json
 import os
+import sys
+
+# Make sure the shared `schedule` module can be found.
+sys.path.insert(1, os.path.join(sys.path[0], "..", "..", "common"))
+from schedule import read_schedule
+
+# We only care about the four main stages
+STAGES = ["Bühne 1", "Bühne 2", "Bühne 3", "Demosession"]
 
 parser = argparse.ArgumentParser(description="Print text file of schedule.")
 parser.add_argument("schedule", help="A schedule.json from pretalx.")
@@ -24,8 +31,10 @@ args = parser.parse_args()
 schedule_path = args.schedule
 talks_length_path = args.talks_length
 
-with open(schedule_path) as schedule_file:
-    schedule = json.load(schedule_file)
+# Only read the rooms and the fields of the talks that are printed.
+schedule = read_schedule(
+    schedule_path, rooms=STAGES, fields=["url", "type", "start", "title"]
+)
 with open(talks_length_path) as talks_length_file:
     talks_length_list = talks_length_file.read().strip().split("\n")
     talks_length = {}
@@ -52,8 +61,7 @@ for day in days:
     print(day["date"])
     print("----------")
     for room_name, room in day["rooms"].items():
-        # We only care about the four main stages
-        if room_name in ["Bühne 1", "Bühne 2", "Bühne 3", "Demosession"]:
+        if room_name in STAGES:
             print(f"\n\n### {room_name}\n")
 
             is_lt_block = False
@@ -11,6 +11,11 @@
 import argparse
 import json
 import os
+import sys
+
+# Make sure the `profiling` module can be found in the `common` directory.
+sys.path.insert(1, os.path.join(sys.path[0], "..", "..", "common"))
+import profiling
 
 parser = argparse.ArgumentParser(
     description="Generate emails out of a some data and a template."
@@ -19,6 +24,7 @@ parser.add_argument("template", help="The template file to use.")
 parser.add_argument("data", help="The JSON file to use as input data.")
 
 args = parser.parse_args()
+profiling.start("data-to-email")
 
 template_path = args.template
 data_path = args.data
@@ -26,7 +32,7 @@ data_path = args.data
 
 with open(template_path) as template_file:
     template = template_file.read()
-with open(data_path) as data_file:
+with open(data_path) as data_file, profiling.section("parse"):
     data = json.load(data_file)
 
 os.makedirs("emails", exist_ok=True)
@@ -39,6 +45,7 @@ for entry in data:
     ]
     entry["upload_links_list"] = "\n".join(upload_links)
 
-    email_body = template.format(**entry)
-    with open(f"emails/{entry['email']}", 'w') as email_file:
+    with profiling.section("render"):
+        email_body = template.format(**entry)
+    with profiling.section("write"), open(f"emails/{entry['email']}", 'w') as email_file:
         email_file.write(email_body)
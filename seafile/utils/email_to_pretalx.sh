@@ -38,7 +38,7 @@ do
     case "$email_address" in
         *@*)
             #  currently not working!
-            echo Mail: ${email_address} - skip, not working
+            echo Mail: ${email_address} - skip, not working, use email_to_smtp.py
             # curl "${pretalx_url}" -H "Referer: ${pretalx_url}" -H "Cookie: ${cookie_data}"  --data-raw "csrfmiddlewaretoken=${csrf_token}" --data-urlencode "additional_recipients=${email_address}" --data-urlencode "reply_to=${MAIL_REPLAY_TO}" --data-urlencode "subject=${subject}" --data-urlencode "text=${email_body}"
             ;;
         *)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: MIT
+
+# This script sends the emails that `data_to_email.py` created directly via
+# an SMTP relay. It takes a directory where each file contains an email body
+# and the filename is the email address of the speaker. Files that are named
+# after a submission code instead can only be sent via pretalx, see
+# `email_to_pretalx.sh`, they are skipped.
+#
+# The emails are sent over a small pool of connections that stay open and
+# are only authenticated once. The number of emails per second is limited, so
+# that the relay doesn't reject them. Sent emails are moved into the
+# subdirectory `send`, so you can rerun the script after an error.
+#
+# The relay is configured in `../config`, source it before:
+#
+#     (. ../config && ./email_to_smtp.py ../email_upload_links/out/emails "Upload your talk")
+#
+# The settings are:
+#
+#  - `SMTP_HOST`, `SMTP_PORT`: the relay
+#  - `SMTP_SECURITY`: `starttls` (default), `ssl` or `none`
+#  - `SMTP_USER`, `SMTP_PASSWORD`: the login, no login if the user is empty
+#  - `MAIL_FROM`: the sender
+#  - `MAIL_REPLAY_TO`: the `Reply-To` address (optional)
+#  - `SMTP_CONNECTIONS`: the number of parallel connections (default 4)
+#  - `SMTP_RATE`: the maximum number of emails per second (default 10, 0 means
+#    no limit)
+
+import argparse, os, sys, threading, time
+
+sys.path.insert(1, os.path.join(sys.path[0], "..", "..", "common"))
+from retry import DEFAULT_POLICY
+
+SENT_DIR = "send"
+# Seconds until a connection attempt or a command times out.
+TIMEOUT = 60
+
+
+class RateLimit:
+    """Spaces out calls of `wait()` from several threads evenly."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            at = max(now, self.next)
+            self.next = at + self.interval
+        if at > now:
+            time.sleep(at - now)
+
+
+class Connection:
+    """An SMTP connection that is opened on first use and reopened if the
+    relay closed it."""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.smtp = None
+
+    def open(self):
+        import smtplib, ssl
+
+        settings = self.settings
+        if settings.security == "ssl":
+            smtp = smtplib.SMTP_SSL(
+                settings.host,
+                settings.port,
+                timeout=TIMEOUT,
+                context=ssl.create_default_context(),
+            )
+        else:
+            smtp = smtplib.SMTP(settings.host, settings.port, timeout=TIMEOUT)
+            if settings.security == "starttls":
+                smtp.starttls(context=ssl.create_default_context())
+        if settings.user:
+            smtp.login(settings.user, settings.password)
+        return smtp
+
+    def send(self, message):
+        if self.smtp is None:
+            self.smtp = self.open()
+        self.smtp.send_message(message)
+
+    def close(self):
+        import smtplib
+
+        if self.smtp is None:
+            return
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self.smtp.close()
+        self.smtp = None
+
+
+def is_transient(error):
+    """Returns whether sending might succeed on a new connection."""
+    import smtplib
+
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return False
+    if isinstance(error, smtplib.SMTPResponseException):
+        # 4xx are temporary failures, e.g. too many messages.
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, OSError)
+
+
+def create_message(settings, address, subject, body):
+    from email.message import EmailMessage
+    from email.utils import formatdate, make_msgid, parseaddr
+
+    message = EmailMessage()
+    message["From"] = settings.mail_from
+    message["To"] = address
+    if settings.reply_to:
+        message["Reply-To"] = settings.reply_to
+    message["Subject"] = subject
+    message["Date"] = formatdate(localtime=True)
+    message["Message-ID"] = make_msgid(
+        domain=parseaddr(settings.mail_from)[1].rpartition("@")[2] or None
+    )
+    message.set_content(body)
+    return message
+
+
+def sender(settings, emails_dir, subject, pending, rate_limit, failed):
+    """Sends emails from the shared list until it's empty, over a single
+    connection."""
+    connection = Connection(settings)
+    try:
+        while True:
+            try:
+                address = pending.pop()
+            except IndexError:
+                return
+            path = os.path.join(emails_dir, address)
+            with open(path) as email_file:
+                message = create_message(
+                    settings, address, subject, email_file.read()
+                )
+            attempt = 0
+            while True:
+                rate_limit.wait()
+                try:
+                    connection.send(message)
+                except Exception as error:
+                    connection.close()
+                    attempt += 1
+                    if not is_transient(error) or attempt >= DEFAULT_POLICY.attempts:
+                        print(f"Mail: {address} - failed: {error}", file=sys.stderr)
+                        failed.append(address)
+                        break
+                    # Relays often close a connection after a number of
+                    # emails, hence the first retry is right away.
+                    if attempt > 1:
+                        delay = DEFAULT_POLICY.delay(attempt)
+                        print(
+                            f"Mail: {address} - attempt {attempt} failed ({error}), retrying in {round(delay, 1)}s.",
+                            file=sys.stderr,
+                        )
+                        time.sleep(delay)
+                else:
+                    os.replace(path, os.path.join(emails_dir, SENT_DIR, address))
+                    print(f"Mail: {address} - success")
+                    break
+    finally:
+        connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Send the emails of a directory via an SMTP relay."
+    )
+    parser.add_argument(
+        "emails_dir", help="directory with one file per email address"
+    )
+    parser.add_argument("subject", help="the subject of all emails")
+    parser.add_argument(
+        "--connections",
+        type=int,
+        default=int(os.environ.get("SMTP_CONNECTIONS") or 4),
+        help="number of parallel connections (default: $SMTP_CONNECTIONS or 4)",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=float(os.environ.get("SMTP_RATE") or 10),
+        help="maximum emails per second, 0 means no limit (default: $SMTP_RATE or 10)",
+    )
+    args = parser.parse_args(argv)
+
+    settings = argparse.Namespace(
+        host=os.environ.get("SMTP_HOST", "localhost"),
+        port=int(os.environ.get("SMTP_PORT") or 0),
+        security=os.environ.get("SMTP_SECURITY") or "starttls",
+        user=os.environ.get("SMTP_USER"),
+        password=os.environ.get("SMTP_PASSWORD"),
+        mail_from=os.environ.get("MAIL_FROM"),
+        reply_to=os.environ.get("MAIL_REPLAY_TO"),
+    )
+    if settings.security not in ("starttls", "ssl", "none"):
+        parser.error(f"unknown SMTP_SECURITY '{settings.security}'")
+    if not settings.mail_from:
+        parser.error("MAIL_FROM needs to be set")
+
+    os.makedirs(os.path.join(args.emails_dir, SENT_DIR), exist_ok=True)
+    pending = []
+    for name in sorted(os.listdir(args.emails_dir), reverse=True):
+        if name == SENT_DIR or name.startswith("."):
+            continue
+        if "@" not in name:
+            print(f"Mail: {name} - skip, submission codes need email_to_pretalx.sh")
+            continue
+        pending.append(name)
+    if not pending:
+        print("No emails need to be sent.")
+        return
+
+    total = len(pending)
+    rate_limit = RateLimit(args.rate)
+    failed = []
+    started = time.monotonic()
+    threads = [
+        threading.Thread(
+            target=sender,
+            args=(settings, args.emails_dir, args.subject, pending, rate_limit, failed),
+        )
+        for _ in range(max(1, min(args.connections, total)))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(
+        f"Sent {total - len(failed)} of {total} emails over {len(threads)} connections in {round(time.monotonic() - started, 1)}s."
+    )
+    if failed:
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,8 +2,29 @@
 
 import argparse
 import json
+import os
 import sys
-import urllib.request
+import urllib.parse
+
+# Make sure the `retry` and `profiling` modules can be found in the `common`
+# directory.
+sys.path.insert(1, os.path.join(sys.path[0], '..', '..', 'common'))
+from retry import retry_call
+import profiling
+
+# Seconds to wait for a response before retrying.
+TIMEOUT = 60
+
+
+def fetch_page(url, token):
+    # Importing it is slow, don't do it if only the help is shown.
+    import urllib.request
+    req = urllib.request.Request(url, headers={
+        'Authorization': f'Token {token}'
+    })
+    with urllib.request.urlopen(req, timeout=TIMEOUT) as resp:
+        return json.load(resp)
+
 
 parser = argparse.ArgumentParser(
     description='Get all the data from a pretalx endpoint.')
@@ -11,6 +32,7 @@ parser.add_argument('token', help='token for the API')
 parser.add_argument('url', help='pretalx API URL')
 
 args = parser.parse_args()
+profiling.start('pretalx-get-all')
 
 url = args.url
 token = args.token
@@ -30,23 +52,21 @@ while (url):
     # printed to the stdout into a file.
     print(f'{url}', file=sys.stderr)
 
-    req = urllib.request.Request(url, headers={
-        'Authorization': f'Token {token}'
-    })
-
-    with urllib.request.urlopen(req) as resp:
-        # Parse the response so that we combine it easily
-        data = json.load(resp)
+    # A single failing page is retried instead of starting all over again
+    host = urllib.parse.urlsplit(url).netloc
+    with profiling.section('fetch'):
+        data = retry_call(lambda: fetch_page(url, token), host)
 
-        # Add the current result to the combined data
-        combined['results'].extend(data['results'])
+    # Add the current result to the combined data
+    combined['results'].extend(data['results'])
 
-        # The `count` is always the total number of items, so we can safely
-        # override it
-        combined['count'] = data['count']
+    # The `count` is always the total number of items, so we can safely
+    # override it
+    combined['count'] = data['count']
 
-        # Prepare for the next loop iteration. If there is no more data `next`
-        # will be `None` and the loop will abort
-        url = data['next']
+    # Prepare for the next loop iteration. If there is no more data `next`
+    # will be `None` and the loop will abort
+    url = data['next']
 
-print(json.dumps(combined))
+with profiling.section('write'):
+    print(json.dumps(combined))
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: MIT
+
+# Adds uploaded videos to playlists based on their metadata.
+#
+# The input are two newline delimited JSON files: the metadata (e.g. the
+# output of the FOSS4G 2022 `schedule-to-metadata.py` script) and the output
+# of `upload-video.py`, which contains the YouTube ID of each video. They are
+# joined via the `video_file` key.
+#
+# For every key given with `--key`, the value of that key is the name of a
+# playlist the video is added to, e.g. with `--key track --key
+# conference_type` every video ends up in the playlist of its track and the one
+# of its conference type. Playlists that don't exist yet are created. The
+# items of the existing playlists are fetched first, so that only the videos
+# that are missing are added. This way the script can be run again after more
+# videos were uploaded. The videos are added in the order of the metadata file.
+#
+# The playlists are processed concurrently, the items within a playlist are
+# inserted sequentially, as YouTube doesn't cope well with concurrent inserts
+# into the same playlist.
+#
+#     YOUTUBE_CREDENTIALS=./youtube-credentials.json ./assign-playlists.py --key track --key conference_type --prefix 'FOSS4G 2022 | ' metadata.ndjson youtube_id.ndjson
+#
+# Managing playlists needs the `https://www.googleapis.com/auth/youtube` scope,
+# see `get-token.py` for how to get the credentials.
+
+import argparse, json, sys
+from concurrent.futures import ThreadPoolExecutor
+
+# The maximum number of results the API returns per page.
+MAX_RESULTS = 50
+DEFAULT_JOBS = 4
+
+
+def read_ndjson(path):
+    with open(path) as ndjson_file:
+        return [json.loads(line) for line in ndjson_file if line.strip()]
+
+
+def fetch_all(list_method, **kwargs):
+    """Returns the items of all pages of a list call."""
+    items = []
+    page_token = None
+    while True:
+        response = list_method(
+            max_results=MAX_RESULTS, page_token=page_token, return_json=True, **kwargs
+        )
+        items.extend(response.get("items", []))
+        page_token = response.get("nextPageToken")
+        if page_token is None:
+            return items
+
+
+def existing_playlists(cli):
+    """Returns a dict with the title of the playlists of the channel as key
+    and their ID as value."""
+    playlists = fetch_all(cli.playlists.list, parts="snippet", mine=True)
+    return {playlist["snippet"]["title"]: playlist["id"] for playlist in playlists}
+
+
+def create_playlist(cli, title, privacy_status):
+    playlist = cli.playlists.insert(
+        body={
+            "snippet": {"title": title, "defaultLanguage": "en"},
+            "status": {"privacyStatus": privacy_status},
+        },
+        parts=["snippet", "status"],
+        return_json=True,
+    )
+    return playlist["id"]
+
+
+def fill_playlist(cli, title, playlist_id, video_ids):
+    """Adds the videos that are not in the playlist yet.
+
+    Returns the number of added videos.
+    """
+    items = fetch_all(
+        cli.playlistItems.list, parts="contentDetails", playlist_id=playlist_id
+    )
+    in_playlist = {item["contentDetails"]["videoId"] for item in items}
+    missing = [video_id for video_id in video_ids if video_id not in in_playlist]
+    for video_id in missing:
+        cli.playlistItems.insert(
+            body={
+                "snippet": {
+                    "playlistId": playlist_id,
+                    "resourceId": {"kind": "youtube#video", "videoId": video_id},
+                }
+            },
+            parts="snippet",
+        )
+    print(
+        f"Playlist `{title}`: added {len(missing)} of {len(video_ids)} videos.",
+        file=sys.stderr,
+    )
+    return len(missing)
+
+
+def group_by_playlist(metadata, youtube_ids, keys, prefix):
+    """Returns a dict with the playlist title as key and the list of YouTube
+    IDs of the videos that belong to it as value."""
+    playlists = {}
+    for item in metadata:
+        youtube_id = youtube_ids.get(item.get("video_file"))
+        if youtube_id is None:
+            continue
+        for key in keys:
+            if item.get(key):
+                title = f"{prefix}{item[key]}"
+                playlists.setdefault(title, []).append(youtube_id)
+    return playlists
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Add uploaded videos to playlists based on their metadata."
+    )
+    parser.add_argument("metadata", help="newline delimited JSON file with metadata")
+    parser.add_argument(
+        "youtube_ids", help="newline delimited JSON output of `upload-video.py`"
+    )
+    parser.add_argument(
+        "--key",
+        action="append",
+        required=True,
+        help="metadata key whose value is the playlist name, can be given several times",
+    )
+    parser.add_argument(
+        "--prefix", default="", help="prefix for the titles of the playlists"
+    )
+    parser.add_argument(
+        "--privacy",
+        choices=["private", "unlisted", "public"],
+        default="private",
+        help="privacy status of newly created playlists (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=DEFAULT_JOBS,
+        help="number of playlists to fill concurrently (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only print the playlists and the number of videos",
+    )
+    args = parser.parse_args(argv)
+
+    metadata = read_ndjson(args.metadata)
+    youtube_ids = {
+        item["video_file"]: item["youtube_id"] for item in read_ndjson(args.youtube_ids)
+    }
+    playlists = group_by_playlist(metadata, youtube_ids, args.key, args.prefix)
+
+    if args.dry_run:
+        for title, video_ids in playlists.items():
+            print(json.dumps({"playlist": title, "videos": len(video_ids)}))
+        return 0
+
+    # Importing the YouTube library is slow, only do it if it's needed.
+    from credentials import client_from_environment
+
+    cli = client_from_environment()
+    if cli is None:
+        print(
+            "The `YOUTUBE_CREDENTIALS` or the `YOUTUBE_ACCESS_TOKEN` environment "
+            "variable must be set. Retrieve them via the `get-token.py` script."
+        )
+        return 2
+
+    playlist_ids = existing_playlists(cli)
+    for title in playlists:
+        if title not in playlist_ids:
+            print(f"Creating playlist `{title}`.", file=sys.stderr)
+            playlist_ids[title] = create_playlist(cli, title, args.privacy)
+
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        futures = [
+            executor.submit(fill_playlist, cli, title, playlist_ids[title], video_ids)
+            for title, video_ids in playlists.items()
+        ]
+        added = sum(future.result() for future in futures)
+    print(f"Added {added} videos to {len(playlists)} playlists.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
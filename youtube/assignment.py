@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: MIT
+
+# Solve the linear assignment problem with NumPy: assign every row of a cost
+# matrix to a distinct column, so that the sum of the costs is minimal.
+#
+# It's the shortest augmenting path variant of the Hungarian algorithm
+# (https://cp-algorithms.com/graph/hungarian-algorithm.html), the updates of
+# the potentials are done for all columns at once, so that it's fast enough
+# even for larger matrices without depending on SciPy.
+#
+# You need to have `numpy` (https://pypi.org/project/numpy/) installed in order
+# to use this library.
+
+import numpy as np
+
+
+def linear_sum_assignment(cost):
+    """Returns the column each row is assigned to.
+
+    The `cost` is a 2-dimensional array with at most as many rows as columns.
+    The result is an array with one column index per row.
+    """
+    cost = np.asarray(cost, dtype=float)
+    num_rows, num_cols = cost.shape
+    if num_rows > num_cols:
+        raise ValueError("The cost matrix must not have more rows than columns.")
+
+    # The algorithm is 1-based, index 0 is a virtual column/row.
+    row_potential = np.zeros(num_rows + 1)
+    col_potential = np.zeros(num_cols + 1)
+    # The row a column is assigned to, 0 means it's not assigned yet.
+    assigned_row = np.zeros(num_cols + 1, dtype=int)
+    # The previous column on the augmenting path.
+    way = np.zeros(num_cols + 1, dtype=int)
+
+    for row in range(1, num_rows + 1):
+        assigned_row[0] = row
+        col = 0
+        min_slack = np.full(num_cols + 1, np.inf)
+        used = np.zeros(num_cols + 1, dtype=bool)
+        while True:
+            used[col] = True
+            current_row = assigned_row[col]
+            slack = (
+                cost[current_row - 1]
+                - row_potential[current_row]
+                - col_potential[1:]
+            )
+            free = ~used[1:]
+            improved = free & (slack < min_slack[1:])
+            min_slack[1:][improved] = slack[improved]
+            way[1:][improved] = col
+
+            candidates = np.where(free, min_slack[1:], np.inf)
+            next_col = int(np.argmin(candidates)) + 1
+            delta = candidates[next_col - 1]
+
+            row_potential[assigned_row[used]] += delta
+            col_potential[used] -= delta
+            min_slack[~used] -= delta
+
+            col = next_col
+            if assigned_row[col] == 0:
+                break
+
+        # Flip the assignments along the augmenting path.
+        while col != 0:
+            previous_col = way[col]
+            assigned_row[col] = assigned_row[previous_col]
+            col = previous_col
+
+    result = np.zeros(num_rows, dtype=int)
+    cols = np.nonzero(assigned_row[1:])[0]
+    result[assigned_row[cols + 1] - 1] = cols
+    return result
+
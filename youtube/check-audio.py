@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: MIT
+
+# Checks the audio of recordings for problems, so that nobody needs to listen
+# through hours of video to find them.
+#
+# The audio of every video is decoded at a low sample rate and split into
+# short windows, the loudness of every window is then used to find:
+#
+#  - dropouts: short holes of digital silence in the middle of the audio, e.g.
+#    from a broken recording
+#  - long silences: parts where nobody speaks for a long time
+#  - likely empty recordings: almost no part of the audio is above the
+#    silence level, e.g. when the speaker didn't show up
+#
+# The input is the same as for `upload-video.py`, only the `video_file` key is
+# needed. The output is a report for every video as newline delimited JSON,
+# with the times in seconds. The videos with problems are also listed on
+# stderr:
+#
+#     ./check-audio.py metadata.ndjson > audio-report.ndjson
+#
+# The videos are processed in parallel, `ffmpeg`, `ffprobe` and [NumPy] need
+# to be installed.
+#
+# [NumPy]: https://numpy.org/
+
+import argparse, json, multiprocessing, os, sys
+
+sys.path.insert(1, os.path.join(sys.path[0], "..", "common"))
+import media
+
+# The audio is analysed at this sample rate, that's enough for speech.
+SAMPLE_RATE = 8000
+# Length of the windows the level is calculated for, in seconds.
+WINDOW = 0.05
+# Levels below this are digital silence (e.g. zeros inserted for missing
+# data), which doesn't occur in a real recording, in dBFS.
+DROPOUT_DB = -90
+# Dropouts need to be at least that long, in seconds.
+MIN_DROPOUT = 0.1
+# Silences of at least that many seconds are reported.
+DEFAULT_LONG_SILENCE = 10
+# Recordings where less than this share of the audio is above the silence
+# level are likely empty.
+MIN_ACTIVE_RATIO = 0.05
+
+
+def time_ranges(starts, ends):
+    return [
+        [round(start * WINDOW, 1), round(end * WINDOW, 1)]
+        for start, end in zip(starts.tolist(), ends.tolist())
+    ]
+
+
+def analyse(levels, long_silence):
+    """Returns the problems found in the levels of the windows (in dBFS)."""
+    import numpy as np
+
+    silent = levels < media.SILENCE_DB
+    active_ratio = 1 - float(np.mean(silent)) if len(levels) else 0
+
+    starts, ends = media.runs(levels < DROPOUT_DB)
+    # Digital silence at the beginning or the end is just padding.
+    dropouts = (
+        (ends - starts >= MIN_DROPOUT / WINDOW) & (starts > 0) & (ends < len(levels))
+    )
+    silence_starts, silence_ends = media.runs(silent)
+    long_silences = silence_ends - silence_starts >= long_silence / WINDOW
+
+    return {
+        "duration": round(len(levels) * WINDOW, 1),
+        "active_ratio": round(active_ratio, 3),
+        "dropouts": time_ranges(starts[dropouts], ends[dropouts]),
+        "long_silences": time_ranges(
+            silence_starts[long_silences], silence_ends[long_silences]
+        ),
+        "likely_empty": active_ratio < MIN_ACTIVE_RATIO,
+    }
+
+
+def check_video(job):
+    """Returns the report for a single video."""
+    video_file, long_silence, threads = job
+    report = {"video_file": video_file}
+    try:
+        if media.first_stream(media.probe(video_file), "audio") is None:
+            return {**report, "error": "no audio stream", "likely_empty": True}
+        samples = media.decode_audio(video_file, SAMPLE_RATE, threads)
+    except (media.MediaError, ValueError) as error:
+        return {**report, "error": str(error)}
+    levels = media.rms_db(samples, int(SAMPLE_RATE * WINDOW))
+    return {**report, **analyse(levels, long_silence)}
+
+
+def problems(report):
+    """Returns a short description of the problems of a report."""
+    found = []
+    if "error" in report:
+        found.append(report["error"])
+    elif report["likely_empty"]:
+        found.append("likely empty")
+    if report.get("dropouts"):
+        found.append(f"{len(report['dropouts'])} dropouts")
+    if report.get("long_silences"):
+        found.append(f"{len(report['long_silences'])} long silences")
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Find dropouts, long silences and empty recordings."
+    )
+    parser.add_argument(
+        "metadata",
+        type=argparse.FileType("r"),
+        help="newline delimited JSON file with a `video_file` key, `-` for stdin",
+    )
+    parser.add_argument(
+        "--long-silence",
+        type=float,
+        default=DEFAULT_LONG_SILENCE,
+        help="minimum length of reported silences in seconds (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=media.cpu_count(),
+        help="number of videos to process in parallel (default: number of CPUs)",
+    )
+    args = parser.parse_args(argv)
+
+    with args.metadata as metadata_file:
+        video_files = [
+            json.loads(line)["video_file"] for line in metadata_file if line.strip()
+        ]
+
+    threads = media.threads_per_job(args.jobs)
+    jobs = [(video_file, args.long_silence, threads) for video_file in video_files]
+    flagged = 0
+    with multiprocessing.Pool(args.jobs) as pool:
+        for report in pool.imap(check_video, jobs):
+            found = problems(report)
+            if found:
+                flagged += 1
+                print(f"{report['video_file']}: {', '.join(found)}", file=sys.stderr)
+            print(json.dumps(report), flush=True)
+    print(
+        f"{flagged} of {len(video_files)} videos need to be checked.", file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: MIT
+
+# Library to store the OAuth credentials for YouTube and to keep the access
+# token fresh. An access token is only valid for an hour, with the refresh
+# token a new one can be requested without user interaction. This way batches
+# that take longer than an hour don't stop when the access token expires.
+#
+# The credentials file is created by the `get-token.py` script. The scripts
+# using it get the path via the `YOUTUBE_CREDENTIALS` environment variable. As
+# a fallback, an access token can be given directly via the
+# `YOUTUBE_ACCESS_TOKEN` environment variable, that one isn't refreshed though.
+
+import json, os, threading, time
+
+from pyyoutube import Client
+
+# Refresh the access token if it expires within that many seconds.
+REFRESH_MARGIN = 5 * 60
+
+
+def save_credentials(path, credentials):
+    """Saves the credentials so that only the current user can read them.
+
+    The file is replaced atomically, so that other processes that use the same
+    file never see a partially written one.
+    """
+    tmp_path = f"{path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as credentials_file:
+        json.dump(credentials, credentials_file, indent=2)
+    os.replace(tmp_path, path)
+
+
+class RefreshingClient(Client):
+    """A YouTube client that refreshes its access token before it expires.
+
+    The refreshed access token is written back to the credentials file, so
+    that it can be re-used by subsequent runs.
+    """
+
+    def __init__(self, credentials_path):
+        with open(credentials_path) as credentials_file:
+            credentials = json.load(credentials_file)
+        super().__init__(
+            client_id=credentials["client_id"],
+            client_secret=credentials["client_secret"],
+            access_token=credentials.get("access_token"),
+            refresh_token=credentials["refresh_token"],
+        )
+        self.credentials_path = credentials_path
+        self.expires_at = credentials.get("expires_at") or 0
+        # The client may be shared between threads, only one of them should
+        # refresh the token.
+        self.refresh_lock = threading.Lock()
+
+    def add_token_to_headers(self):
+        # This is called before every authenticated request, including every
+        # chunk of an upload.
+        with self.refresh_lock:
+            if time.time() > self.expires_at - REFRESH_MARGIN:
+                self.refresh()
+        super().add_token_to_headers()
+
+    def refresh(self):
+        """Gets a new access token and stores it in the credentials file."""
+        token = self.refresh_access_token(self.refresh_token, return_json=True)
+        self.access_token = token["access_token"]
+        # Google usually doesn't return a new refresh token.
+        self.refresh_token = token.get("refresh_token", self.refresh_token)
+        self.expires_at = time.time() + token["expires_in"]
+        save_credentials(
+            self.credentials_path,
+            {
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "access_token": self.access_token,
+                "refresh_token": self.refresh_token,
+                "expires_at": self.expires_at,
+            },
+        )
+
+
+def client_from_environment():
+    """Returns a client based on the `YOUTUBE_CREDENTIALS` or the
+    `YOUTUBE_ACCESS_TOKEN` environment variable.
+
+    If neither of them is set, `None` is returned.
+    """
+    credentials_path = os.environ.get("YOUTUBE_CREDENTIALS")
+    if credentials_path:
+        return RefreshingClient(credentials_path)
+
+    token = os.environ.get("YOUTUBE_ACCESS_TOKEN")
+    if token:
+        return Client(access_token=token)
+
+    return None
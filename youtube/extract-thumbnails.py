@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: MIT
+
+# Extracts a thumbnail for every video of a newline delimited JSON file.
+#
+# When no thumbnail is uploaded, YouTube picks an arbitrary frame, which often
+# is a black frame or the slate that is shown while the room is switched. This
+# script extracts several candidate frames from every video with `ffmpeg`,
+# scores them by their sharpness and brightness and keeps the best one as
+# JPEG file. The candidates are taken from the middle part of the video, so
+# that the intro and outro slates are skipped.
+#
+# The input is the same as for `upload-video.py`, only the `video_file` key is
+# needed. The output is the input with an additional `thumbnail` key that
+# contains the path to the extracted thumbnail. If that file is used as input
+# for `upload-video.py`, it sets the thumbnail right after the upload:
+#
+#     ./extract-thumbnails.py --output-dir thumbnails metadata.ndjson > metadata-thumbnails.ndjson
+#
+# The thumbnail keeps the last two directories of the video, e.g. the room and
+# the day, as the file names are only unique within them. Videos whose
+# thumbnail is newer than the video are skipped.
+#
+# The videos are processed in parallel, `ffmpeg`, `ffprobe` and [NumPy] need
+# to be installed.
+#
+# [NumPy]: https://numpy.org/
+
+import argparse, json, multiprocessing, os, sys
+
+sys.path.insert(1, os.path.join(sys.path[0], "..", "common"))
+import media
+
+# NumPy is only imported by the functions that need it, so that e.g. `--help`
+# starts fast.
+
+# Number of candidate frames per video.
+DEFAULT_CANDIDATES = 12
+# The candidates are spread over this part of the video.
+CANDIDATES_START = 0.1
+CANDIDATES_END = 0.9
+# Size of the frames the score is calculated on.
+SCORE_WIDTH = 160
+SCORE_HEIGHT = 90
+# Frames with a mean brightness outside of this range are black or white
+# frames (e.g. fades or an empty slide), they are never picked.
+MIN_BRIGHTNESS = 0.1
+MAX_BRIGHTNESS = 0.9
+# YouTube recommends 1280x720 and allows at most 2MB.
+THUMBNAIL_WIDTH = 1280
+
+
+def video_duration(video_file):
+    """Returns the duration of the video in seconds."""
+    return float(media.probe(video_file)["format"]["duration"])
+
+
+def extract_gray_frame(video_file, timestamp, threads):
+    """Returns the frame at the given timestamp, downscaled and as grayscale
+    values between 0 and 1."""
+    import numpy as np
+
+    raw, _stderr = media.ffmpeg(
+        # Seeking before the input is fast as it jumps to the closest
+        # keyframe.
+        "-ss",
+        str(timestamp),
+        "-i",
+        video_file,
+        "-frames:v",
+        "1",
+        "-vf",
+        f"scale={SCORE_WIDTH}:{SCORE_HEIGHT},format=gray",
+        "-threads",
+        str(threads),
+        "-f",
+        "rawvideo",
+        "-",
+        capture=True,
+    )
+    frame = np.frombuffer(raw, dtype=np.uint8)
+    if frame.size != SCORE_WIDTH * SCORE_HEIGHT:
+        return None
+    return frame.reshape(SCORE_HEIGHT, SCORE_WIDTH) / 255
+
+
+def score_frames(frames):
+    """Returns a score for each of the frames, the higher the better.
+
+    `frames` is an array of the shape `(number of frames, height, width)`. The
+    score is the variance of the Laplacian (a measure for the sharpness),
+    weighted by how close the mean brightness is to a medium gray.
+    """
+    import numpy as np
+
+    laplacian = (
+        frames[:, :-2, 1:-1]
+        + frames[:, 2:, 1:-1]
+        + frames[:, 1:-1, :-2]
+        + frames[:, 1:-1, 2:]
+        - 4 * frames[:, 1:-1, 1:-1]
+    )
+    sharpness = laplacian.var(axis=(1, 2))
+    brightness = frames.mean(axis=(1, 2))
+    exposure = 1 - 2 * np.abs(brightness - 0.5)
+    too_dark_or_bright = (brightness < MIN_BRIGHTNESS) | (brightness > MAX_BRIGHTNESS)
+    return np.where(too_dark_or_bright, 0, sharpness * exposure)
+
+
+def best_timestamp(video_file, candidates, threads):
+    """Returns the timestamp of the best frame of the video."""
+    import numpy as np
+
+    duration = video_duration(video_file)
+    timestamps = np.linspace(
+        duration * CANDIDATES_START, duration * CANDIDATES_END, candidates
+    )
+    frames = []
+    for timestamp in timestamps:
+        frame = extract_gray_frame(video_file, timestamp, threads)
+        if frame is not None:
+            frames.append((timestamp, frame))
+    if not frames:
+        return None
+    scores = score_frames(np.stack([frame for _timestamp, frame in frames]))
+    return frames[int(np.argmax(scores))][0]
+
+
+def write_thumbnail(video_file, timestamp, thumbnail_path, threads):
+    with media.atomic_output(thumbnail_path) as partial:
+        media.ffmpeg(
+            "-y",
+            "-ss",
+            str(timestamp),
+            "-i",
+            video_file,
+            "-frames:v",
+            "1",
+            "-vf",
+            f"scale={THUMBNAIL_WIDTH}:-2",
+            "-q:v",
+            "3",
+            "-threads",
+            str(threads),
+            partial,
+        )
+
+
+def process_video(job):
+    """Extracts the thumbnail of a single video and returns the input item
+    with the additional `thumbnail` key (or unchanged if it failed)."""
+    item, thumbnail_path, candidates, threads = job
+    video_file = item["video_file"]
+    if media.is_up_to_date(thumbnail_path, video_file):
+        return {**item, "thumbnail": thumbnail_path}
+
+    try:
+        timestamp = best_timestamp(video_file, candidates, threads)
+        if timestamp is None:
+            print(f"Warning: no frames found in `{video_file}`.", file=sys.stderr)
+            return item
+        write_thumbnail(video_file, timestamp, thumbnail_path, threads)
+    except (media.MediaError, OSError, ValueError, KeyError) as error:
+        print(
+            f"Warning: cannot extract thumbnail from `{video_file}`: {error}",
+            file=sys.stderr,
+        )
+        return item
+
+    return {**item, "thumbnail": thumbnail_path}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Extract a thumbnail for every video of a metadata file."
+    )
+    parser.add_argument(
+        "metadata", help="newline delimited JSON file with a `video_file` key"
+    )
+    parser.add_argument(
+        "--output-dir",
+        default="thumbnails",
+        help="directory to store the thumbnails in (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=DEFAULT_CANDIDATES,
+        help="number of candidate frames per video (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=media.cpu_count(),
+        help="number of videos to process in parallel (default: number of CPUs)",
+    )
+    args = parser.parse_args(argv)
+
+    with open(args.metadata) as metadata_file:
+        items = [json.loads(line) for line in metadata_file if line.strip()]
+
+    thumbnail_paths = [
+        media.output_path(args.output_dir, item["video_file"], ".jpg")
+        for item in items
+    ]
+    duplicates = media.duplicate_outputs(
+        zip((item["video_file"] for item in items), thumbnail_paths)
+    )
+    for thumbnail_path, video_files in duplicates.items():
+        print(
+            f"Error: {', '.join(f'`{video_file}`' for video_file in video_files)} "
+            f"would all be written to `{thumbnail_path}`.",
+            file=sys.stderr,
+        )
+    if duplicates:
+        return 1
+
+    # Most of the time is spent in `ffmpeg`, a process per video keeps all
+    # CPUs busy. The CPUs are shared between the parallel `ffmpeg` processes.
+    threads = media.threads_per_job(args.jobs)
+    jobs = [
+        (item, thumbnail_path, args.candidates, threads)
+        for item, thumbnail_path in zip(items, thumbnail_paths)
+    ]
+    with multiprocessing.Pool(args.jobs) as pool:
+        for item in pool.imap(process_video, jobs):
+            print(json.dumps(item), flush=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
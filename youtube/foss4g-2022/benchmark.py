@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: MIT
+
+# Benchmark and regression check for `schedule-to-metadata.py`.
+#
+# It runs the script on the checked-in FOSS4G 2022 schedules and video files
+# list and checks that the output is byte for byte the same as
+# `metadata.ndjson`. For the larger runs the input is scaled synthetically:
+# the conference days and the video files are copied, with the year changed,
+# so that every copy must produce the same metadata as the original (apart
+# from the year).
+#
+# For every scale it measures the time of indexing the video files list
+# (`scan_video_files()` and `process_file_list()`), of rendering the Markdown
+# of all abstracts and of the full `main()` run. The results are printed as
+# JSON, one object per line:
+#
+#     ./benchmark.py --scale 1 --scale 10 --scale 100
+#
+# With `--events` every copy is a separate event with its own settings and
+# schedules instead of additional days of a single event, so that all of
+# them are compiled in a single run with several `--event` options.
+#
+# The exit code is 1 if any output differs from `metadata.ndjson`.
+
+import argparse, copy, importlib.util, io, json, os, sys, tempfile, time
+from contextlib import redirect_stderr, redirect_stdout
+
+FIXTURES_DIR = sys.path[0]
+EVENT = 'foss4g-2022.json'
+SCHEDULES = ['schedule.json', 'schedule_academic.json']
+VIDEO_FILES_LIST = 'foss4gvideos.list'
+EXPECTED = 'metadata.ndjson'
+# The days that `schedule-to-metadata.py` processes by default.
+DAYS = [2, 3, 4]
+YEAR = '2022'
+# The year of the first copy, it must not appear anywhere in the metadata.
+FIRST_COPY_YEAR = 3000
+
+
+def load_script():
+    '''Imports `schedule-to-metadata.py`, which isn't a valid module name.'''
+    path = os.path.join(FIXTURES_DIR, 'schedule-to-metadata.py')
+    spec = importlib.util.spec_from_file_location('schedule_to_metadata', path)
+    module = importlib.util.module_from_spec(spec)
+    # Register it, so that the worker processes can unpickle its functions.
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def copy_year(copy_index):
+    return YEAR if copy_index == 0 else str(FIRST_COPY_YEAR + copy_index)
+
+
+def shift_path(video_file, year):
+    return video_file.replace(f'/{YEAR}-', f'/{year}-', 1)
+
+
+def scale_schedule(schedule_json, copy_indexes):
+    '''Returns a schedule with a copy of all days for every copy index, with
+    the year of the dates changed, together with the indexes of the days that
+    should be processed.'''
+    scaled = copy.deepcopy(schedule_json)
+    days = scaled['schedule']['conference']['days']
+    original = list(days)
+    days.clear()
+    indexes = []
+    for position, copy_index in enumerate(copy_indexes):
+        year = copy_year(copy_index)
+        for day in original:
+            day_copy = copy.deepcopy(day)
+            day_copy['date'] = day['date'].replace(YEAR, year, 1)
+            days.append(day_copy)
+        indexes.extend(len(original) * position + index for index in DAYS)
+    return scaled, indexes
+
+
+def write_event(event, copy_indexes, workdir, name):
+    '''Writes the settings and the schedules of an event that consists of the
+    given copies and returns the path of the settings.'''
+    schedule_paths = []
+    for schedule in SCHEDULES:
+        with open(os.path.join(FIXTURES_DIR, schedule)) as schedule_file:
+            scaled, days = scale_schedule(json.load(schedule_file), copy_indexes)
+        schedule_path = os.path.join(workdir, f'{name}-{schedule}')
+        with open(schedule_path, 'w') as schedule_file:
+            json.dump(scaled, schedule_file)
+        schedule_paths.append(schedule_path)
+    # The copies of the ignored files need to be ignored as well.
+    ignored_files = [ignored for ignored in event['ignore_files']
+                     if f'/{YEAR}-' in ignored]
+    event_path = os.path.join(workdir, f'{name}.json')
+    with open(event_path, 'w') as event_file:
+        json.dump({
+            **event,
+            'schedules': schedule_paths,
+            'days': days,
+            'ignore_files': [shift_path(ignored, copy_year(copy_index))
+                             for copy_index in copy_indexes
+                             for ignored in ignored_files],
+        }, event_file)
+    return event_path
+
+
+def scale_video_files(lines, scale):
+    return [shift_path(line, copy_year(copy_index))
+            for copy_index in range(scale)
+            for line in lines]
+
+
+def restore_copies(output, scale):
+    '''Returns the output with every copy turned back into the original, one
+    copy after another, so that every copy can be compared to
+    `metadata.ndjson`. The talks of the copies are interleaved, hence they are
+    separated by their date first.'''
+    lines = output.splitlines(keepends=True)
+    restored = []
+    for copy_index in range(scale):
+        year = copy_year(copy_index)
+        for line in lines:
+            if json.loads(line)['date'].startswith(f'{year}-'):
+                restored.append(line.replace(f'{year}-', f'{YEAR}-'))
+    return ''.join(restored)
+
+
+def best_of(repeat, func):
+    '''Returns the fastest of several runs in seconds and the last result.'''
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        durations.append(time.perf_counter() - started)
+    return min(durations), result
+
+
+def run(script, scale, jobs, repeat, workdir, as_events):
+    with open(os.path.join(FIXTURES_DIR, EVENT)) as event_file:
+        event = json.load(event_file)
+    if as_events:
+        event_paths = [write_event(event, [copy_index], workdir, f'{scale}-{copy_index}')
+                       for copy_index in range(scale)]
+    else:
+        event_paths = [write_event(event, range(scale), workdir, str(scale))]
+    events = [script.load_event(event_path) for event_path in event_paths]
+    schedule_paths = [schedule for event in events for schedule in event.schedules]
+
+    with open(os.path.join(FIXTURES_DIR, VIDEO_FILES_LIST)) as list_file:
+        video_files = list_file.read().splitlines()
+    video_files_path = os.path.join(workdir, f'{scale}-{VIDEO_FILES_LIST}')
+    with open(video_files_path, 'w') as list_file:
+        list_file.write('\n'.join(scale_video_files(video_files, scale)) + '\n')
+
+    abstracts = []
+    for schedule_path in schedule_paths:
+        with open(schedule_path) as schedule_file:
+            for day in json.load(schedule_file)['schedule']['conference']['days']:
+                for talks in day['rooms'].values():
+                    abstracts.extend(talk['abstract'] or '' for talk in talks)
+
+    def render_all():
+        for abstract in abstracts:
+            script.render_markdown(abstract)
+
+    def run_main():
+        stdout = io.StringIO()
+        argv = [video_files_path, '--jobs', str(jobs)]
+        for event_path in event_paths:
+            argv.extend(['--event', event_path])
+        # The warnings about unmatched files are the same on every run.
+        with redirect_stdout(stdout), redirect_stderr(io.StringIO()):
+            script.main(argv)
+        return stdout.getvalue()
+
+    def index_files():
+        scanned = script.scan_video_files(video_files_path)
+        for event in events:
+            script.process_file_list(event, scanned)
+
+    with redirect_stderr(io.StringIO()):
+        file_list_seconds, _ = best_of(repeat, index_files)
+    markdown_seconds, _ = best_of(repeat, render_all)
+    main_seconds, output = best_of(repeat, run_main)
+
+    with open(os.path.join(FIXTURES_DIR, EXPECTED)) as expected_file:
+        matches = restore_copies(output, scale) == expected_file.read() * scale
+    return {
+        'scale': scale,
+        'events': len(events),
+        'talks': len(output.splitlines()),
+        'video_files': len(video_files) * scale,
+        'process_file_list': round(file_list_seconds, 4),
+        'render_markdown': round(markdown_seconds, 4),
+        'main': round(main_seconds, 4),
+        'matches': matches,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark schedule-to-metadata.py and check its output against metadata.ndjson.')
+    parser.add_argument('--scale', type=int, action='append',
+                        help='how many copies of the input to process, can be given several times (default: 1, 10 and 100)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                        help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('--events', action='store_true',
+                        help='process every copy as a separate event instead of as additional days')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of runs, the fastest one is reported (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    script = load_script()
+    failed = False
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in args.scale or [1, 10, 100]:
+            result = run(script, scale, args.jobs, args.repeat, workdir, args.events)
+            print(json.dumps(result), flush=True)
+            if not result['matches']:
+                print(f'Error: the output of scale {scale} differs from {EXPECTED}.', file=sys.stderr)
+                failed = True
+    if failed:
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,41 +3,65 @@
 # SPDX-License-Identifier: MIT
 # SPDX-FileCopyrightText: Volker Mische <volker.mische@gmail.com>
 
-import json, os, sys, unicodedata
-from collections import defaultdict
+# Generates the YouTube metadata of the recorded talks of one or several
+# events out of the pretalx schedules and the video files. The settings of an
+# event are in a JSON file like `foss4g-2022.json`, see `Event`.
+
+import argparse, json, multiprocessing, os, re, sys, unicodedata
+from collections import defaultdict, namedtuple
 from pathlib import PurePath
 from urllib import parse
 import textwrap
 
-import mistune
 # Make sure the `mdtoyt` can be found in the parent directory.
 sys.path.insert(1, os.path.join(sys.path[0], '..'))
-from mdtoyt import YouTubeRenderer
-
-TITLE_PREFIX = 'FOSS4G 2022'
-CONF_HASHTAG = '#foss4g2022'
-# The keys match the conference acronym of the schedule.
-TYPE_HASHTAG = {
-    'foss4g-2022': '#generaltrack',
-    'foss4g-2022-academic-track': '#academictrack',
-}
-# List of that talks that were not recorded or presented.
-TALKS_MISSING = ['GURC7K', 'BWTAEY', '79KBL9', 'GYAWLJ', 'WFLJKB', 'JAERFJ']
-# List of files that should be ignored.
-IGNORE_FILES = [
-    # File with better audio is available.
-    '/osgeo/foss4gvideos/2022-08-26/Room_6/14 Sini P\u00f6yt\u00e4niemi - VIDEO ORIGINALE HA BUCHI DI AUDIO.mp4',
-    '/osgeo/foss4gvideos/2022-08-26/Room_6/14 nota.txt',
-    '/osgeo/foss4gvideos/2022-08-26/Room_9/5 non presente.txt',
-    '/osgeo/foss4gvideos/2022-08-24/Room_Hall_3A/6 no speaker.txt',
-]
-# List of talks where the actual speaker isn't the one mentioned in pretalx
-ADDITIONAL_PERSONS = {
-    'SDG9K7': 'JulienOsman',
-    'JDGNJD': 'Anca Anghelea',
-    'XPCXBQ': 'Lorenzo Natali',
-    'XHUGFC': 'Antoine Drabble',
-}
+sys.path.insert(1, os.path.join(sys.path[0], '..', '..', 'common'))
+from schedule import read_schedule
+import profiling
+
+# The settings of an event, they are read from a JSON file per event, see
+# `load_event()` and `foss4g-2022.json`.
+Event = namedtuple('Event', [
+    'name',
+    # Prefix of the video titles.
+    'title_prefix',
+    # Hashtag of the whole event.
+    'hashtag',
+    # The `schedule.json` exports from pretalx.
+    'schedules',
+    # Indexes of the conference days that are processed.
+    'days',
+    # The directory the day directories of the video files are in, the files
+    # in other directories are not part of the event. It only needs to match
+    # the end of the directory, see `in_video_root()`. `None` for any
+    # directory.
+    'video_root',
+    # Hashtag and human readable name (e.g. used for playlists) keyed by the
+    # conference acronym of the schedule.
+    'types',
+    # Mapping between the room in the schedule and the directory of the
+    # video files.
+    'rooms',
+    # Rooms that weren't recorded.
+    'skip_rooms',
+    # Talks that were not recorded or presented.
+    'talks_missing',
+    # Talks that don't have persons, but are still talks (e.g. an annual
+    # general meeting).
+    'talks_without_persons',
+    # Video files that should be ignored, e.g. because a file with better
+    # audio is available. They are keyed by their day, room and file name, so
+    # that they are also ignored if the files were moved.
+    'ignore_files',
+    # Talks where the actual speaker isn't the one mentioned in pretalx.
+    'additional_persons',
+])
+
+# The event that is processed if no other is given.
+DEFAULT_EVENT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'foss4g-2022.json')
+
+# The fields of the talks in the schedule that are used.
+TALK_FIELDS = ['url', 'title', 'abstract', 'persons', 'track', 'duration']
 
 YOUTUBE_MAX_TITLE_LENGTH = 100
 YOUTUBE_MAX_DESCRIPTION_LENGTH = 5000
@@ -71,157 +95,505 @@ def replace_illegal_characters(data):
     return data.replace('<', '＜').replace('>', '＞')
 
 
-# Mapping between the room in the schedule.json and the uploaded files.
-ROOM_MAPPING = {
-    'Auditorium': 'Auditorium',
-    'Room 4': 'Room_4',
-    'Modulo 0': 'Room_6',
-    'Room 9' : 'Room_9',
-    'Room Hall 3A': 'Room_Hall_3A',
-    'Room Limonaia': 'Room_Limonaia',
-    'Room Modulo 3': 'Room_Modulo_3A',
-    'Room Onice': 'Room_Onice',
-    'Room Verde': 'Room_Verde',
-}
-
-def process_file_list(video_files_list):
-    '''Convert a list of files into a nested dictionary.'''
-    result = defaultdict(lambda: defaultdict(list))
-    with open(video_files_list) as video_files:
-        for video_file in video_files:
-            # Extract the day and the room from the file path.
-            day, room = PurePath(video_file).parts[-3:-1]
-            result[day][room].append(video_file.strip())
+def load_event(path):
+    '''Reads the settings of an event from a JSON file. The event is named
+    after the file, the schedules are relative to it.'''
+    with open(path) as event_file:
+        settings = json.load(event_file)
+    base_dir = os.path.dirname(path)
+    days = settings.get('days', '2-4')
+    video_root = settings.get('video_root')
+    return Event(
+        name=PurePath(path).stem,
+        title_prefix=settings['title_prefix'],
+        hashtag=settings['hashtag'],
+        schedules=[os.path.join(base_dir, schedule)
+                   for schedule in settings['schedules']],
+        days=parse_days(days) if isinstance(days, str) else days,
+        video_root=video_root and str(PurePath(video_root)),
+        types=settings['types'],
+        rooms=settings['rooms'],
+        skip_rooms=set(settings.get('skip_rooms', [])),
+        talks_missing=set(settings.get('talks_missing', [])),
+        talks_without_persons=set(settings.get('talks_without_persons', [])),
+        ignore_files={PurePath(ignored).parts[-3:]
+                      for ignored in settings.get('ignore_files', [])},
+        additional_persons=settings.get('additional_persons', {}),
+    )
+
+
+# A video file, split into the directory of the day directories, the day, the
+# room, the file name and the slot number, see `scan_video_files()`.
+VideoFile = namedtuple('VideoFile', ['path', 'root', 'day', 'room', 'name', 'slot'])
+
+def video_root(video_file):
+    '''Returns the directory the day directory of a video file is in.'''
+    parts = PurePath(video_file).parts
+    return str(PurePath(*parts[:-3])) if len(parts) > 3 else ''
+
+def in_video_root(root, event_root):
+    '''Returns whether the directory of the day directories of a video file
+    is the `video_root` of an event. Only the end of the directory needs to
+    match, also if the `video_root` is absolute. This way the files can be
+    moved, e.g. `/osgeo/foss4gvideos` matches the files in
+    `/mnt/local/osgeo/foss4gvideos`.'''
+    root_parts = PurePath(root).parts
+    event_parts = PurePath(event_root).relative_to(PurePath(event_root).anchor).parts
+    return root_parts[len(root_parts) - len(event_parts):] == event_parts
+
+# The video files of an event indexed by day, room and slot number, see
+# `process_file_list()`.
+VideoFiles = namedtuple('VideoFiles', ['files', 'slots'])
+
+def parse_slot(video_file):
+    '''Returns the slot number the file name of a video starts with, e.g. `14`
+    for `14 Sini Pöytäniemi.mp4` or `14bis Sini Pöytäniemi.mp4`. Returns `None`
+    if there is no number.'''
+    match = re.match(r'\s*(\d+)', PurePath(video_file).name)
+    if match is None:
+        return None
+    return int(match[1])
+
+def scan_video_files(source):
+    '''Returns the video files of a list with one path per line, or of a
+    directory tree, which is `<root>/<day>/<room>/<file>`.
+
+    The files are only scanned once and shared by all events, every event
+    then indexes the files that belong to it with `process_file_list()`.'''
+    if os.path.isdir(source):
+        paths = sorted(os.path.join(dir_path, name)
+                       for dir_path, _dir_names, names in os.walk(source)
+                       for name in names)
+        # The root is absolute, so that it can be matched with the
+        # `video_root` of an event, even if the directory is e.g. `.`.
+        absolute_source = os.path.abspath(source)
+    else:
+        with open(source) as video_files:
+            paths = [line.strip() for line in video_files]
+        absolute_source = None
+    result = []
+    for path in paths:
+        parts = PurePath(path).parts
+        if len(parts) < 3:
+            continue
+        if absolute_source is None:
+            root = video_root(path)
+        else:
+            root = video_root(os.path.join(absolute_source, os.path.relpath(path, source)))
+        result.append(VideoFile(path, root, parts[-3], parts[-2], parts[-1],
+                                parse_slot(path)))
     return result
 
-def process_day(day, conf_prefix, videos):
+def process_file_list(event, video_files):
+    '''Index the video files of an event by day, room and slot number.
+
+    It returns the video files keyed by a `(day, room, slot)` tuple and the
+    sorted slot numbers of every room keyed by a `(day, room)` tuple. Ignored
+    files and files of other events are not part of the index.'''
+    files = {}
+    # Whether a root is the one of the event, there are only a few roots.
+    in_root = {}
+    for video_file in video_files:
+        if event.video_root is not None:
+            if video_file.root not in in_root:
+                in_root[video_file.root] = in_video_root(video_file.root, event.video_root)
+            if not in_root[video_file.root]:
+                continue
+        if (video_file.day, video_file.room, video_file.name) in event.ignore_files:
+            continue
+        day, room, slot = video_file.day, video_file.room, video_file.slot
+        if slot is None:
+            print(f'Warning: ignoring video file without slot number: {video_file.path}', file=sys.stderr)
+            continue
+        if (day, room, slot) in files:
+            print(f'Warning: ignoring video file as slot {slot} is already taken by `{files[(day, room, slot)]}`: {video_file.path}', file=sys.stderr)
+            continue
+        files[(day, room, slot)] = video_file.path
+
+    if video_files and in_root and not any(in_root.values()):
+        print(f'Warning: none of the video files is in the `video_root` `{event.video_root}` of the event `{event.name}`, the directories of the days are in {", ".join(f"`{root}`" for root in sorted(in_root))}.', file=sys.stderr)
+
+    slots = defaultdict(list)
+    for day, room, slot in sorted(files):
+        slots[(day, room)].append(slot)
+    return VideoFiles(files, slots)
+
+def is_talk(event, talk):
+    '''There are things scheduled (like a group photo) which isn't a talk.
+    Those don't have persons associated with it.'''
+    talk_id = talk['url'].split('/')[5]
+    # Make an exception for e.g. the OSGeo AGM.
+    return bool(talk['persons']) or talk_id in event.talks_without_persons
+
+def process_day(event, day, conf_prefix, videos):
+    '''Returns the talks of a day that were recorded, together with their
+    video file.
+
+    The n-th recorded talk of a room is the video file with the n-th lowest
+    slot number. If there is no such file, the video file is `None` and an
+    error is printed. The items are the input for `process_talk()`.'''
     date = day['date']
     for room in day['rooms']:
-        if room in ['General online', 'Academic online']:
+        if room in event.skip_rooms:
             continue
 
-        room_name = ROOM_MAPPING[room]
+        room_name = event.rooms[room]
+        room_slots = videos.slots.get((date, room_name), [])
 
-        # An offset for the case that a talk wasn't recorded or the file is not
-        # found.
-        talk_offset = 0
-        for talk_counter, talk in enumerate(day['rooms'][room]):
+        # The number of talks that were recorded so far.
+        recorded = 0
+        for talk in day['rooms'][room]:
             talk_id = talk['url'].split('/')[5]
-            slug = talk['slug'].removeprefix(f'{conf_prefix}-')
 
-            # There are thing scheduled (like a group photo) which isn't a
-            # talk. Those don't have a persons associated with it.
-            # Make an exception for the OSGeo AGM (XMJZGY).
-            if not talk['persons'] and not talk_id == 'XMJZGY':
-                talk_offset += 1
+            if not is_talk(event, talk):
                 continue
 
-
-            if talk_id in TALKS_MISSING:
-                talk_offset += 1
+            if talk_id in event.talks_missing:
                 continue
 
-            try:
-                while True:
-                    video_file = videos[date][room_name][talk_counter - talk_offset]
-                    if video_file in IGNORE_FILES:
-                        talk_offset -= 1
-                    else:
-                        break
-            except:
-                video_file = 'ERROR: no video file found'
-
-            title = replace_illegal_characters(f'{TITLE_PREFIX} | {talk["title"]}')
-            # If the title is longer than the maximum size, preserve the
-            # original title, so that it can be put into the description. That
-            # should enable folks to find the viceo if they search for the full
-            # title.
-            if len(title) > YOUTUBE_MAX_TITLE_LENGTH:
-                title = textwrap.shorten(title, width=YOUTUBE_MAX_TITLE_LENGTH, placeholder='…')
-                maybe_full_title = talk["title"]
+            if recorded < len(room_slots):
+                video_file = videos.files[(date, room_name, room_slots[recorded])]
             else:
-                maybe_full_title = None
-
-            persons_list = unique([person['public_name'] for person in talk['persons']])
-            if talk_id in ADDITIONAL_PERSONS:
-                persons_list.insert(0, ADDITIONAL_PERSONS[talk_id])
-            persons = '\n'.join(persons_list)
-
-            markdown_renderer = mistune.create_markdown(renderer=YouTubeRenderer())
-            abstract = markdown_renderer(talk['abstract']).strip()
-
-            pretalx_link = ensure_https(talk['url'])
-
-            hashtags_list = [CONF_HASHTAG, TYPE_HASHTAG[conf_prefix], to_hashtag(talk['track'])]
-            hashtags = '\n'.join(hashtags_list)
-
-            description_list = [
-                maybe_full_title,
-                abstract,
-                persons,
-                pretalx_link,
-                hashtags
-            ]
-            # The full title may not be set, hence filter it out.
-            description = '\n\n'.join(filter(None, description_list))
-            description = replace_illegal_characters(description)
-            # If the description is too long, then shorten the abstract, but
-            # keep the rest the same.
-            if len(description) > YOUTUBE_MAX_DESCRIPTION_LENGTH:
-                max_abstract_len = YOUTUBE_MAX_DESCRIPTION_LENGTH - (len(description) - len(abstract))
-                abstract = textwrap.shorten(description, width=max_abstract_len, placeholder='…')
-                description_list = [
-                    maybe_full_title,
-                    abstract,
-                    persons,
-                    pretalx_link,
-                    hashtags
-                ]
-                # The full title may not be set, hence filter it out.
-                description = '\n\n'.join(filter(None, description_list))
-
-            metadata = {
-                'video_file': video_file,
-                'date': date,
-                'persons': ', '.join(persons_list),
-                'pretalx_id': talk_id,
-                'title': title,
-                'description': description,
-            }
-
-            print(json.dumps(metadata))
+                print(f'Error: no video file for talk {talk_id} on {date} in {room_name}, it is recorded talk number {recorded + 1}, but there are only {len(room_slots)} video files.', file=sys.stderr)
+                video_file = None
+            recorded += 1
+
+            yield event, talk, date, conf_prefix, video_file
+
+
+# The Markdown renderer is created only once per (worker) process.
+markdown_renderer = None
+
+def render_markdown(text):
+    global markdown_renderer
+    if markdown_renderer is None:
+        # Only imported when needed, so that e.g. `--help` starts fast.
+        import mistune
+        from mdtoyt import YouTubeRenderer
+        markdown_renderer = mistune.create_markdown(renderer=YouTubeRenderer())
+    return markdown_renderer(text)
+
+def process_talk(job):
+    '''Returns the metadata of a single talk as JSON.
+
+    The input is one of the items `process_day()` returns. The result doesn't
+    depend on any other talk, so that it can be run in a process pool.'''
+    event, talk, date, conf_prefix, video_file = job
+    talk_id = talk['url'].split('/')[5]
+
+    title = replace_illegal_characters(f'{event.title_prefix} | {talk["title"]}')
+    # If the title is longer than the maximum size, preserve the
+    # original title, so that it can be put into the description. That
+    # should enable folks to find the viceo if they search for the full
+    # title.
+    if len(title) > YOUTUBE_MAX_TITLE_LENGTH:
+        title = textwrap.shorten(title, width=YOUTUBE_MAX_TITLE_LENGTH, placeholder='…')
+        maybe_full_title = talk["title"]
+    else:
+        maybe_full_title = None
+
+    persons_list = unique([person['public_name'] for person in talk['persons']])
+    if talk_id in event.additional_persons:
+        persons_list.insert(0, event.additional_persons[talk_id])
+    persons = '\n'.join(persons_list)
+
+    abstract = render_markdown(talk['abstract']).strip()
+
+    pretalx_link = ensure_https(talk['url'])
+
+    hashtags_list = [event.hashtag, event.types[conf_prefix]['hashtag'], to_hashtag(talk['track'])]
+    hashtags = '\n'.join(hashtags_list)
+
+    description_list = [
+        maybe_full_title,
+        abstract,
+        persons,
+        pretalx_link,
+        hashtags
+    ]
+    # The full title may not be set, hence filter it out.
+    description = '\n\n'.join(filter(None, description_list))
+    description = replace_illegal_characters(description)
+    # If the description is too long, then shorten the abstract, but
+    # keep the rest the same.
+    if len(description) > YOUTUBE_MAX_DESCRIPTION_LENGTH:
+        max_abstract_len = YOUTUBE_MAX_DESCRIPTION_LENGTH - (len(description) - len(abstract))
+        abstract = textwrap.shorten(description, width=max_abstract_len, placeholder='…')
+        description_list = [
+            maybe_full_title,
+            abstract,
+            persons,
+            pretalx_link,
+            hashtags
+        ]
+        # The full title may not be set, hence filter it out.
+        description = '\n\n'.join(filter(None, description_list))
+
+    metadata = {
+        'video_file': video_file,
+        'date': date,
+        'persons': ', '.join(persons_list),
+        'pretalx_id': talk_id,
+        'track': talk['track'],
+        'conference_type': event.types[conf_prefix]['name'],
+        'title': title,
+        'description': description,
+    }
+
+    return json.dumps(metadata)
+
+
+# The weights of the cost function of the alignment mode, see `align_room()`.
+# Not matching a talk or a video file at all costs about as much as matching it
+# with one that is 2.5x longer/shorter than scheduled.
+ALIGN_UNMATCHED_COST = 0.9
+ALIGN_POSITION_WEIGHT = 0.1
+ALIGN_DURATION_WEIGHT = 1.0
+ALIGN_NAME_WEIGHT = 1.0
+# How much worse the next best alignment needs to be, so that a match has a
+# confidence of 63%.
+ALIGN_CONFIDENCE_SCALE = 0.2
+
+def parse_minutes(duration):
+    '''Returns the minutes of a pretalx `HH:MM` time or duration.'''
+    hours, minutes = duration.split(':')
+    return int(hours) * 60 + int(minutes)
+
+def name_tokens(name):
+    '''Returns the lowercase words of a name, without accents.'''
+    return {token for token in re.split(r'[\W\d_]+', strip_accents(name).lower())
+            if len(token) > 2}
+
+def read_durations(durations_list):
+    '''Reads a list of `<seconds> <path>` lines (the output of `ffprobe`).
+
+    It returns the video files together with their duration keyed by a
+    `(day, room)` tuple. The files are sorted by their slot number.'''
+    result = defaultdict(list)
+    with open(durations_list) as durations:
+        for line in durations:
+            seconds, video_file = line.strip().split(' ', 1)
+            day, room = PurePath(video_file).parts[-3:-1]
+            result[(day, room)].append((video_file, float(seconds)))
+    def slot_order(entry):
+        # Files without a slot number go to the end.
+        slot = parse_slot(entry[0])
+        return (sys.maxsize if slot is None else slot, entry[0])
+
+    for files in result.values():
+        files.sort(key=slot_order)
+    return result
 
+def align_room(talks, files):
+    '''Align the talks of a room with the video files of it.
+
+    The cost of matching a talk with a video file is made up of how far apart
+    they are in order (talks by start time, files by slot number), how much the
+    recorded duration differs from the scheduled one and how many of the names
+    of the speakers are not part of the file name. Talks and video files can
+    also stay unmatched.
+
+    It returns a list of `(talk, video_file, cost, confidence)` tuples, where
+    either the talk or the video file may be `None`. The confidence is based on
+    how much worse the best alignment without that match would be.'''
+    # NumPy is only needed for this mode.
+    import numpy as np
+    import assignment
+
+    num_talks, num_files = len(talks), len(files)
+
+    talk_seconds = np.array([parse_minutes(talk['duration']) * 60 for talk in talks])
+    file_seconds = np.array([max(seconds, 1) for _, seconds in files])
+    talk_names = [name_tokens(' '.join(person['public_name'] for person in talk['persons']))
+                  for talk in talks]
+    file_names = [name_tokens(PurePath(video_file).stem) for video_file, _ in files]
+    name_similarity = np.array([
+        [len(talk_name & file_name) / len(talk_name) if talk_name else 0
+         for file_name in file_names]
+        for talk_name in talk_names]).reshape(num_talks, num_files)
+
+    position_cost = np.abs(np.arange(num_talks)[:, np.newaxis] - np.arange(num_files))
+    duration_cost = np.abs(np.log(file_seconds / talk_seconds[:, np.newaxis]))
+    cost = (ALIGN_POSITION_WEIGHT * position_cost
+            + ALIGN_DURATION_WEIGHT * duration_cost
+            + ALIGN_NAME_WEIGHT * (1 - name_similarity))
+    # If the file names don't contain names at all, they don't matter.
+    if not name_similarity.any():
+        cost -= ALIGN_NAME_WEIGHT
+
+    # Every talk and every file gets a dummy partner, which is the option of
+    # not being matched at all.
+    size = num_talks + num_files
+    full_cost = np.full((size, size), ALIGN_UNMATCHED_COST)
+    full_cost[:num_talks, :num_files] = cost
+    full_cost[num_talks:, num_files:] = 0
+    assigned = assignment.linear_sum_assignment(full_cost)
+    rows = np.arange(size)
+    total = full_cost[rows, assigned].sum()
+
+    # A cost that is high enough, that it will never be chosen.
+    forbidden = full_cost.sum() + 1
+
+    def margin(forbid):
+        '''Returns how much more the best alignment costs, if the given cells
+        are forbidden.'''
+        constrained = full_cost.copy()
+        constrained[forbid] = forbidden
+        constrained_assigned = assignment.linear_sum_assignment(constrained)
+        return constrained[rows, constrained_assigned].sum() - total
+
+    result = []
+    matched_files = set()
+    for talk_index, talk in enumerate(talks):
+        file_index = assigned[talk_index]
+        if file_index < num_files:
+            matched_files.add(file_index)
+            video_file = files[file_index][0]
+            talk_cost = cost[talk_index, file_index]
+            talk_margin = margin((talk_index, file_index))
+        else:
+            video_file = None
+            talk_cost = ALIGN_UNMATCHED_COST
+            talk_margin = margin((talk_index, slice(num_files, None)))
+        result.append((talk, video_file, talk_cost, talk_margin))
+    for file_index, (video_file, _) in enumerate(files):
+        if file_index not in matched_files:
+            file_margin = margin((slice(num_talks, None), file_index))
+            result.append((None, video_file, ALIGN_UNMATCHED_COST, file_margin))
+
+    return [(talk, video_file, match_cost, 1 - np.exp(-match_margin / ALIGN_CONFIDENCE_SCALE))
+            for talk, video_file, match_cost, match_margin in result]
+
+def align(event_schedules, durations_list):
+    '''Prints the best matching of talks and video files as JSON, one object
+    per line.
+
+    It's an alternative to curating the `talks_missing` and `ignore_files` of
+    an event by hand. Matches with a low confidence should be checked
+    manually.'''
+    durations = read_durations(durations_list)
+    for event, schedules in event_schedules:
+        for conf_prefix, conference_days in schedules:
+            for day_index in event.days:
+                day = conference_days[day_index]
+                date = day['date']
+                for room, room_talks in day['rooms'].items():
+                    if room in event.skip_rooms:
+                        continue
+                    room_name = event.rooms[room]
+                    talks = [talk for talk in room_talks if is_talk(event, talk)]
+                    files = [entry for entry in durations.get((date, room_name), [])
+                             if event.video_root is None
+                             or in_video_root(video_root(entry[0]), event.video_root)]
+                    if not talks and not files:
+                        continue
+                    for talk, video_file, cost, confidence in align_room(talks, files):
+                        print(json.dumps({
+                            'date': date,
+                            'room': room_name,
+                            'pretalx_id': talk and talk['url'].split('/')[5],
+                            'video_file': video_file,
+                            'cost': round(float(cost), 3),
+                            'confidence': round(float(confidence), 3),
+                        }))
+
+
+def parse_days(spec):
+    '''Parses a list of day indexes like `2-4` or `0,2,5-6`.'''
+    days = []
+    for part in spec.split(','):
+        first, _, last = part.partition('-')
+        days.extend(range(int(first), int(last or first) + 1))
+    return days
 
 def main(argv=None):
-    if argv is None:
-        argv = sys.argv
-
-    if len(argv) != 4:
-        print("Usage: {} schedule.json schedule_academic.json video-files.list".format(argv[0]))
-        sys.exit(1)
-
-    schedule_filename = argv[1]
-    schedule_academic_filename = argv[2]
-    video_files_list = argv[3]
-
-    videos = process_file_list(video_files_list)
-
-    with open(schedule_filename, 'r') as schedule_file:
-        schedule_json = json.load(schedule_file)
-        conf_prefix = schedule_json['schedule']['conference']['acronym']
-        # First day of the talks is the third day of the conference
-        process_day(schedule_json['schedule']['conference']['days'][2], conf_prefix, videos)
-        process_day(schedule_json['schedule']['conference']['days'][3], conf_prefix, videos)
-        process_day(schedule_json['schedule']['conference']['days'][4], conf_prefix, videos)
-
-    with open(schedule_academic_filename, 'r') as schedule_academic_file:
-        schedule_academic_json = json.load(schedule_academic_file)
-        conf_prefix = schedule_academic_json['schedule']['conference']['acronym']
-        # First day of the talks is the third day of the conference
-        process_day(schedule_academic_json['schedule']['conference']['days'][2], conf_prefix, videos)
-        process_day(schedule_academic_json['schedule']['conference']['days'][3], conf_prefix, videos)
-        process_day(schedule_academic_json['schedule']['conference']['days'][4], conf_prefix, videos)
-        #print(conference_day1)
+    parser = argparse.ArgumentParser(
+        description='Generate the YouTube metadata of the recorded talks.')
+    parser.add_argument('schedules', nargs='*', metavar='schedule.json',
+                        help='schedule export from pretalx, instead of the ones of the event')
+    parser.add_argument('video_files_list', metavar='video-files.list',
+                        help='file with one path to a video file per line, or the directory with the video files')
+    parser.add_argument('--event', action='append', metavar='event.json',
+                        help='settings of an event, can be given several times to process several events at once (default: foss4g-2022.json)')
+    parser.add_argument('--days', type=parse_days,
+                        help='indexes of the conference days to process, e.g. `2-4` or `0,2,5-6` (default: the days of the event)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                        help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('--align', action='store_true',
+                        help='instead of the metadata, output the best matching of talks and video files based on their durations. Each line of the video files list is then `<seconds> <path>`.')
+    args = parser.parse_args(argv)
+    profiling.start('schedule-to-metadata')
+
+    events = [load_event(path) for path in args.event or [DEFAULT_EVENT]]
+    if args.schedules:
+        if len(events) > 1:
+            parser.error('schedules can only be given for a single event')
+        events[0] = events[0]._replace(schedules=args.schedules)
+    if args.days is not None:
+        events = [event._replace(days=args.days) for event in events]
+
+    event_schedules = []
+    for event in events:
+        schedules = []
+        for schedule_filename in event.schedules:
+            # Only the processed days and the fields of the talks that are
+            # used are read, the schedules contain all abstracts of all days.
+            with profiling.section('parse'):
+                schedule_json = read_schedule(schedule_filename, days=event.days,
+                                              fields=TALK_FIELDS)
+            conf_prefix = schedule_json['schedule']['conference']['acronym']
+            if conf_prefix not in event.types:
+                print(f'Error: the conference `{conf_prefix}` of {schedule_filename} is not one of the types of the event `{event.name}`.', file=sys.stderr)
+                return 3
+            days = schedule_json['schedule']['conference']['days']
+            schedules.append((conf_prefix, days))
+        event_schedules.append((event, schedules))
+
+    if args.align:
+        return align(event_schedules, args.video_files_list)
+
+    # The video files are scanned only once for all events.
+    with profiling.section('index'):
+        video_files = scan_video_files(args.video_files_list)
+
+    # Matching the talks to the video files depends on the order of the talks,
+    # hence it's done upfront. It's cheap anyway.
+    jobs = []
+    for event, schedules in event_schedules:
+        videos = process_file_list(event, video_files)
+        event_jobs = []
+        for conf_prefix, days in schedules:
+            for day_index in event.days:
+                event_jobs.extend(process_day(event, days[day_index], conf_prefix, videos))
+
+        # Only report the files of the days that were processed.
+        dates = {date for _, _, date, _, _ in event_jobs}
+        matched = {video_file for _, _, _, _, video_file in event_jobs}
+        unmatched = {video_file for (date, _, _), video_file in videos.files.items()
+                     if date in dates and video_file not in matched}
+        for video_file in sorted(unmatched):
+            print(f'Warning: video file was not matched to any talk: {video_file}', file=sys.stderr)
+        jobs.extend(event_jobs)
+    # Talks without a video file are reported by `process_day()` already.
+    missing = [job for job in jobs if job[4] is None]
+    jobs = [job for job in jobs if job[4] is not None]
+
+    # With a single job the talks are processed in this process, so that
+    # e.g. the rendering shows up when it's profiled.
+    if args.jobs == 1:
+        with profiling.section('render'):
+            for metadata in map(process_talk, jobs):
+                print(metadata)
+    else:
+        # The talks of all events share the worker processes. `imap()`
+        # returns the results in the order of the input, so that the output
+        # is the same, no matter how many processes are used.
+        with profiling.section('render'), multiprocessing.Pool(args.jobs) as pool:
+            for metadata in pool.imap(process_talk, jobs, chunksize=8):
+                print(metadata)
+
+    if missing:
+        return 2
 
 if __name__ == '__main__':
     sys.exit(main())
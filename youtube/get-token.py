@@ -27,7 +27,7 @@
 #  16. Also add to "Developer contact information" an email to "Email addresses".
 #  17. Click on "SAVE AND CONTINUE".
 #  18. Click on "ADD OR REMOVE SCOPES".
-#  19. Under "Manually add scoped" add `https://www.googleapis.com/auth/youtube.upload` there. And click on "ADD TO TABLE".
+#  19. Under "Manually add scoped" add `https://www.googleapis.com/auth/youtube.upload` and `https://www.googleapis.com/auth/youtube` (needed for managing playlists) there. And click on "ADD TO TABLE".
 #  20. Then click "UPDATE" at the bottom (I had to scroll down to see it).
 #  21. Click on "SAVE AND CONTINUE".
 #  22. Add the users you want to give access to, e.g. "volker.mische@gmail.com".
@@ -38,18 +38,29 @@
 #  27. For "Application type" choose "Desktop app" and select a name, e.g. "Upload script".
 #  28. Click on "CREATE".
 #  29. Click on "DOWNLOAD JSON" and save it. We'll use that file as input to the `get_token.py` script.
+#
+# Besides printing the access token, the credentials including the refresh
+# token are stored in a file (`youtube-credentials.json` by default). Point the
+# `YOUTUBE_CREDENTIALS` environment variable to that file, then the upload and
+# update scripts refresh the access token automatically before it expires.
 
-import os, sys
+import os, sys, time
 
 from pyyoutube import Client
 
+from credentials import save_credentials
+
+DEFAULT_CREDENTIALS_PATH = "youtube-credentials.json"
+
 SCOPE = [
     "https://www.googleapis.com/auth/youtube.upload",
+    # Needed by `assign-playlists.py`.
+    "https://www.googleapis.com/auth/youtube",
 ]
 
 
 def get_token(client_secret_path):
-    """Returns the token.
+    """Returns the client and the token.
 
     The parameter is the path to a client secret file that was downloaded
     """
@@ -70,17 +81,19 @@ def get_token(client_secret_path):
     response_uri_https = response_uri.replace("http://", "https://")
 
     token = cli.generate_access_token(
-        authorization_response=response_uri_https
-    ).access_token
-    return token
+        authorization_response=response_uri_https, return_json=True
+    )
+    return cli, token
 
 
 def main(argv=None):
     if argv is None:
         argv = sys.argv
 
-    if len(argv) != 2:
-        print(f"Usage: {argv[0]} <client-secret-path.json>")
+    if len(argv) not in (2, 3):
+        print(
+            f"Usage: {argv[0]} <client-secret-path.json> [<credentials-path.json>]"
+        )
         return 1
 
     # Without this hack, there is an error message:
@@ -91,10 +104,36 @@ def main(argv=None):
     os.environ["OAUTHLIB_RELAX_TOKEN_SCOPE"] = "1"
 
     client_secret_path = argv[1]
+    if len(argv) == 3:
+        credentials_path = argv[2]
+    else:
+        credentials_path = DEFAULT_CREDENTIALS_PATH
+
+    cli, token = get_token(client_secret_path)
+
+    if "refresh_token" not in token:
+        print(
+            "Warning: no refresh token was returned, the access token cannot be "
+            "refreshed automatically. Revoke the access of the app at "
+            "https://myaccount.google.com/permissions and try again."
+        )
+    save_credentials(
+        credentials_path,
+        {
+            "client_id": cli.client_id,
+            "client_secret": cli.client_secret,
+            "access_token": token["access_token"],
+            "refresh_token": token.get("refresh_token"),
+            "expires_at": token.get("expires_at", time.time() + token["expires_in"]),
+        },
+    )
 
-    token = get_token(client_secret_path)
-
-    print(f"Your token:\n{token}")
+    print(f"Your token:\n{token['access_token']}")
+    print(
+        f"The credentials were stored at `{credentials_path}`. In order to "
+        "refresh the token automatically, use:\n"
+        f"YOUTUBE_CREDENTIALS='{os.path.abspath(credentials_path)}'"
+    )
 
 
 if __name__ == "__main__":
@@ -14,6 +14,7 @@
 # This code is based on mistune, hence it's licensed under the BSD License.
 
 from html.parser import HTMLParser
+import os
 import re
 import sys
 from typing import Any, Dict, Iterable, cast
@@ -22,6 +23,10 @@ from textwrap import indent
 import mistune
 from mistune import BaseRenderer, BlockState
 
+# Make sure the `profiling` module can be found in the `common` directory.
+sys.path.insert(1, os.path.join(sys.path[0], "..", "common"))
+import profiling
+
 
 def strip_end(src: str) -> str:
     return re.compile(r"\n\s+$").sub("\n", src)
@@ -241,13 +246,16 @@ def main(argv=None):
         return 1
 
     input_filename = argv[1]
+    profiling.start("mdtoyt")
 
     format_markdown = mistune.create_markdown(renderer=YouTubeRenderer())
 
     with open(input_filename, "r") as input_file:
         text = input_file.read()
-        result = format_markdown(text)
-        print(result)
+        with profiling.section("render"):
+            result = format_markdown(text)
+        with profiling.section("write"):
+            print(result)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: MIT
+
+# Turns the uploaded recordings into files that are ready for the upload to
+# YouTube or for the video team.
+#
+# Speakers upload arbitrary `.mkv` and `.mp4` files. Many of them have the
+# index (the `moov` atom) at the end of the file, which slows down the
+# processing on YouTube, and the loudness varies a lot from talk to talk. This
+# script writes every video as MP4 with the index at the beginning. The video
+# stream is copied without re-encoding if MP4 supports its codec, only other
+# codecs are transcoded to H.264. The audio is normalized to the same loudness
+# (-16 LUFS by default) with the two-pass `loudnorm` filter of `ffmpeg`: the
+# first pass measures the loudness, the second one applies the correction
+# linearly. Audio that is already within 1 LU of the target and supported by
+# MP4 is copied as well.
+#
+# The input is the same as for `upload-video.py`, only the `video_file` key is
+# needed. The output is the input with `video_file` pointing to the new file,
+# so it can be used as input for `upload-video.py`:
+#
+#     ./normalize-videos.py --output-dir normalized metadata.ndjson > metadata-normalized.ndjson
+#
+# The output keeps the last two directories of the input, e.g. the room and
+# the day, as the file names are only unique within them. Inputs that would be
+# written to the same file (like `talk.mkv` and `talk.mp4` in one directory)
+# are an error. Files whose output is newer than the input and was normalized
+# to the same loudness are skipped, so the script can be run again after new
+# files were added. The loudness target of every output is stored next to it
+# in `<output>.loudness`. For a directory of downloaded files, e.g. from
+# `download_files.sh`, create the input with `jq`:
+#
+#     find downloads -name '*.mkv' -o -name '*.mp4' | jq --raw-input --compact-output '{video_file: .}' | ./normalize-videos.py --output-dir normalized -
+#
+# The videos are processed in parallel, `ffmpeg` and `ffprobe` need to be
+# installed.
+
+import argparse, json, math, multiprocessing, os, re, sys
+
+sys.path.insert(1, os.path.join(sys.path[0], "..", "common"))
+import media
+
+# The codecs that can be copied into an MP4 container as they are.
+MP4_VIDEO_CODECS = {"h264", "hevc", "av1", "vp9", "mpeg4"}
+MP4_AUDIO_CODECS = {"aac", "mp3"}
+# The loudness target in LUFS, the maximum true peak in dBTP and the loudness
+# range in LU.
+DEFAULT_LOUDNESS = -16
+TRUE_PEAK = -1.5
+LOUDNESS_RANGE = 11
+# Audio that is within this many LU of the target isn't changed.
+LOUDNESS_TOLERANCE = 1
+AUDIO_BITRATE = "192k"
+# `loudnorm` resamples to 192 kHz internally, resample back.
+AUDIO_SAMPLE_RATE = "48000"
+# Quality of the videos that need to be transcoded.
+VIDEO_CRF = "18"
+
+# The measurement of `loudnorm` is the last JSON object of the output.
+LOUDNORM_OUTPUT = re.compile(r"\{[^{}]*\}\s*$")
+
+
+def loudnorm_filter(loudness, measured=None):
+    """Returns the `loudnorm` filter for the first pass, or for the second
+    pass if the measurement of the first one is given."""
+    options = f"loudnorm=I={loudness}:TP={TRUE_PEAK}:LRA={LOUDNESS_RANGE}"
+    if measured is None:
+        return f"{options}:print_format=json"
+    return (
+        f"{options}:measured_I={measured['input_i']}"
+        f":measured_TP={measured['input_tp']}"
+        f":measured_LRA={measured['input_lra']}"
+        f":measured_thresh={measured['input_thresh']}"
+        f":offset={measured['target_offset']}:linear=true"
+    )
+
+
+def measure_loudness(video_file, loudness, threads):
+    """Runs the first `loudnorm` pass on the first audio stream and returns
+    the measured values."""
+    _stdout, stderr = media.ffmpeg(
+        "-i",
+        video_file,
+        "-map",
+        "0:a:0",
+        "-af",
+        loudnorm_filter(loudness),
+        "-threads",
+        str(threads),
+        "-f",
+        "null",
+        "-",
+        # The measurement is only printed on the `info` level.
+        verbosity="info",
+    )
+    match = LOUDNORM_OUTPUT.search(stderr)
+    if match is None:
+        raise media.MediaError("no loudness measurement found")
+    return json.loads(match.group(0))
+
+
+def needs_normalization(measured, loudness):
+    integrated = float(measured["input_i"])
+    # Silent audio can't be normalized.
+    if math.isinf(integrated):
+        return False
+    return (
+        abs(integrated - loudness) > LOUDNESS_TOLERANCE
+        or float(measured["input_tp"]) > TRUE_PEAK
+    )
+
+
+def loudness_path(output):
+    return f"{output}.loudness"
+
+
+def read_loudness(output):
+    """Returns the loudness target the output was normalized to, or `None` if
+    it's unknown."""
+    try:
+        with open(loudness_path(output)) as loudness_file:
+            return float(loudness_file.read())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_loudness(output, loudness):
+    with media.atomic_output(loudness_path(output)) as partial:
+        with open(partial, "w") as loudness_file:
+            loudness_file.write(f"{loudness}\n")
+
+
+def ffmpeg_arguments(video_file, info, loudness, threads):
+    """Returns the `ffmpeg` arguments for the output and a description of
+    what is done."""
+    video = media.first_stream(info, "video")
+    if video is None:
+        raise media.MediaError("no video stream found")
+    arguments = ["-i", video_file, "-map", "0:v:0"]
+    if video.get("codec_name") in MP4_VIDEO_CODECS:
+        arguments += ["-c:v", "copy"]
+        actions = ["remuxed"]
+    else:
+        arguments += ["-c:v", "libx264", "-crf", VIDEO_CRF, "-pix_fmt", "yuv420p"]
+        actions = ["transcoded"]
+
+    audio = media.first_stream(info, "audio")
+    if audio is not None:
+        arguments += ["-map", "0:a:0"]
+        measured = measure_loudness(video_file, loudness, threads)
+        if needs_normalization(measured, loudness):
+            arguments += ["-af", loudnorm_filter(loudness, measured)]
+            arguments += ["-c:a", "aac", "-b:a", AUDIO_BITRATE]
+            arguments += ["-ar", AUDIO_SAMPLE_RATE]
+            actions.append("normalized")
+        elif audio.get("codec_name") in MP4_AUDIO_CODECS:
+            arguments += ["-c:a", "copy"]
+        else:
+            arguments += ["-c:a", "aac", "-b:a", AUDIO_BITRATE]
+
+    arguments += ["-map_metadata", "0", "-movflags", "+faststart"]
+    arguments += ["-threads", str(threads)]
+    return arguments, " and ".join(actions)
+
+
+def normalize_video(job):
+    """Writes the normalized version of a single video and returns the input
+    item with the new `video_file` (or unchanged if it failed) and a
+    description of what was done."""
+    item, output, loudness, threads = job
+    video_file = item["video_file"]
+    if media.is_up_to_date(output, video_file) and read_loudness(output) == loudness:
+        return {**item, "video_file": output}, "up to date"
+
+    try:
+        # The output is only up to date again once it's replaced.
+        if os.path.exists(loudness_path(output)):
+            os.remove(loudness_path(output))
+        info = media.probe(video_file)
+        arguments, action = ffmpeg_arguments(video_file, info, loudness, threads)
+        with media.atomic_output(output) as partial:
+            media.ffmpeg("-y", *arguments, partial)
+        write_loudness(output, loudness)
+    except (media.MediaError, OSError, ValueError, KeyError) as error:
+        print(f"Warning: cannot normalize `{video_file}`: {error}", file=sys.stderr)
+        return item, "failed"
+
+    return {**item, "video_file": output}, action
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Remux videos to fast-start MP4 files and normalize their loudness."
+    )
+    parser.add_argument(
+        "metadata",
+        type=argparse.FileType("r"),
+        help="newline delimited JSON file with a `video_file` key, `-` for stdin",
+    )
+    parser.add_argument(
+        "--output-dir",
+        default="normalized",
+        help="directory to store the videos in (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--loudness",
+        type=float,
+        default=DEFAULT_LOUDNESS,
+        help="target loudness in LUFS (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=media.cpu_count(),
+        help="number of videos to process in parallel (default: number of CPUs)",
+    )
+    args = parser.parse_args(argv)
+
+    with args.metadata as metadata_file:
+        items = [json.loads(line) for line in metadata_file if line.strip()]
+
+    outputs = [
+        media.output_path(args.output_dir, item["video_file"], ".mp4")
+        for item in items
+    ]
+    duplicates = media.duplicate_outputs(
+        zip((item["video_file"] for item in items), outputs)
+    )
+    for output, video_files in duplicates.items():
+        print(
+            f"Error: {', '.join(f'`{video_file}`' for video_file in video_files)} "
+            f"would all be written to `{output}`.",
+            file=sys.stderr,
+        )
+    if duplicates:
+        return 1
+
+    # The CPUs are shared between the parallel `ffmpeg` processes.
+    threads = media.threads_per_job(args.jobs)
+    jobs = [
+        (item, output, args.loudness, threads) for item, output in zip(items, outputs)
+    ]
+    failed = 0
+    with multiprocessing.Pool(args.jobs) as pool:
+        for item, action in pool.imap(normalize_video, jobs):
+            print(f"{item['video_file']}: {action}", file=sys.stderr)
+            if action == "failed":
+                failed += 1
+            print(json.dumps(item), flush=True)
+    if failed:
+        print(f"Error: {failed} of {len(items)} videos failed.", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
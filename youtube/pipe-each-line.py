@@ -8,7 +8,7 @@
 #
 # This can be used to upload several videos sequentially. For example:
 #
-#     cat metadata.ndjson | YOUTUBE_ACCESS_TOKEN='ya29.a0AXooCgsMQcaKptaaOmy8ZmWu2ohKc85YS2l1l6D89AhIx9Qbz5sZqHZnM06qnfXRu71hxq-loEePjq3V-S2j6lT1pcrzTP_sFgH4AcbiEKB0OvQ656OJlUN2V0vIxjgpYN2LXel9j5LdyldPrYQNPcTtJBtplFeIcN0DaCgYKAXwSARESFQHGX2Mi6b7fvQFL09DLSvX1LyDpKA0171' ./pipe-each-line.py ./upload-video.py
+#     cat metadata.ndjson | YOUTUBE_CREDENTIALS=./youtube-credentials.json ./pipe-each-line.py ./upload-video.py
 
 import subprocess, sys
 
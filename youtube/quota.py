@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: MIT
+
+# Library to recognize failed YouTube API calls because of an exhausted daily
+# quota.
+#
+# YouTube answers with a `403 Forbidden` whose error reason is
+# `quotaExceeded`. The message of the exception the YouTube library raises
+# doesn't contain the reason, hence it's read from the response. The upload
+# and update scripts exit with `QUOTA_EXCEEDED_EXIT_CODE` in that case, so
+# that `schedule-uploads.py` can retry the video after the quota reset.
+
+# Exit code of the upload and update scripts if the quota is exhausted.
+QUOTA_EXCEEDED_EXIT_CODE = 7
+
+
+def is_quota_exceeded(error):
+    """Returns whether the `PyYouTubeException` was caused by an exhausted
+    quota."""
+    if error.status_code != 403:
+        return False
+    # The response is a `requests.Response` for errors of the API, errors of
+    # the library itself don't have a JSON body.
+    try:
+        reasons = [item["reason"] for item in error.response.json()["error"]["errors"]]
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return False
+    return "quotaExceeded" in reasons
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: MIT
+
+# Uploads (or updates) videos within the daily quota of the YouTube Data API.
+#
+# Every project on the Google Cloud Platform has a daily quota of 10,000 units
+# by default. A `videos.insert` costs 1600 units, a `videos.update` and a
+# `thumbnails.set` 50 units each.
+# Instead of finding out that the quota is exhausted when a call fails in the
+# middle of a batch, this script keeps track of the used quota per project in
+# a local state file and only submits as many items as fit into the remaining
+# budget of the day. The quota is reset at midnight Pacific Time.
+#
+# The input is a newline delimited JSON file like the one `pipe-each-line.py`
+# takes, e.g. the output of the FOSS4G 2022 `schedule-to-metadata.py` script.
+# Each line is passed on to `upload-video.py` (or `update-video.py` with
+# `--update`). Items that were processed successfully are recorded in the state
+# file, so that the script can simply be run again with the same input and
+# only submits what is still pending. With `--wait` it doesn't stop once the
+# budget is used up, but waits for the quota reset and continues.
+#
+# The items are processed by date, within a day the rooms given with
+# `--room-priority` come first. The room is taken from the `room` key, if there
+# is none, the name of the directory of the video file is used.
+#
+# An example invocation that uploads all videos, spread over several days:
+#
+#     YOUTUBE_CREDENTIALS=./youtube-credentials.json ./schedule-uploads.py --wait --room-priority Auditorium metadata.ndjson 2>&1 | tee /tmp/upload.log
+#
+# The credentials are passed on to the upload script, see `get-token.py` for
+# how to get them.
+
+import argparse, datetime, json, os, subprocess, sys, time
+from zoneinfo import ZoneInfo
+
+from quota import QUOTA_EXCEEDED_EXIT_CODE
+
+# The quota is reset at midnight Pacific Time.
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+DEFAULT_DAILY_QUOTA = 10000
+# Cost in quota units of a single call.
+INSERT_COST = 1600
+UPDATE_COST = 50
+THUMBNAIL_COST = 50
+# Exit codes of the upload/update script when the input is invalid. No API
+# call was made in that case. Uncaught exceptions exit with 1.
+INVALID_INPUT_EXIT_CODES = range(2, 7)
+# Wait a bit longer than needed, so that we don't race with the reset.
+RESET_MARGIN = 60
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def quota_day(now=None):
+    """Returns the day the quota is accounted for, as ISO 8601 string."""
+    if now is None:
+        now = datetime.datetime.now(QUOTA_TIMEZONE)
+    return now.astimezone(QUOTA_TIMEZONE).date().isoformat()
+
+
+def seconds_until_reset(now=None):
+    """Returns the number of seconds until the next quota reset."""
+    if now is None:
+        now = datetime.datetime.now(QUOTA_TIMEZONE)
+    now = now.astimezone(QUOTA_TIMEZONE)
+    tomorrow = now.date() + datetime.timedelta(days=1)
+    reset = datetime.datetime.combine(tomorrow, datetime.time(), QUOTA_TIMEZONE)
+    return (reset - now).total_seconds()
+
+
+class QuotaState:
+    """The used quota per project and the items that were already processed.
+
+    It's stored as JSON file that looks like this:
+
+        {
+          "projects": {"<project>": {"day": "2022-09-01", "used": 3250}},
+          "done": {"insert": ["<video_file>", …], "update": ["<youtube_id>", …]}
+        }
+    """
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path) as state_file:
+                state = json.load(state_file)
+        except FileNotFoundError:
+            state = {}
+        self.projects = state.get("projects", {})
+        self.done = {
+            operation: set(keys) for operation, keys in state.get("done", {}).items()
+        }
+
+    def save(self):
+        """Saves the state atomically, so that an interrupted run doesn't
+        leave a broken state file behind."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as state_file:
+            json.dump(
+                {
+                    "projects": self.projects,
+                    "done": {
+                        operation: sorted(keys)
+                        for operation, keys in self.done.items()
+                    },
+                },
+                state_file,
+                indent=2,
+            )
+        os.replace(tmp_path, self.path)
+
+    def used(self, project):
+        """Returns the quota that was used by the project today."""
+        usage = self.projects.get(project)
+        if usage is None or usage["day"] != quota_day():
+            return 0
+        return usage["used"]
+
+    def add_usage(self, project, cost):
+        self.projects[project] = {
+            "day": quota_day(),
+            "used": self.used(project) + cost,
+        }
+
+    def is_done(self, operation, key):
+        return key in self.done.get(operation, set())
+
+    def mark_done(self, operation, key):
+        self.done.setdefault(operation, set()).add(key)
+
+
+def item_cost(operation, item):
+    """Returns the quota units that processing the item costs."""
+    if operation == "update":
+        return UPDATE_COST
+    # The upload script also sets the thumbnail if there is one.
+    if "thumbnail" in item:
+        return INSERT_COST + THUMBNAIL_COST
+    return INSERT_COST
+
+
+def item_room(item):
+    """Returns the room of an item, which is either given explicitly or is
+    the name of the directory the video file is in."""
+    if "room" in item:
+        return item["room"]
+    return os.path.basename(os.path.dirname(item.get("video_file", "")))
+
+
+def order_items(items, room_priority):
+    """Sorts the items by date and then by the priority of the rooms. Rooms
+    without priority come last. Otherwise the input order is kept."""
+
+    def sort_key(indexed_item):
+        index, item = indexed_item
+        room = item_room(item)
+        if room in room_priority:
+            priority = room_priority.index(room)
+        else:
+            priority = len(room_priority)
+        return (item.get("date", ""), priority, index)
+
+    return [item for _index, item in sorted(enumerate(items), key=sort_key)]
+
+
+def submit(command, line):
+    """Runs the upload/update script with the given line as input.
+
+    Returns a tuple with the exit code of the script and a boolean whether
+    the call failed because the quota was exceeded.
+    """
+    # The output (the progress and the resulting JSON) is passed through.
+    result = subprocess.run(command, input=line.encode())
+    return result.returncode, result.returncode == QUOTA_EXCEEDED_EXIT_CODE
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Upload videos within the daily YouTube API quota."
+    )
+    parser.add_argument(
+        "metadata", help="newline delimited JSON file with the videos to upload"
+    )
+    parser.add_argument(
+        "--state",
+        default="upload-state.json",
+        help="file to store the used quota and the processed items in (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--project",
+        default="default",
+        help="name of the Google Cloud project the quota belongs to (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--daily-quota",
+        type=int,
+        default=DEFAULT_DAILY_QUOTA,
+        help="daily quota of the project (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="update existing videos via `update-video.py` instead of uploading them",
+    )
+    parser.add_argument(
+        "--room-priority",
+        action="append",
+        default=[],
+        metavar="ROOM",
+        help="process the videos of this room first, can be given several times",
+    )
+    parser.add_argument(
+        "--wait",
+        action="store_true",
+        help="wait for the quota reset instead of stopping when the budget is used up",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only print what would be submitted today",
+    )
+    args = parser.parse_args(argv)
+
+    if args.update:
+        operation, key_name = "update", "youtube_id"
+        script = os.path.join(SCRIPT_DIR, "update-video.py")
+    else:
+        operation, key_name = "insert", "video_file"
+        script = os.path.join(SCRIPT_DIR, "upload-video.py")
+    command = [sys.executable, "-u", script]
+
+    has_credentials = "YOUTUBE_CREDENTIALS" in os.environ
+    has_token = "YOUTUBE_ACCESS_TOKEN" in os.environ
+    if not (has_credentials or has_token or args.dry_run):
+        print(
+            "The `YOUTUBE_CREDENTIALS` or the `YOUTUBE_ACCESS_TOKEN` environment "
+            "variable must be set. Retrieve them via the `get-token.py` script."
+        )
+        return 2
+
+    with open(args.metadata) as metadata_file:
+        items = [json.loads(line) for line in metadata_file if line.strip()]
+
+    state = QuotaState(args.state)
+    pending = [
+        item
+        for item in order_items(items, args.room_priority)
+        if not state.is_done(operation, item[key_name])
+    ]
+    print(f"{len(pending)} of {len(items)} items are pending.", file=sys.stderr)
+
+    if args.dry_run:
+        budget = args.daily_quota - state.used(args.project)
+        for item in pending:
+            budget -= item_cost(operation, item)
+            if budget < 0:
+                break
+            print(json.dumps({key_name: item[key_name], "date": item.get("date")}))
+        return 0
+
+    failed = 0
+    while pending:
+        cost = item_cost(operation, pending[0])
+        remaining = args.daily_quota - state.used(args.project)
+        if remaining < cost:
+            if not args.wait:
+                print(
+                    f"Daily quota of project `{args.project}` is used up, "
+                    f"{len(pending)} items are still pending. Run again after "
+                    "midnight Pacific Time or use `--wait`.",
+                    file=sys.stderr,
+                )
+                return 3
+            wait = seconds_until_reset() + RESET_MARGIN
+            print(
+                f"Daily quota is used up, waiting {round(wait / 3600, 1)} hours "
+                f"for the reset, {len(pending)} items are still pending.",
+                file=sys.stderr,
+            )
+            time.sleep(wait)
+            continue
+
+        item = pending.pop(0)
+        # The quota is charged for the request, no matter whether it succeeds,
+        # hence account for it before it's submitted.
+        state.add_usage(args.project, cost)
+        state.save()
+        returncode, quota_exceeded = submit(command, json.dumps(item) + "\n")
+        if returncode == 0:
+            state.mark_done(operation, item[key_name])
+        elif returncode in INVALID_INPUT_EXIT_CODES:
+            # The input was rejected before any API call was made.
+            state.add_usage(args.project, -cost)
+            print(f"Error: `{item[key_name]}` was skipped.", file=sys.stderr)
+            failed += 1
+        elif quota_exceeded:
+            # Something else used up the quota, so our accounting is off. Try
+            # the item again once the quota was reset.
+            state.add_usage(args.project, args.daily_quota)
+            pending.insert(0, item)
+        else:
+            print(f"Error: processing `{item[key_name]}` failed.", file=sys.stderr)
+            failed += 1
+        state.save()
+
+    if failed:
+        return 4
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
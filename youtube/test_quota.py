@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: MIT
+
+# Tests that an exhausted quota is passed on from the upload and update
+# scripts to `schedule-uploads.py`. The YouTube API isn't called, the client
+# raises the error YouTube returns when the quota is exceeded.
+#
+# Run it with:
+#
+#     python3 -m unittest test_quota.py
+
+import importlib.util, io, json, os, sys, unittest
+from contextlib import redirect_stderr, redirect_stdout
+from unittest import mock
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+import requests
+from pyyoutube.error import PyYouTubeException
+
+from quota import QUOTA_EXCEEDED_EXIT_CODE, is_quota_exceeded
+
+
+def load_script(name):
+    """Imports a script with a dash in its name as module."""
+    spec = importlib.util.spec_from_file_location(
+        name.replace("-", "_"), os.path.join(SCRIPT_DIR, f"{name}.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def youtube_error(status_code, reason):
+    """Returns the exception the YouTube library raises for a failed call."""
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers["Content-Type"] = "application/json"
+    response._content = json.dumps(
+        {
+            "error": {
+                "code": status_code,
+                "message": f"The request failed: {reason}.",
+                "errors": [
+                    {
+                        "message": f"The request failed: {reason}.",
+                        "domain": "youtube.quota",
+                        "reason": reason,
+                    }
+                ],
+            }
+        }
+    ).encode()
+    return PyYouTubeException(response)
+
+
+def failing_client(error):
+    client = mock.Mock()
+    client.videos.insert.side_effect = error
+    client.videos.update.side_effect = error
+    return client
+
+
+class IsQuotaExceededTest(unittest.TestCase):
+    def test_quota_exceeded(self):
+        self.assertTrue(is_quota_exceeded(youtube_error(403, "quotaExceeded")))
+
+    def test_other_forbidden(self):
+        self.assertFalse(is_quota_exceeded(youtube_error(403, "forbidden")))
+
+    def test_other_status(self):
+        self.assertFalse(is_quota_exceeded(youtube_error(400, "quotaExceeded")))
+
+
+class ExitCodeTest(unittest.TestCase):
+    def run_main(self, name, data, error):
+        script = load_script(name)
+        with mock.patch.object(
+            script, "client_from_environment", return_value=failing_client(error)
+        ), redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            return script.main(json.dumps(data))
+
+    def test_upload(self):
+        data = {
+            "title": "A talk",
+            "description": "About something",
+            "video_file": os.path.abspath(__file__),
+            "date": "2022-08-24",
+        }
+        returncode = self.run_main(
+            "upload-video", data, youtube_error(403, "quotaExceeded")
+        )
+        self.assertEqual(returncode, QUOTA_EXCEEDED_EXIT_CODE)
+
+    def test_update(self):
+        data = {
+            "title": "A talk",
+            "description": "About something",
+            "youtube_id": "S9HdPi9Ikhk",
+            "date": "2022-08-24",
+        }
+        returncode = self.run_main(
+            "update-video", data, youtube_error(403, "quotaExceeded")
+        )
+        self.assertEqual(returncode, QUOTA_EXCEEDED_EXIT_CODE)
+
+    def test_other_errors_are_raised(self):
+        data = {
+            "title": "A talk",
+            "description": "About something",
+            "youtube_id": "S9HdPi9Ikhk",
+            "date": "2022-08-24",
+        }
+        with self.assertRaises(PyYouTubeException):
+            self.run_main("update-video", data, youtube_error(403, "forbidden"))
+
+
+class SubmitTest(unittest.TestCase):
+    def test_quota_exceeded(self):
+        schedule_uploads = load_script("schedule-uploads")
+        command = [
+            sys.executable,
+            "-c",
+            f"import sys; sys.exit({QUOTA_EXCEEDED_EXIT_CODE})",
+        ]
+        self.assertEqual(
+            schedule_uploads.submit(command, "{}\n"),
+            (QUOTA_EXCEEDED_EXIT_CODE, True),
+        )
+
+    def test_other_failure(self):
+        schedule_uploads = load_script("schedule-uploads")
+        command = [sys.executable, "-c", "import sys; sys.exit(1)"]
+        self.assertEqual(schedule_uploads.submit(command, "{}\n"), (1, False))
+
+
+if __name__ == "__main__":
+    unittest.main()
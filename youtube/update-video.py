@@ -16,11 +16,16 @@
 # must have a `title`, `description`, `youtube_id` and `date` key. Additional
 # keys are ignored.
 #
+# If the daily quota of the YouTube API is exceeded, the script exits with code
+# 7 (see `quota.py`).
 #
-# You also need to specify an access token in order to upload a video. Such a
-# token can be retrieved with the `get-token.py` script from this repository.
-# You need to specify it in an environment variable called
-# `YOUTUBE_ACCESS_TOKEN`.
+# You also need credentials in order to upload a video. They can be retrieved
+# with the `get-token.py` script from this repository. Specify the path to the
+# credentials file it creates in an environment variable called
+# `YOUTUBE_CREDENTIALS`. The access token is then refreshed automatically
+# before it expires, so that also batches that run for hours work unattended.
+# Alternatively you can specify an access token directly in an environment
+# variable called `YOUTUBE_ACCESS_TOKEN`, it's only valid for an hour though.
 #
 # And example invocation of this script might look like this:
 #
@@ -31,17 +36,17 @@
 # the output from the FOSS4G 2022 `schedule-to-metadata.py` script, you can use
 # `./pipe-each-line.py` to process the whole file:
 #
-#     cat metadata.ndjson | YOUTUBE_ACCESS_TOKEN='ya29.a0AXooCgsMQcaKptaaOmy8ZmWu2ohKc85YS2l1l6D89AhIx9Qbz5sZqHZnM06qnfXRu71hxq-loEePjq3V-S2j6lT1pcrzTP_sFgH4AcbiEKB0OvQ656OJlUN2V0vIxjgpYN2LXel9j5LdyldPrYQNPcTtJBtplFeIcN0DaCgYKAXwSARESFQHGX2Mi6b7fvQFL09DLSvX1LyDpKA0171' ./pipe-each-line.py ./update-video.py
+#     cat metadata.ndjson | YOUTUBE_CREDENTIALS=./youtube-credentials.json ./pipe-each-line.py ./update-video.py
 #
 # If you want to see the progress and have the results piped into a file, use
 # `tee` and unbuffered Python:
 #
-#     cat metadata.ndjson | YOUTUBE_ACCESS_TOKEN='ya29.a0AXooCgsMQcaKptaaOmy8ZmWu2ohKc85YS2l1l6D89AhIx9Qbz5sZqHZnM06qnfXRu71hxq-loEePjq3V-S2j6lT1pcrzTP_sFgH4AcbiEKB0OvQ656OJlUN2V0vIxjgpYN2LXel9j5LdyldPrYQNPcTtJBtplFeIcN0DaCgYKAXwSARESFQHGX2Mi6b7fvQFL09DLSvX1LyDpKA0171' ./pipe-each-line.py python3 -u ./update-video.py 2>&1 | tee /tmp/update.log
+#     cat metadata.ndjson | YOUTUBE_CREDENTIALS=./youtube-credentials.json ./pipe-each-line.py python3 -u ./update-video.py 2>&1 | tee /tmp/update.log
 
 import json, os, sys
 from operator import itemgetter
 
-from pyyoutube import Client
+from pyyoutube.error import PyYouTubeException
 from pyyoutube.media import Media
 from pyyoutube.models import (
     Video,
@@ -50,15 +55,20 @@ from pyyoutube.models import (
     VideoStatus,
 )
 
+from credentials import client_from_environment
+from quota import QUOTA_EXCEEDED_EXIT_CODE, is_quota_exceeded
+
+# Make sure the `profiling` module can be found in the `common` directory.
+sys.path.insert(1, os.path.join(sys.path[0], "..", "common"))
+import profiling
+
 YOUTUBE_MAX_TITLE_LENGTH = 100
 YOUTUBE_MAX_DESCRIPTION_LENGTH = 5000
 
 CATEGORY_ID_EDUCATION = 27
 
-def upload_video(token, title, description, youtube_id, date):
+def upload_video(cli, title, description, youtube_id, date):
     """Updates a video on YouTube."""
-    cli = Client(access_token=token)
-
     body = Video(
         id=youtube_id,
         snippet=VideoSnippet(
@@ -90,6 +100,7 @@ def main(data=None):
     """The input `data` is a single JSON object that contains the keys `title`,
     `description`, `youtube_id` and `date`.
     """
+    profiling.start("update-video")
     if data is None:
         if sys.stdin.isatty():
             print(
@@ -99,12 +110,11 @@ def main(data=None):
         else:
             data = sys.stdin.read()
 
-    try:
-        token = os.environ["YOUTUBE_ACCESS_TOKEN"]
-    except KeyError:
+    cli = client_from_environment()
+    if cli is None:
         print(
-            "The `YOUTUBE_ACCESS_TOKEN` environment variable must be set. "
-            "Retrieve it via the `get_token.py` script."
+            "The `YOUTUBE_CREDENTIALS` or the `YOUTUBE_ACCESS_TOKEN` environment "
+            "variable must be set. Retrieve them via the `get-token.py` script."
         )
         return 2
 
@@ -140,7 +150,14 @@ def main(data=None):
         )
         return 6
 
-    upload_video(token, title, description, youtube_id, date)
+    try:
+        with profiling.section("update"):
+            upload_video(cli, title, description, youtube_id, date)
+    except PyYouTubeException as error:
+        if not is_quota_exceeded(error):
+            raise
+        print(f"The quota is exceeded, `{youtube_id}` wasn't updated.", file=sys.stderr)
+        return QUOTA_EXCEEDED_EXIT_CODE
 
 
 if __name__ == "__main__":
@@ -7,13 +7,23 @@
 # It's based on the [`upload_video.py` example from# `python-youtube`](https://github.com/sns-sdks/python-youtube/blob/280d8077c33c9920e0c5c4f9583e64e30b67f892/examples/clients/upload_video.py)
 #
 # It takes a single JSON object piped into the script as input. That object
-# must have a `title`, `description`, `video_file` and `date` key. Additional
-# keys are ignored.
+# must have a `title`, `description`, `video_file` and `date` key. If there is
+# a `thumbnail` key, the image file it points to is set as thumbnail right
+# after the upload (see `extract-thumbnails.py`). Additional keys are ignored.
 #
-# You also need to specify an access token in order to upload a video. Such a
-# token can be retrieved with the `get-token.py` script from this repository.
-# You need to specify it in an environment variable called
-# `YOUTUBE_ACCESS_TOKEN`.
+# You also need credentials in order to upload a video. They can be retrieved
+# with the `get-token.py` script from this repository. Specify the path to the
+# credentials file it creates in an environment variable called
+# `YOUTUBE_CREDENTIALS`. The access token is then refreshed automatically
+# before it expires, so that also batches that run for hours work unattended.
+# Alternatively you can specify an access token directly in an environment
+# variable called `YOUTUBE_ACCESS_TOKEN`, it's only valid for an hour though.
+#
+# If the daily quota of the YouTube API is exceeded, the script exits with code
+# 7 (see `quota.py`).
+#
+# If the `EVENTS_FILE` environment variable is set, progress events are
+# written to it, see `../common/events.py` for details.
 #
 # And example invocation of this script might look like this:
 #
@@ -24,17 +34,17 @@
 # the output from the FOSS4G 2022 `schedule-to-metadata.py` script, you can use
 # `./pipe-each-line.py` to process the whole file:
 #
-#     cat metadata.ndjson | YOUTUBE_ACCESS_TOKEN='ya29.a0AXooCgsMQcaKptaaOmy8ZmWu2ohKc85YS2l1l6D89AhIx9Qbz5sZqHZnM06qnfXRu71hxq-loEePjq3V-S2j6lT1pcrzTP_sFgH4AcbiEKB0OvQ656OJlUN2V0vIxjgpYN2LXel9j5LdyldPrYQNPcTtJBtplFeIcN0DaCgYKAXwSARESFQHGX2Mi6b7fvQFL09DLSvX1LyDpKA0171' ./pipe-each-line.py ./upload-video.py
+#     cat metadata.ndjson | YOUTUBE_CREDENTIALS=./youtube-credentials.json ./pipe-each-line.py ./upload-video.py
 #
 # If you want to see the progress and have the results piped into a file, use
 # `tee` and unbuffered Python:
 #
-#     cat metadata.ndjson | YOUTUBE_ACCESS_TOKEN='ya29.a0AXooCgsMQcaKptaaOmy8ZmWu2ohKc85YS2l1l6D89AhIx9Qbz5sZqHZnM06qnfXRu71hxq-loEePjq3V-S2j6lT1pcrzTP_sFgH4AcbiEKB0OvQ656OJlUN2V0vIxjgpYN2LXel9j5LdyldPrYQNPcTtJBtplFeIcN0DaCgYKAXwSARESFQHGX2Mi6b7fvQFL09DLSvX1LyDpKA0171' ./pipe-each-line.py python3 -u ./upload-video.py 2>&1 | tee /tmp/upload.log
+#     cat metadata.ndjson | YOUTUBE_CREDENTIALS=./youtube-credentials.json ./pipe-each-line.py python3 -u ./upload-video.py 2>&1 | tee /tmp/upload.log
 
 import json, os, sys
 from operator import itemgetter
 
-from pyyoutube import Client
+from pyyoutube.error import PyYouTubeException
 from pyyoutube.media import Media
 from pyyoutube.models import (
     Video,
@@ -43,14 +53,75 @@ from pyyoutube.models import (
     VideoStatus,
 )
 
+from credentials import client_from_environment
+from quota import QUOTA_EXCEEDED_EXIT_CODE, is_quota_exceeded
+
+# Make sure the `events`, `profiling` and `retry` modules can be found in the
+# `common` directory.
+sys.path.insert(1, os.path.join(sys.path[0], "..", "common"))
+from events import events_from_environment
+import profiling
+from retry import retry_call
+
+YOUTUBE_HOST = "www.googleapis.com"
+
 YOUTUBE_MAX_TITLE_LENGTH = 100
 YOUTUBE_MAX_DESCRIPTION_LENGTH = 5000
 
 
-def upload_video(token, title, description, file_path, date):
-    """Uploads a video to YouTube."""
-    cli = Client(access_token=token)
+def query_upload_status(upload):
+    """Asks the server how many bytes of a resumable upload it received. The
+    upload then continues from there. Returns the same as `next_chunk()`."""
+    response = upload.client.request(
+        path=upload.resumable_uri,
+        method="PUT",
+        headers={
+            "Content-Length": "0",
+            "Content-Range": f"bytes */{upload.media.size}",
+        },
+    )
+    return upload.process_response(response)
+
+
+def resumable_next_chunk(upload):
+    """Returns a function that sends the next chunk of an upload, to be used
+    with `retry_call()`.
 
+    A chunk that failed may have reached the server partially or not at all.
+    Hence if it's called again after a failure, it first asks the server which
+    bytes it has, so that the upload continues from the last byte the server
+    confirmed.
+    """
+    failed = False
+
+    def next_chunk():
+        nonlocal failed
+        if failed and upload.resumable_uri is not None:
+            status, response = query_upload_status(upload)
+            # The failed chunk was the last one and it was received.
+            if response is not None:
+                failed = False
+                return status, response
+        failed = True
+        result = upload.next_chunk()
+        failed = False
+        return result
+
+    return next_chunk
+
+
+def set_thumbnail(cli, youtube_id, thumbnail_path):
+    """Sets the thumbnail of a video."""
+    media = Media(filename=thumbnail_path, mimetype="image/jpeg")
+    upload = cli.thumbnails.set(video_id=youtube_id, media=media)
+    next_chunk = resumable_next_chunk(upload)
+    response = None
+    while response is None:
+        _status, response = retry_call(next_chunk, YOUTUBE_HOST)
+
+
+def upload_video(cli, title, description, file_path, date, thumbnail_path=None):
+    """Uploads a video to YouTube, optionally together with a thumbnail."""
     body = Video(
         snippet=VideoSnippet(
             title=title,
@@ -74,15 +145,28 @@ def upload_video(token, title, description, file_path, date):
         notify_subscribers=False,
     )
 
-    # Display a progress bar when run on the console.
-    response = None
-    while response is None:
-        status, response = upload.next_chunk()
-        if status is not None:
-            progress = round(status.progress() * 100, 2)
-            print(f"Uploading video progress: {progress}%", end="\r")
+    events = events_from_environment("upload-video")
+    with events.job(file_path, total_bytes=os.path.getsize(file_path)) as job:
+        # Display a progress bar when run on the console.
+        next_chunk = resumable_next_chunk(upload)
+        response = None
+        while response is None:
+            status, response = retry_call(next_chunk, YOUTUBE_HOST, job)
+            if status is not None:
+                progress = round(status.progress() * 100, 2)
+                print(f"Uploading video progress: {progress}%", end="\r")
+                job.chunk(status.progressed_seize)
+
+        video = Video.from_dict(response)
+        job.end(job.total_bytes, youtube_id=video.id)
+    if thumbnail_path is not None:
+        # The video is uploaded already, so don't fail because of the
+        # thumbnail, it can still be set later.
+        try:
+            set_thumbnail(cli, video.id, thumbnail_path)
+        except PyYouTubeException as error:
+            print(f"Cannot set thumbnail `{thumbnail_path}`: {error}", file=sys.stderr)
 
-    video = Video.from_dict(response)
     # Print the successful upload as JSON in a format that can be mapped to the
     # original metadata input file. You can join the YouTube URL via the
     # `video_file` value.
@@ -100,6 +184,7 @@ def main(data=None):
     """The input `data` is a single JSON object that contains the keys `title`,
     `description`, `video_file` and `date`.
     """
+    profiling.start("upload-video")
     if data is None:
         if sys.stdin.isatty():
             print(
@@ -109,12 +194,11 @@ def main(data=None):
         else:
             data = sys.stdin.read()
 
-    try:
-        token = os.environ["YOUTUBE_ACCESS_TOKEN"]
-    except KeyError:
+    cli = client_from_environment()
+    if cli is None:
         print(
-            "The `YOUTUBE_ACCESS_TOKEN` environment variable must be set. "
-            "Retrieve it via the `get_token.py` script."
+            "The `YOUTUBE_CREDENTIALS` or the `YOUTUBE_ACCESS_TOKEN` environment "
+            "variable must be set. Retrieve them via the `get-token.py` script."
         )
         return 2
 
@@ -150,7 +234,16 @@ def main(data=None):
         )
         return 6
 
-    upload_video(token, title, description, video_file, date)
+    try:
+        with profiling.section("upload"):
+            upload_video(
+                cli, title, description, video_file, date, parsed.get("thumbnail")
+            )
+    except PyYouTubeException as error:
+        if not is_quota_exceeded(error):
+            raise
+        print(f"The quota is exceeded, `{video_file}` wasn't uploaded.", file=sys.stderr)
+        return QUOTA_EXCEEDED_EXIT_CODE
 
 
 if __name__ == "__main__":